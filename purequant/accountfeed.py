@@ -0,0 +1,190 @@
+# -*- coding:utf-8 -*-
+
+"""
+持仓与账户权益推送
+
+实盘模式下POSITION的direction、amount、price每次都调用交易模块的get_position，计算一次平仓利润就要查询四次持仓；
+交易模块的get_single_equity也是每次都请求rest接口。这里按交易模块维护一份持仓与账户权益的缓存：连接成功后先通过rest接口
+获取一次快照，之后由交易所的持仓频道与账户频道推送更新，交易模块的get_position与get_single_equity直接从缓存中读取。
+
+获取快照期间收到的推送先暂存，快照写入后再按顺序应用，避免旧的快照覆盖新的推送。连接断开至重新获取快照之前，
+缓存不可用，交易模块改为通过rest接口查询。
+
+持仓统一以双向持仓的格式缓存：{"long": {"price": 持多均价, "amount": 持多数量}, "short": {"price": 持空均价, "amount": 持空数量}}，
+单向持仓的查询结果由one_way转换得到。
+
+Author: Gary-Hertel
+Date:   2020/12/08
+email: interstella.ranger2020@gmail.com
+"""
+
+import time
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from purequant.config import config
+from purequant.logger import logger
+
+EMPTY = {"long": {"price": 0.0, "amount": 0}, "short": {"price": 0.0, "amount": 0}}
+
+
+def one_way(position):
+    """
+    将双向持仓格式转换为单向持仓格式
+    :return: 返回字典 {'direction': "long"、"short"或"none", 'amount': 持仓数量, 'price': 持仓均价}
+    """
+    for side in ("long", "short"):
+        if position[side]["amount"] > 0:
+            return {'direction': side, 'amount': position[side]["amount"], 'price': position[side]["price"]}
+    return {'direction': 'none', 'amount': 0, 'price': 0.0}
+
+
+class __AccountFeed:
+    """按交易模块缓存持仓与账户权益"""
+
+    def __init__(self):
+        self.__accounts = {}    # 名称 -> {"position": 双向持仓, "equity": {账户: 权益}, "updated": 更新时间戳}
+        self.__buffers = {}     # 名称 -> 获取快照期间暂存的推送，不在其中表示不在获取快照
+        self.__live = set()     # 缓存可用的名称
+        self.__lock = threading.Lock()
+        self.__loop = None
+        self.__executor = None
+
+    def __start(self):
+        with self.__lock:
+            if self.__loop is None:
+                self.__loop = asyncio.new_event_loop()
+                self.__executor = ThreadPoolExecutor(max_workers=config.order_workers)
+                threading.Thread(target=self.__loop.run_forever, daemon=True).start()
+        return self.__loop
+
+    def __apply(self, name, kind, args):
+        account = self.__accounts[name]
+        if kind == "position":
+            for side, value in args[0].items():
+                account["position"][side] = {"price": value["price"], "amount": value["amount"]}
+        else:
+            account["equity"][args[0]] = args[1]
+        account["updated"] = time.time()
+
+    def __push(self, name, kind, *args):
+        with self.__lock:
+            if name in self.__buffers:
+                self.__buffers[name].append((kind, args))
+            elif name in self.__live:
+                self.__apply(name, kind, args)
+
+    def begin(self, name):
+        """连接成功，开始获取快照，此前的缓存不再可用，之后收到的推送暂存至快照写入"""
+        with self.__lock:
+            self.__live.discard(name)
+            self.__buffers[name] = []
+
+    def reset(self, name, position, equity):
+        """
+        写入快照并应用获取快照期间暂存的推送，之后缓存可用
+        :param name: 名称，如"OKEXFUTURES:BTC-USD-201225"
+        :param position: 双向持仓格式的持仓信息
+        :param equity: 字典 {账户: 权益}
+        :return:
+        """
+        with self.__lock:
+            self.__accounts[name] = {"position": {side: dict(position.get(side, EMPTY[side])) for side in EMPTY},
+                                     "equity": dict(equity), "updated": time.time()}
+            for kind, args in self.__buffers.pop(name, []):
+                self.__apply(name, kind, args)
+            self.__live.add(name)
+
+    def close(self, name):
+        """连接断开，缓存不再可用"""
+        with self.__lock:
+            self.__live.discard(name)
+            self.__buffers.pop(name, None)
+
+    def update_position(self, name, position):
+        """持仓推送，position为双向持仓格式，可以只包含"long"或"short"其中一个方向"""
+        self.__push(name, "position", position)
+
+    def update_equity(self, name, account, equity):
+        """账户权益推送"""
+        self.__push(name, "equity", account, equity)
+
+    async def __snapshot(self, name, snapshot):
+        """获取快照，失败时只要连接未断开就每5秒重试一次，期间通过rest接口查询"""
+        while True:
+            try:
+                position, equity = await self.__loop.run_in_executor(self.__executor, snapshot)
+                break
+            except Exception as e:
+                logger.warning("{}持仓与账户快照获取失败，5秒后重试：{}".format(name, e))
+            await asyncio.sleep(5)
+            with self.__lock:
+                if name not in self.__buffers:  # 连接已断开，重连后重新获取
+                    return
+        with self.__lock:
+            if name not in self.__buffers:
+                return
+        self.reset(name, position, equity)
+        logger.debug("{}持仓与账户推送已连接".format(name))
+
+    async def __keep(self, name, connect, snapshot):
+        """保持连接，断开后等待一段时间重连，等待时间逐次加倍，最长30秒"""
+        delay = 1
+        while True:
+            connected = []
+
+            def on_connect():
+                if not connected:   # 订阅多个频道时每个频道订阅成功都会调用，只获取一次快照
+                    connected.append(True)
+                    self.begin(name)
+                    asyncio.ensure_future(self.__snapshot(name, snapshot))
+
+            try:
+                await connect(on_connect, functools.partial(self.update_position, name),
+                              functools.partial(self.update_equity, name))
+            except Exception as e:
+                logger.warning("{}持仓与账户推送连接断开，{}秒后重连：{}".format(name, delay, e))
+            self.close(name)
+            delay = 1 if connected else min(delay * 2, 30)
+            await asyncio.sleep(delay)
+
+    def subscribe(self, name, connect, snapshot):
+        """
+        订阅持仓与账户推送，同一名称只订阅一次
+        :param name: 名称，如"OKEXFUTURES:BTC-USD-201225"
+        :param connect: 协程函数connect(on_connect, on_position, on_equity)，建立一次websocket连接并持续接收，连接断开时返回或抛出异常，
+                        订阅成功后调用on_connect()，收到持仓推送时调用on_position(双向持仓)，收到账户推送时调用on_equity(账户, 权益)
+        :param snapshot: 函数snapshot()，通过rest接口查询，返回(双向持仓, {账户: 权益})
+        :return:
+        """
+        loop = self.__start()
+        with self.__lock:
+            if name in self.__accounts or name in self.__buffers:
+                return
+            self.__accounts[name] = {"position": {}, "equity": {}, "updated": None}
+        loop.call_soon_threadsafe(asyncio.ensure_future, self.__keep(name, connect, snapshot))
+
+    def position(self, name):
+        """获取双向持仓格式的持仓信息，缓存不可用时返回None"""
+        with self.__lock:
+            if name not in self.__live:
+                return None
+            return {side: dict(value) for side, value in self.__accounts[name]["position"].items()}
+
+    def equity(self, name, account):
+        """获取账户权益，缓存不可用或未推送该账户时返回None"""
+        with self.__lock:
+            if name not in self.__live:
+                return None
+            return self.__accounts[name]["equity"].get(account)
+
+    def updated(self, name):
+        """获取缓存最近一次更新的时间戳，缓存不可用时返回None"""
+        with self.__lock:
+            if name not in self.__live:
+                return None
+            return self.__accounts[name]["updated"]
+
+
+accountfeed = __AccountFeed()
@@ -0,0 +1,242 @@
+# -*- coding:utf-8 -*-
+
+"""
+向量化回测模块
+
+传入整段k线的numpy数组、事先计算好的指标数组以及以布尔数组表示的开平仓条件，
+一次性计算出持仓、成交、每笔盈亏与资金曲线，无需逐根k线调用策略的begin_trade。
+循环只发生在每一笔交易上，开平仓位置的查找与资金曲线的计算均为向量化运算。
+
+盈亏计算方式与POSITION.coverlong_profit、covershort_profit一致：
+    USDT合约（默认）：利润 = 价差 * 持仓数量 * 合约面值
+    币本位合约"usd_contract"：利润 = 价差 * 持仓数量 * 合约面值 / 持仓价格
+    现货"spot"：利润 = 价差 * 持仓数量，只能做多
+
+Author: Gary-Hertel
+Date:   2020/11/25
+email: interstella.ranger2020@gmail.com
+"""
+
+import numpy as np
+
+
+def shift(array, periods=1):
+    """
+    将数组向后平移，空出的位置填充nan，用于以前几根k线上的指标值产生信号，防止信号闪烁
+    :param array: 一维数组
+    :param periods: 平移的k线数量
+    :return: 返回一个一维数组
+    """
+    array = np.asarray(array, dtype=np.float64)
+    result = np.full(len(array), np.nan)
+    if periods < len(array):
+        result[periods:] = array[:len(array) - periods]
+    return result
+
+
+def cross_over(fast, slow):
+    """
+    金叉，当根k线上fast >= slow且上一根k线上fast < slow
+    :return: 返回一个布尔数组
+    """
+    fast = np.asarray(fast, dtype=np.float64)
+    slow = np.asarray(slow, dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        return (fast >= slow) & (shift(fast) < shift(slow))
+
+
+def cross_below(fast, slow):
+    """
+    死叉，当根k线上slow >= fast且上一根k线上slow < fast
+    :return: 返回一个布尔数组
+    """
+    return cross_over(slow, fast)
+
+
+def __profit(direction, entry_price, exit_price, amount, contract_value, market_type):
+    """按照合约类型计算盈亏，参数均可为数组"""
+    if market_type == "usd_contract":
+        return (exit_price - entry_price) * direction * ((amount * contract_value) / entry_price)
+    elif market_type == "spot":
+        return (exit_price - entry_price) * direction * amount
+    else:
+        return (exit_price - entry_price) * direction * (amount * contract_value)
+
+
+def __amount(asset, price, fraction, contract_value, market_type):
+    """按总资金的比例计算开仓数量"""
+    if market_type == "usd_contract":
+        return round(asset * fraction * price / contract_value)
+    elif market_type == "spot":
+        return asset * fraction / price
+    else:
+        return round(asset * fraction / price / contract_value)
+
+
+def __bool_array(array, count):
+    if array is None:
+        return np.zeros(count, dtype=bool)
+    return np.asarray(array, dtype=bool)
+
+
+def vectorized_backtest(open, high, low, close, long_entry=None, long_exit=None, short_entry=None, short_exit=None,
+                        long_stop=None, short_stop=None, entry_price=None, exit_price=None, amount=None,
+                        fraction=None, contract_value=1, market_type=None, start_asset=0):
+    """
+    向量化回测
+    :param open: 开盘价数组
+    :param high: 最高价数组
+    :param low: 最低价数组
+    :param close: 收盘价数组
+    :param long_entry: 开多条件布尔数组，持空仓时出现开多信号则平空开多
+    :param long_exit: 平多条件布尔数组
+    :param short_entry: 开空条件布尔数组，持多仓时出现开空信号则平多开空
+    :param short_exit: 平空条件布尔数组
+    :param long_stop: 多单止损幅度，如0.95表示最低价跌破持仓价格的95%时以该价格止损，开盘价已低于该价格时以开盘价止损
+    :param short_stop: 空单止损幅度，如1.05表示最高价突破持仓价格的105%时以该价格止损，开盘价已高于该价格时以开盘价止损
+    :param entry_price: 开仓成交价数组，默认为开盘价
+    :param exit_price: 信号平仓成交价数组，默认为开盘价
+    :param amount: 每次开仓的固定数量
+    :param fraction: 按当前总资金的比例计算每次开仓数量，如1表示全部资金，与amount二选一，计算出的数量为0时不开仓
+    :param contract_value: 合约面值，现货填1
+    :param market_type: 默认是USDT合约，可填"usd_contract"（币本位合约）或者"spot"(现货)
+    :param start_asset: 初始资金
+    :return: 返回一个字典：
+             "position": 每根k线收盘时的持仓数量数组，多头为正，空头为负
+             "trades": 每笔交易的字典，包含开仓序号、平仓序号、方向、开仓价格、平仓价格、数量、盈亏与平仓原因，值均为数组
+             "profit": 每根k线上已实现的盈亏数组
+             "equity": 以收盘价计算的资金曲线数组
+             "total_profit": 总盈亏, "trade_count": 交易次数, "win_rate": 胜率, "max_drawdown": 最大回撤比例
+    """
+    open = np.asarray(open, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    close = np.asarray(close, dtype=np.float64)
+    count = len(close)
+    long_entry = __bool_array(long_entry, count)
+    short_entry = __bool_array(short_entry, count)
+    long_exit = __bool_array(long_exit, count)
+    short_exit = __bool_array(short_exit, count)
+    if market_type == "spot":
+        short_entry = np.zeros(count, dtype=bool)
+    entry_price = open if entry_price is None else np.asarray(entry_price, dtype=np.float64)
+    exit_price = open if exit_price is None else np.asarray(exit_price, dtype=np.float64)
+    if amount is None and fraction is None:
+        amount = 1
+
+    # 同一根k线上同时出现开多与开空信号时不开仓
+    long_entry, short_entry = long_entry & ~short_entry, short_entry & ~long_entry
+    entries = np.flatnonzero(long_entry | short_entry)
+    long_exits = np.flatnonzero(long_exit)
+    short_exits = np.flatnonzero(short_exit)
+    long_entries = np.flatnonzero(long_entry)
+    short_entries = np.flatnonzero(short_entry)
+
+    trade_entry_index, trade_exit_index, trade_direction = [], [], []
+    trade_entry_price, trade_exit_price, trade_amount, trade_profit, trade_reason = [], [], [], [], []
+    asset = start_asset
+    pointer = 0     # 下一个待处理的开仓信号在entries中的位置
+    start, direction, price = None, 0, 0.0
+    while True:
+        if start is None:   # 空仓时等待下一个开仓信号
+            if pointer >= len(entries):
+                break
+            start = int(entries[pointer])
+            direction = 1 if long_entry[start] else -1
+            price = float(entry_price[start])
+        size = amount if amount is not None else __amount(asset, price, fraction, contract_value, market_type)
+        if size <= 0:   # 资金不足一张合约时开仓数量取整为0，不开仓，继续等待下一个开仓信号
+            pointer = np.searchsorted(entries, start, side="right")
+            start = None
+            continue
+        # 在开仓之后查找最先出现的平仓信号、反向开仓信号与止损
+        if direction == 1:
+            exits, reverses, stop = long_exits, short_entries, long_stop
+        else:
+            exits, reverses, stop = short_exits, long_entries, short_stop
+        position = np.searchsorted(exits, start, side="right")
+        signal_end = int(exits[position]) if position < len(exits) else count
+        position = np.searchsorted(reverses, start, side="right")
+        reverse_end = int(reverses[position]) if position < len(reverses) else count
+        end = min(signal_end, reverse_end)
+        stop_end = count
+        if stop is not None and end > start + 1:
+            stop_price = price * stop
+            window = low[start + 1:end] <= stop_price if direction == 1 else high[start + 1:end] >= stop_price
+            if window.any():
+                stop_end = start + 1 + int(np.argmax(window))
+        if stop_end < count and stop_end <= end:
+            # 开盘价已越过止损价（跳空）时以开盘价成交
+            if direction == 1:
+                close_price = min(float(open[stop_end]), stop_price)
+            else:
+                close_price = max(float(open[stop_end]), stop_price)
+            end, reason = stop_end, "stop"
+        elif end < count:
+            if end == reverse_end:  # 平仓信号与反向开仓信号在同一根k线上时，按反向开仓处理
+                close_price, reason = float(entry_price[end]), "reverse"
+            else:
+                close_price, reason = float(exit_price[end]), "exit"
+        else:
+            end, close_price, reason = count - 1, float(close[-1]), "end"    # 回测结束时仍持仓，以最后收盘价计算
+        profit = __profit(direction, price, close_price, size, contract_value, market_type)
+        asset += profit
+        trade_entry_index.append(start)
+        trade_exit_index.append(end)
+        trade_direction.append(direction)
+        trade_entry_price.append(price)
+        trade_exit_price.append(close_price)
+        trade_amount.append(size)
+        trade_profit.append(profit)
+        trade_reason.append(reason)
+        if reason == "end":
+            break
+        if reason == "reverse":     # 平仓后立即反向开仓
+            start, direction, price = end, -direction, float(entry_price[end])
+        else:   # 平仓后当根k线不再开仓
+            start = None
+        pointer = np.searchsorted(entries, end, side="right")
+
+    trades = {
+        "entry_index": np.array(trade_entry_index, dtype=np.int64),
+        "exit_index": np.array(trade_exit_index, dtype=np.int64),
+        "direction": np.array(trade_direction, dtype=np.int64),
+        "entry_price": np.array(trade_entry_price, dtype=np.float64),
+        "exit_price": np.array(trade_exit_price, dtype=np.float64),
+        "amount": np.array(trade_amount, dtype=np.float64),
+        "profit": np.array(trade_profit, dtype=np.float64),
+        "reason": np.array(trade_reason)
+    }
+    # 持仓区间为[开仓k线, 平仓k线)，以差分数组向量化展开到每一根k线
+    held = trades["exit_index"] + (trades["reason"] == "end")
+    signed = trades["direction"] * trades["amount"]
+    position = np.zeros(count + 1)
+    np.add.at(position, trades["entry_index"], signed)
+    np.add.at(position, held, -signed)
+    position = np.cumsum(position)[:count]
+    hold_price = np.zeros(count + 1)
+    np.add.at(hold_price, trades["entry_index"], trades["entry_price"])
+    np.add.at(hold_price, held, -trades["entry_price"])
+    hold_price = np.cumsum(hold_price)[:count]
+    realized = np.zeros(count)
+    closed = trades["reason"] != "end"
+    np.add.at(realized, trades["exit_index"][closed], trades["profit"][closed])
+    holding = position != 0
+    unrealized = np.zeros(count)
+    unrealized[holding] = __profit(np.sign(position[holding]), hold_price[holding], close[holding],
+                                   np.abs(position[holding]), contract_value, market_type)
+    equity = start_asset + np.cumsum(realized) + unrealized
+    peak = np.maximum.accumulate(equity) if count else equity
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = np.where(peak > 0, (peak - equity) / peak, 0.0)
+    dict = {
+        "position": position,
+        "trades": trades,
+        "profit": realized,
+        "equity": equity,
+        "total_profit": float(trades["profit"].sum()),
+        "trade_count": len(trade_profit),
+        "win_rate": float((trades["profit"] > 0).mean()) if trade_profit else 0.0,
+        "max_drawdown": float(drawdown.max()) if count else 0.0
+    }
+    return dict
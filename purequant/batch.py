@@ -0,0 +1,81 @@
+# -*- coding:utf-8 -*-
+
+"""
+批量下单与批量撤单
+
+网格、阶梯挂单等策略一次需要下几十个订单，逐个调用交易模块的下单接口时每个订单都要等待一次网络往返。
+交易模块的batch_order与batch_revoke将订单按交易所单次批量请求的数量上限分组，每组一次请求，多组在线程池中并发发送，
+请求频率由exchange.limiter控制。交易所没有批量接口时每组只有一个订单，仍然并发发送。
+
+一组请求超时或断线时交易所可能已经处理了该请求，不能简单地视为下单失败，否则策略重发时会重复下单。
+有批量接口的交易模块为每个订单附带客户订单号，请求整体失败后通过reconcile按客户订单号查询实际的下单结果；
+无法确认的订单以及没有批量接口的交易模块中因网络异常失败的订单，结果为UnknownOrderError，策略应查询挂单后再决定是否重发。
+
+Author: Gary-Hertel
+Date:   2020/12/07
+email: interstella.ranger2020@gmail.com
+"""
+
+import time
+import uuid
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from purequant.config import config
+from purequant.exceptions import CunstomException, SendOrderError, UnknownOrderError
+from purequant.logger import logger
+
+__sequence = itertools.count(int(time.time() * 1000) * 1000)    # 火币的客户订单号为递增的整数
+
+
+def client_oid():
+    """生成字母开头、由字母与数字组成的32位客户订单号，如okex的client_oid"""
+    return "pq" + uuid.uuid4().hex[:30]
+
+
+def client_order_id():
+    """生成递增的整数客户订单号，如火币的client_order_id"""
+    return next(__sequence)
+
+
+def reconcile(client_oids, query, error):
+    """
+    一组批量下单请求整体失败后，按客户订单号查询这组订单实际的下单结果
+    :param client_oids: 该组每个订单的客户订单号
+    :param query: 函数query(client_oids)，返回字典{客户订单号: 订单号}，只包含交易所中存在的订单，查询失败时抛出异常
+    :param error: 下单请求的异常
+    :return: 返回与client_oids顺序一致的列表，已下单的位置为订单号，确认未下单的位置为SendOrderError，无法确认的位置为UnknownOrderError
+    """
+    try:
+        placed = query(client_oids)
+    except Exception as e:
+        logger.warning("批量下单请求失败后查询下单结果失败，{}个订单状态未知：{}".format(len(client_oids), e))
+        return [UnknownOrderError("下单请求失败：{}，查询下单结果失败：{}".format(error, e), oid) for oid in client_oids]
+    return [placed[oid] if oid in placed else SendOrderError(str(error)) for oid in client_oids]
+
+
+def batch(items, limit, send, failed=None):
+    """
+    分组并发发送
+    :param items: 订单列表
+    :param limit: 每组最多包含的订单数量，即交易所单次批量请求的数量上限
+    :param send: 函数send(group)，发送一组订单，返回与group顺序一致、数量相同的结果列表
+    :param failed: 函数failed(异常)，某一组请求整体失败时由异常生成该组每个订单的结果，
+                   默认交易模块抛出的自定义异常原样返回，超时、断线等其他异常视为订单状态未知，返回UnknownOrderError
+    :return: 返回与items顺序一致的结果列表
+    """
+    items = list(items)
+    groups = [items[i:i + limit] for i in range(0, len(items), limit)]
+    if failed is None:
+        failed = lambda e: e if isinstance(e, CunstomException) else UnknownOrderError(str(e))
+
+    def run(group):
+        try:
+            return send(group)
+        except Exception as e:
+            return [failed(e)] * len(group)
+
+    if len(groups) <= 1:
+        return run(groups[0]) if groups else []
+    with ThreadPoolExecutor(max_workers=min(len(groups), config.order_workers)) as executor:
+        results = executor.map(run, groups)
+        return [result for group in results for result in group]
@@ -53,6 +53,10 @@ class __Config:
         reissue_order_overprice_range_str = configures["ASSISTANT"]["reissue_order"]
         self.reissue_order = float((reissue_order_overprice_range_str.split("%"))[0]) / 100
         self.automatic_cancellation = configures["ASSISTANT"]["automatic_cancellation"]
+        # 订单管理在选择价格撤单时查询未完成订单状态与最新成交价的间隔（秒）、撤单后订单仍未终止时的最多撤单次数与执行网络请求的线程数量
+        self.order_poll_seconds = configures["ASSISTANT"].get("poll_seconds", 1)
+        self.order_cancel_attempts = configures["ASSISTANT"].get("cancel_attempts", 5)
+        self.order_workers = configures["ASSISTANT"].get("workers", 10)
         # MONGODB AUTHORIZATION
         self.mongodb_authorization = configures["MONGODB"]["authorization"]
         self.mongodb_user_name = configures["MONGODB"]["user_name"]
@@ -61,8 +65,31 @@ class __Config:
         self.mysql_authorization = configures["MYSQL"]["authorization"]
         self.mysql_user_name = configures["MYSQL"]["user_name"]
         self.mysql_password = configures["MYSQL"]["password"]
+        # MYSQL 策略运行记录的延迟写入：是否启用、队列最大行数、按行数与按时间写入的阈值、队列满时的最长等待秒数、
+        # 数据库可以连接但某一行写入失败时的最多重试次数
+        self.mysql_write_behind = configures["MYSQL"].get("write_behind", True)
+        self.mysql_queue_size = configures["MYSQL"].get("queue_size", 10000)
+        self.mysql_flush_rows = configures["MYSQL"].get("flush_rows", 500)
+        self.mysql_flush_seconds = configures["MYSQL"].get("flush_seconds", 1)
+        self.mysql_put_timeout = configures["MYSQL"].get("put_timeout", 1)
+        self.mysql_max_retries = configures["MYSQL"].get("max_retries", 5)
+        # DATABANK 数据库后端："mysql"或"sqlite"，使用sqlite时无需数据库服务，数据库文件保存在path目录下
+        self.databank_engine = configures.get("DATABANK", {}).get("engine", "mysql")
+        self.databank_path = configures.get("DATABANK", {}).get("path", "./databank")
         # BACKTEST
         self.backtest = configures["MODE"]["backtest"]
+        # KLINE 实盘模式下k线快照的刷新间隔（秒），同一间隔内的指标与行情计算共用一次k线请求
+        self.kline_refresh_seconds = configures.get("KLINE", {}).get("refresh_seconds", 1)
+        # HTTP 交易所REST接口每个域名的连接池大小、默认超时秒数与是否按交易所限速规则排队，
+        # 签名时间戳是否按服务器时钟偏差修正以及偏差的采样间隔（秒）
+        self.http_pool_size = configures.get("HTTP", {}).get("pool_size", 10)
+        self.http_timeout = configures.get("HTTP", {}).get("timeout", 10)
+        self.http_rate_limit = configures.get("HTTP", {}).get("rate_limit", True)
+        self.clock_sync = configures.get("HTTP", {}).get("clock_sync", True)
+        self.clock_interval = configures.get("HTTP", {}).get("clock_interval", 60)
+        # INSTRUMENT 交易对信息缓存的有效期（秒）与缓存文件路径
+        self.instrument_ttl = configures.get("INSTRUMENT", {}).get("ttl", 86400)
+        self.instrument_path = configures.get("INSTRUMENT", {}).get("path", "./instruments.json")
         # PROXY
         self.proxy_host = configures["PROXY"].split(":")[0]
         self.proxy_port = configures["PROXY"].split(":")[1]
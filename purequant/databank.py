@@ -0,0 +1,648 @@
+# -*- coding:utf-8 -*-
+
+"""
+数据库后端
+
+storage中所有读写数据库的方法都通过databank完成，根据配置文件中的DATABANK.engine选择后端：
+    "mysql"（默认）：MySQL连接池，连接使用后归还而不是关闭，已确认存在的数据库与数据表缓存在进程内，
+                    每个连接上缓存预处理语句，之后每次写入只需一次往返。
+    "sqlite"：嵌入式SQLite，每个数据库对应DATABANK.path目录下的一个文件，无需安装和启动数据库服务，
+              使用WAL日志模式，批量写入在同一个事务中完成，每张表的第一列（时间）建立索引。
+策略运行记录等日志类数据可以先放入内存队列，由后台线程按数量或时间批量写入，不阻塞交易流程。
+
+Author: Gary-Hertel
+Date:   2020/11/28
+email: interstella.ranger2020@gmail.com
+"""
+
+import os
+import time
+import queue
+import sqlite3
+import atexit
+import threading
+from collections import deque
+import mysql.connector
+from purequant.config import config
+from purequant.logger import logger
+from purequant.exceptions import DataBankError
+
+
+class MYSQLBACKEND:
+    """MySQL连接池与数据表结构缓存"""
+
+    def __init__(self, pool_size=8):
+        self.__pool_size = pool_size
+        self.__idle = {}    # 数据库名称 -> 空闲连接队列，每个元素为[连接, {sql: 预处理游标}]
+        self.__databases = set()    # 已确认存在的数据库
+        self.__tables = set()   # 已确认存在的(数据库, 数据表)
+        self.__statements = {}  # (数据库, 数据表, 列名) -> 插入语句
+        self.__lock = threading.Lock()
+
+    def __connect(self, database):
+        user = config.mysql_user_name if config.mysql_authorization else 'root'
+        password = config.mysql_password if config.mysql_authorization else 'root'
+        if database is None:
+            conn = mysql.connector.connect(user=user, password=password, autocommit=True)
+        else:
+            conn = mysql.connector.connect(user=user, password=password, database=database, autocommit=True)
+        return [conn, {}]
+
+    def __acquire(self, database):
+        with self.__lock:
+            idle = self.__idle.setdefault(database, queue.LifoQueue())
+        try:
+            return idle.get_nowait()
+        except queue.Empty:
+            return self.__connect(database)
+
+    def __release(self, database, item):
+        idle = self.__idle.get(database)
+        if idle is not None and idle.qsize() < self.__pool_size:
+            idle.put(item)
+        else:
+            item[0].close()
+
+    def __run(self, database, func):
+        """从连接池中取出一个连接执行func，连接已断开时重新连接并重试一次"""
+        item = self.__acquire(database)
+        try:
+            try:
+                return func(item)
+            except (mysql.connector.OperationalError, mysql.connector.InterfaceError):
+                try:
+                    item[0].close()
+                except Exception:
+                    pass
+                item = self.__connect(database)
+                return func(item)
+        finally:
+            self.__release(database, item)
+
+    def execute(self, database, sql, params=None):
+        """
+        执行一条不返回数据的语句
+        :param database: 数据库名称，为None时连接到服务器而不指定数据库
+        :param sql: sql语句
+        :param params: 语句参数
+        :return:
+        """
+        def func(item):
+            cursor = item[0].cursor()
+            try:
+                cursor.execute(sql, params)
+            finally:
+                cursor.close()
+        self.__run(database, func)
+
+    def query(self, database, sql, params=None, fetch="all"):
+        """
+        执行一条查询语句
+        :param database: 数据库名称
+        :param sql: sql语句
+        :param params: 语句参数
+        :param fetch: "all"返回全部数据，"one"返回第一行数据
+        :return: 返回查询到的数据
+        """
+        def func(item):
+            cursor = item[0].cursor(buffered=True)
+            try:
+                cursor.execute(sql, params)
+                return cursor.fetchall() if fetch == "all" else cursor.fetchone()
+            finally:
+                cursor.close()
+        return self.__run(database, func)
+
+    def iterate(self, database, sql, params=None, chunksize=10000):
+        """
+        执行一条查询语句，分批从服务器读取数据，不将全部结果一次性读入内存
+        :param database: 数据库名称
+        :param sql: sql语句
+        :param params: 语句参数
+        :param chunksize: 每批读取的行数
+        :return: 返回一个生成器，每次产生一个最多包含chunksize行数据的列表
+        """
+        item = self.__acquire(database)
+        finished = False
+        cursor = item[0].cursor()
+        try:
+            cursor.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                yield rows
+            finished = True
+        finally:
+            if finished:
+                cursor.close()
+                self.__release(database, item)
+            else:   # 未读完全部结果时连接上仍有未读取的数据，直接关闭而不归还连接池
+                item[0].close()
+
+    def columns(self, database, data_sheet):
+        """
+        获取数据表的列名
+        :param database: 数据库名称
+        :param data_sheet: 数据表名称
+        :return: 返回按数据表中顺序排列的列名列表
+        """
+        return [row[0] for row in self.query(database, "SHOW COLUMNS FROM {}".format(data_sheet))]
+
+    def ensure_table(self, database, data_sheet, columns):
+        """
+        确认数据库与数据表存在，如不存在则创建，已确认过的数据表不再查询服务器
+        :param database: 数据库名称
+        :param data_sheet: 数据表名称
+        :param columns: 数据表的列，格式为((列名, 类型), ...)
+        :return:
+        """
+        if (database, data_sheet) in self.__tables:
+            return
+        if database not in self.__databases:
+            self.execute(None, "CREATE DATABASE IF NOT EXISTS {}".format(database))
+            self.__databases.add(database)
+        self.execute(database, "CREATE TABLE IF NOT EXISTS {} ({})".format(
+            data_sheet, ", ".join("{} {}".format(name, kind) for name, kind in columns)))
+        self.__tables.add((database, data_sheet))
+
+    def insert(self, database, data_sheet, columns, values):
+        """
+        插入一行数据，数据表不存在时自动创建
+        :param database: 数据库名称
+        :param data_sheet: 数据表名称
+        :param columns: 数据表的列，格式为((列名, 类型), ...)
+        :param values: 要插入的数据，与columns中除自增列以外的列一一对应
+        :return:
+        """
+        self.ensure_table(database, data_sheet, columns)
+        names = tuple(name for name, kind in columns if "AUTO_INCREMENT" not in kind.upper())     # 自增列由数据库生成
+        key = (database, data_sheet, names)
+        sql = self.__statements.get(key)
+        if sql is None:
+            sql = 'insert into {} ({}) values ({})'.format(data_sheet, ", ".join(names), ", ".join(["%s"] * len(names)))
+            self.__statements[key] = sql
+
+        def func(item):
+            cursor = item[1].get(sql)
+            if cursor is None:  # 每个连接上的同一条语句只预处理一次
+                cursor = item[1][sql] = item[0].cursor(prepared=True)
+            cursor.execute(sql, tuple(values))
+        try:
+            self.__run(database, func)
+        except mysql.connector.ProgrammingError:  # 数据表在进程外被删除时，清除缓存后重新建表再写入一次
+            self.__databases.discard(database)
+            self.__tables.discard((database, data_sheet))
+            self.ensure_table(database, data_sheet, columns)
+            self.__run(database, func)
+
+    def insert_many(self, database, data_sheet, columns, rows, batch_size=1000):
+        """
+        批量写入多行数据，每批拼接为一条多行INSERT语句，全部批次在同一个事务中提交，
+        数据表有主键时主键重复的行更新为新的数据，重复写入同一段数据不会产生重复行
+        :param database: 数据库名称
+        :param data_sheet: 数据表名称
+        :param columns: 数据表的列，格式为((列名, 类型), ...)，类型中可以包含"PRIMARY KEY"
+        :param rows: 要写入的数据，每一行与columns中除自增列以外的列一一对应
+        :param batch_size: 每条INSERT语句包含的行数
+        :return: 返回写入的行数
+        """
+        rows = [tuple(row) for row in rows]
+        if not rows:
+            return 0
+        self.ensure_table(database, data_sheet, columns)
+        names = [name for name, kind in columns if "AUTO_INCREMENT" not in kind.upper()]    # 自增列由数据库生成
+        placeholder = "({})".format(", ".join(["%s"] * len(names)))
+        update = ", ".join("{0} = VALUES({0})".format(name) for name in names)
+
+        def statement(count):
+            return 'insert into {} ({}) values {} ON DUPLICATE KEY UPDATE {}'.format(
+                data_sheet, ", ".join(names), ", ".join([placeholder] * count), update)
+
+        def func(item):
+            conn = item[0]
+            cursor = conn.cursor()
+            try:
+                conn.start_transaction()
+                for start in range(0, len(rows), batch_size):
+                    batch = rows[start:start + batch_size]
+                    cursor.execute(statement(len(batch)), [value for row in batch for value in row])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        self.__run(database, func)
+        return len(rows)
+
+    def drop_database(self, database):
+        """
+        删除数据库，同时清除该数据库的结构缓存与空闲连接
+        :param database: 数据库名称
+        :return:
+        """
+        self.execute(None, "DROP DATABASE IF EXISTS {}".format(database))
+        self.__databases.discard(database)
+        self.__tables = {table for table in self.__tables if table[0] != database}
+        with self.__lock:
+            idle = self.__idle.pop(database, None)
+        while idle is not None and not idle.empty():
+            idle.get_nowait()[0].close()
+
+    def close(self):
+        """关闭连接池中的所有空闲连接"""
+        with self.__lock:
+            pools, self.__idle = self.__idle, {}
+        for idle in pools.values():
+            while not idle.empty():
+                idle.get_nowait()[0].close()
+
+
+
+
+class SQLITEBACKEND:
+    """嵌入式SQLite后端，接口与MYSQLBACKEND一致"""
+
+    def __init__(self, path=None):
+        """
+        :param path: 数据库文件所在目录，每个数据库对应其中的一个"数据库名称.db"文件
+        """
+        self.__path = path or "./databank"
+        self.__local = threading.local()    # 每个线程使用各自的连接
+        self.__connections = []     # 所有线程打开的连接，删除数据库时统一关闭
+        self.__tables = set()   # 已确认存在的(数据库, 数据表)
+        self.__generations = {}     # 数据库 -> 删除次数，线程缓存的连接与当前次数不一致时说明已被其他线程关闭
+        self.__lock = threading.Lock()
+
+    def __file(self, database):
+        return os.path.join(self.__path, "{}.db".format(database))
+
+    def __connection(self, database):
+        connections = getattr(self.__local, "connections", None)
+        if connections is None:
+            connections = self.__local.connections = {}
+        generation = self.__generations.get(database, 0)
+        generation_cached, conn = connections.get(database, (None, None))
+        if conn is None or generation_cached != generation:
+            os.makedirs(self.__path, exist_ok=True)
+            conn = sqlite3.connect(self.__file(database), timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")     # 写入时不阻塞读取，追加写入只需顺序写日志文件
+            conn.execute("PRAGMA synchronous=NORMAL")
+            connections[database] = (generation, conn)
+            with self.__lock:
+                self.__connections.append((database, conn))
+        return conn
+
+    def execute(self, database, sql, params=None):
+        """
+        执行一条不返回数据的语句
+        :param database: 数据库名称
+        :param sql: sql语句，参数占位符可以使用%s
+        :param params: 语句参数
+        :return:
+        """
+        self.__connection(database).execute(sql.replace("%s", "?"), params or ())
+
+    def query(self, database, sql, params=None, fetch="all"):
+        """
+        执行一条查询语句
+        :param database: 数据库名称
+        :param sql: sql语句，参数占位符可以使用%s
+        :param params: 语句参数
+        :param fetch: "all"返回全部数据，"one"返回第一行数据
+        :return: 返回查询到的数据
+        """
+        cursor = self.__connection(database).execute(sql.replace("%s", "?"), params or ())
+        try:
+            return cursor.fetchall() if fetch == "all" else cursor.fetchone()
+        finally:
+            cursor.close()
+
+    def iterate(self, database, sql, params=None, chunksize=10000):
+        """
+        执行一条查询语句，分批读取数据，不将全部结果一次性读入内存
+        :param database: 数据库名称
+        :param sql: sql语句，参数占位符可以使用%s
+        :param params: 语句参数
+        :param chunksize: 每批读取的行数
+        :return: 返回一个生成器，每次产生一个最多包含chunksize行数据的列表
+        """
+        cursor = self.__connection(database).execute(sql.replace("%s", "?"), params or ())
+        try:
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def columns(self, database, data_sheet):
+        """
+        获取数据表的列名
+        :param database: 数据库名称
+        :param data_sheet: 数据表名称
+        :return: 返回按数据表中顺序排列的列名列表
+        """
+        return [row[1] for row in self.query(database, "PRAGMA table_info({})".format(data_sheet))]
+
+    def ensure_table(self, database, data_sheet, columns):
+        """
+        确认数据表存在，如不存在则创建，第一列不是主键的数据表在第一列上建立索引，
+        MySQL的自增主键"AUTO_INCREMENT"转换为SQLite的"INTEGER PRIMARY KEY AUTOINCREMENT"
+        :param database: 数据库名称
+        :param data_sheet: 数据表名称
+        :param columns: 数据表的列，格式为((列名, 类型), ...)
+        :return:
+        """
+        if (database, data_sheet) in self.__tables:
+            return
+        conn = self.__connection(database)
+        conn.execute("CREATE TABLE IF NOT EXISTS {} ({})".format(data_sheet, ", ".join(
+            "{} {}".format(name, "INTEGER PRIMARY KEY AUTOINCREMENT" if "AUTO_INCREMENT" in kind.upper() else kind)
+            for name, kind in columns)))
+        if "PRIMARY KEY" not in columns[0][1].upper():
+            conn.execute("CREATE INDEX IF NOT EXISTS {0}_{1}_index ON {0} ({1})".format(data_sheet, columns[0][0]))
+        self.__tables.add((database, data_sheet))
+
+    def insert(self, database, data_sheet, columns, values):
+        """
+        插入一行数据，数据表不存在时自动创建，sqlite3会缓存每个连接上预处理过的语句
+        :param database: 数据库名称
+        :param data_sheet: 数据表名称
+        :param columns: 数据表的列，格式为((列名, 类型), ...)
+        :param values: 要插入的数据，与columns中除自增列以外的列一一对应
+        :return:
+        """
+        self.insert_many(database, data_sheet, columns, [values])
+
+    def insert_many(self, database, data_sheet, columns, rows, batch_size=None):
+        """
+        批量写入多行数据，全部数据在同一个事务中提交，数据表有主键时主键重复的行替换为新的数据
+        :param database: 数据库名称
+        :param data_sheet: 数据表名称
+        :param columns: 数据表的列，格式为((列名, 类型), ...)
+        :param rows: 要写入的数据，每一行与columns中除自增列以外的列一一对应
+        :param batch_size: 与MYSQLBACKEND保持一致，不使用
+        :return: 返回写入的行数
+        """
+        rows = [tuple(row) for row in rows]
+        if not rows:
+            return 0
+        self.ensure_table(database, data_sheet, columns)
+        names = [name for name, kind in columns if "AUTO_INCREMENT" not in kind.upper()]    # 自增列由数据库生成
+        sql = 'insert or replace into {} ({}) values ({})'.format(data_sheet, ", ".join(names), ", ".join(["?"] * len(names)))
+        conn = self.__connection(database)
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(sql, rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(rows)
+
+    def drop_database(self, database):
+        """
+        删除数据库文件
+        :param database: 数据库名称
+        :return:
+        """
+        with self.__lock:
+            connections = [conn for name, conn in self.__connections if name == database]
+            self.__connections = [item for item in self.__connections if item[0] != database]
+            self.__generations[database] = self.__generations.get(database, 0) + 1     # 其他线程缓存的连接下次使用时重新打开
+        for conn in connections:
+            conn.close()
+        self.__tables = {table for table in self.__tables if table[0] != database}
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.__file(database) + suffix):
+                os.remove(self.__file(database) + suffix)
+
+    def close(self):
+        """关闭所有连接"""
+        with self.__lock:
+            connections, self.__connections = self.__connections, []
+        for name, conn in connections:
+            conn.close()
+        self.__local = threading.local()
+
+
+class __DataBank:
+    """按配置选择数据库后端，并提供延迟写入队列"""
+
+    def __init__(self):
+        self.__backend = None
+        self.__lock = threading.Lock()
+        # 延迟写入队列
+        self.__pending = deque()    # 每个元素为(数据库, 数据表, 列, 行数据, 已失败次数)
+        self.__dead = deque(maxlen=1000)    # 多次写入失败而移出队列的数据，每个元素为(数据库, 数据表, 列, 行数据, 错误)
+        self.__condition = threading.Condition()
+        self.__flush_lock = threading.Lock()    # 保证同一时间只有一个线程在写入队列中的数据，写入顺序与放入顺序一致
+        self.__worker = None
+        self.__queue_stats = {"written": 0, "dropped": 0, "flushes": 0, "errors": 0, "dead": 0}
+
+    @property
+    def backend(self):
+        """当前使用的数据库后端，第一次使用时按配置文件中的DATABANK.engine创建"""
+        if self.__backend is None:
+            with self.__lock:
+                if self.__backend is None:
+                    if config.databank_engine == "sqlite":
+                        self.__backend = SQLITEBACKEND(config.databank_path)
+                    elif config.databank_engine == "mysql":
+                        self.__backend = MYSQLBACKEND()
+                    else:
+                        raise DataBankError("数据库后端设置错误，必须是mysql或sqlite!")
+        return self.__backend
+
+    def use(self, backend):
+        """
+        指定数据库后端，例如databank.use(SQLITEBACKEND("./databank"))
+        :param backend: MYSQLBACKEND或SQLITEBACKEND
+        :return:
+        """
+        self.flush()
+        self.__backend = backend
+
+    def execute(self, database, sql, params=None):
+        """执行一条不返回数据的语句"""
+        self.backend.execute(database, sql, params)
+
+    def query(self, database, sql, params=None, fetch="all"):
+        """
+        执行一条查询语句，查询前先写入延迟写入队列中的数据，保证读到的是最新数据
+        :param database: 数据库名称
+        :param sql: sql语句
+        :param params: 语句参数
+        :param fetch: "all"返回全部数据，"one"返回第一行数据
+        :return: 返回查询到的数据
+        """
+        self.flush()    # 即使队列为空也要调用，等待后台线程正在进行的写入完成
+        return self.backend.query(database, sql, params, fetch)
+
+    def iterate(self, database, sql, params=None, chunksize=10000):
+        """
+        执行一条查询语句，分批读取数据，查询前先写入延迟写入队列中的数据
+        :param database: 数据库名称
+        :param sql: sql语句
+        :param params: 语句参数
+        :param chunksize: 每批读取的行数
+        :return: 返回一个生成器，每次产生一个最多包含chunksize行数据的列表
+        """
+        self.flush()
+        return self.backend.iterate(database, sql, params, chunksize)
+
+    def columns(self, database, data_sheet):
+        """获取数据表的列名，查询前先写入延迟写入队列中的数据"""
+        self.flush()
+        return self.backend.columns(database, data_sheet)
+
+    def insert(self, database, data_sheet, columns, values):
+        """插入一行数据，数据表不存在时自动创建"""
+        self.backend.insert(database, data_sheet, columns, values)
+
+    def insert_many(self, database, data_sheet, columns, rows, batch_size=1000):
+        """批量写入多行数据，主键重复的行更新为新的数据，返回写入的行数"""
+        return self.backend.insert_many(database, data_sheet, columns, rows, batch_size)
+
+    def insert_later(self, database, data_sheet, columns, values):
+        """
+        将一行数据放入延迟写入队列后立即返回，由后台线程批量写入，
+        队列中的行数达到MYSQL配置中的flush_rows或距上次写入超过flush_seconds秒时写入一次，程序退出时写入剩余数据，
+        队列已满时等待put_timeout秒，仍无空位则丢弃这一行并计入丢弃数量
+        :param database: 数据库名称
+        :param data_sheet: 数据表名称
+        :param columns: 数据表的列，格式为((列名, 类型), ...)
+        :param values: 要插入的数据，与columns一一对应
+        :return: 放入队列返回True，被丢弃返回False
+        """
+        self.__start()
+        deadline = time.monotonic() + config.mysql_put_timeout
+        with self.__condition:
+            while len(self.__pending) >= config.mysql_queue_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.__queue_stats["dropped"] += 1
+                    logger.error("数据库写入队列已满，丢弃数据：{} {} {}".format(database, data_sheet, values))
+                    return False
+                self.__condition.notify()
+                self.__condition.wait(remaining)
+            self.__pending.append((database, data_sheet, tuple(columns), tuple(values), 0))
+            if len(self.__pending) >= config.mysql_flush_rows:
+                self.__condition.notify()
+        return True
+
+    def __start(self):
+        if self.__worker is None:
+            with self.__lock:
+                if self.__worker is None:
+                    self.__worker = threading.Thread(target=self.__drain, name="purequant-databank", daemon=True)
+                    self.__worker.start()
+
+    def __drain(self):
+        """后台线程，按数量或时间阈值写入队列中的数据"""
+        while True:
+            with self.__condition:
+                if len(self.__pending) < config.mysql_flush_rows:
+                    self.__condition.wait(config.mysql_flush_seconds)
+            self.flush()
+
+    def __reachable(self, database):
+        """批量写入失败后检查数据库能否连接，用于区分数据库故障与个别数据无法写入"""
+        try:
+            self.backend.query(database, "SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    def __discard(self, item, error):
+        """将多次写入失败的数据移出队列，保存在dead_letters中"""
+        database, data_sheet, columns, values, attempts = item
+        self.__dead.append((database, data_sheet, columns, values, str(error)))
+        self.__queue_stats["dead"] += 1
+        logger.error("数据写入失败，已移出写入队列：{} {} {} 错误：{}".format(database, data_sheet, values, error))
+
+    def flush(self):
+        """
+        立即写入延迟写入队列中的全部数据，同一张表的数据合并为一次批量写入。
+        批量写入失败时，如数据库无法连接，整批数据放回队列下次重试；如数据库可以连接，则逐行写入，
+        仍然写入失败的行放回队列，失败次数达到MYSQL配置中的max_retries后移出队列，可通过dead_letters获取。
+        放回队列的数据不超过队列的最大行数，超出的部分同样移出队列
+        :return: 返回写入的行数
+        """
+        with self.__flush_lock:
+            with self.__condition:
+                items = list(self.__pending)
+                self.__pending.clear()
+                self.__condition.notify_all()
+            if not items:
+                return 0
+            groups = {}
+            for item in items:
+                groups.setdefault(item[:3], []).append(item)
+            written, failed = 0, []
+            for (database, data_sheet, columns), group in groups.items():
+                try:
+                    written += self.insert_many(database, data_sheet, columns, [item[3] for item in group])
+                    continue
+                except Exception as e:
+                    self.__queue_stats["errors"] += 1
+                    error = e
+                if not self.__reachable(database):
+                    failed.extend(group)
+                    logger.error("数据库批量写入失败，将在下次写入时重试！错误：{}".format(str(error)))
+                    continue
+                for item in group:  # 数据库可以连接，逐行写入，找出无法写入的行
+                    try:
+                        written += self.insert_many(database, data_sheet, columns, [item[3]])
+                    except Exception as e:
+                        if item[4] + 1 >= config.mysql_max_retries:
+                            self.__discard(item, e)
+                        else:
+                            failed.append(item[:4] + (item[4] + 1,))
+                            logger.error("数据写入失败，将在下次写入时重试：{} {} {} 错误：{}".format(
+                                database, data_sheet, item[3], e))
+            with self.__condition:
+                space = max(config.mysql_queue_size - len(self.__pending), 0)
+                for item in failed[space:]:     # 队列已满，放不回队列的数据按写入时间从晚到早移出
+                    self.__discard(item, "写入队列已满")
+                self.__pending.extendleft(reversed(failed[:space]))
+                self.__queue_stats["written"] += written
+                self.__queue_stats["flushes"] += 1
+            return written
+
+    def queue_info(self):
+        """
+        获取延迟写入队列的状态
+        :return: 返回一个字典 {"depth": 队列中等待写入的行数, "written": 已写入行数, "dropped": 丢弃行数,
+                 "flushes": 写入次数, "errors": 写入失败次数, "dead": 多次写入失败而移出队列的行数}
+        """
+        with self.__condition:
+            result = {"depth": len(self.__pending)}
+            result.update(self.__queue_stats)
+        return result
+
+    def dead_letters(self):
+        """
+        获取多次写入失败而移出延迟写入队列的数据，最多保留最近的1000行
+        :return: 返回列表，每个元素为(数据库, 数据表, 列, 行数据, 错误)
+        """
+        with self.__condition:
+            return list(self.__dead)
+
+    def drop_database(self, database):
+        """删除数据库"""
+        self.flush()
+        self.backend.drop_database(database)
+
+    def close(self):
+        """写入队列中的数据并关闭所有连接"""
+        self.flush()
+        if self.__backend is not None:
+            self.__backend.close()
+
+
+databank = __DataBank()
+atexit.register(databank.flush)     # 程序退出时写入延迟写入队列中剩余的数据
@@ -7,9 +7,9 @@
 
 import asyncio
 from trade.bitmexws import BITMEXWS
+from purequant.trade import ASYNCEXCHANGE
 from purequant.config import config
 from purequant.logger import logger
-from purequant.time import sleep
 
 
 class Strategy:
@@ -18,6 +18,7 @@ class Strategy:
 
         config.loads('config.json')
         self.exchange = BITMEXWS(config.access_key, config.secret_key, instrument_id="XBTUSD", leverage=10, testing=True)
+        self.async_exchange = ASYNCEXCHANGE(self.exchange)     # 撤单与下单在线程池中执行，不阻塞其他事件的处理
 
         self.order_no = None  # 创建订单的id
         self.asset = None  # 账户资金
@@ -36,7 +37,7 @@ class Strategy:
         # 如果存在挂单但不在价格区间内，就撤单；如果没有挂单也执行挂单操作
         else:
             if self.order_no:
-                self.exchange.revoke_order(self.order_no)
+                await self.async_exchange.revoke_order(self.order_no)
                 logger.info("撤销订单:{}".format(self.order_no))
             # 创建新订单
             new_price = (bid1_price + bid5_price) / 2
@@ -44,9 +45,9 @@ class Strategy:
             quantity = 5  # 假设委托数量为5
             # 限价订单
             order_no = self.exchange.generate_uuid()  # 生成机器码作为自己维护的client order id
-            self.exchange.buy(price, quantity, clOrdID=order_no)
+            await self.async_exchange.buy(price, quantity, clOrdID=order_no)
             logger.info("创建订单:{}".format(order_no))
-            sleep(0.5)  # 下单后等待一下，因为websocket获取当前挂单信息也有延迟，防止重复挂单
+            await asyncio.sleep(0.5)  # 下单后等待一下，因为websocket获取当前挂单信息也有延迟，防止重复挂单
 
     async def on_event_asset_update(self):
         """资产更新"""
@@ -38,8 +38,8 @@ class Strategy:
             storage.mysql_save_strategy_run_info(self.database, self.datasheet, get_localtime(),
                                                  "none", 0, 0, 0, 0, "none", 0, 0, 0, start_asset)
         # 读取数据库中保存的总资金数据
-        self.total_asset = storage.read_mysql_datas(0, self.database, self.datasheet, "总资金", ">")[-1][-1]
-        self.total_profit = storage.read_mysql_datas(0, self.database, self.datasheet, "总资金", ">")[-1][-2]  # 策略总盈亏
+        self.total_asset = storage.read_mysql_latest(self.database, self.datasheet)[10]
+        self.total_profit = storage.read_mysql_latest(self.database, self.datasheet)[9]  # 策略总盈亏
         # 策略参数
         self.contract_value = self.market.contract_value()  # 合约面值
         self.counter = 0  # 计数器
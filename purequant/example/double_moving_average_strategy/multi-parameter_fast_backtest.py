@@ -12,15 +12,18 @@ Date:   2020/08/21
 email: interstella.ranger2020@gmail.com
 """
 
-from purequant.indicators import INDICATORS
+from purequant.indicators import INDICATORS, sma_matrix
 from purequant.trade import OKEXFUTURES
 from purequant.position import POSITION
 from purequant.market import MARKET
 from purequant.logger import logger
 from purequant.push import push
 from purequant.storage import storage
+from purequant.databank import databank
 from purequant.time import *
 from purequant.config import config
+from purequant.backtest import vectorized_backtest, shift, cross_over, cross_below
+from purequant.sweep import parameter_sweep
 
 class Strategy:
 
@@ -39,7 +42,7 @@ class Strategy:
             storage.mysql_save_strategy_run_info(self.database, self.datasheet, "策略参数为" + str(fast_length) + "&" + str(slow_length),
                                             "none", 0, 0, 0, 0, "none", 0, 0, 0, start_asset)
         # 读取数据库中保存的总资金数据
-        self.total_asset = storage.read_mysql_datas(0, self.database, self.datasheet, "总资金", ">")[-1][-1]
+        self.total_asset = storage.read_mysql_latest(self.database, self.datasheet)[10]
         self.counter = 0  # 计数器
         self.fast_length = fast_length  # 短周期均线长度
         self.slow_length = slow_length  # 长周期均线长度
@@ -171,30 +174,39 @@ class Strategy:
         except:
             logger.info()
 
+def double_ma_backtest(kline, fast_length, slow_length, contract_value):
+    """
+    以向量化方式回测一组均线参数，供parameter_sweep在子进程中调用，信号与开平仓价格同Strategy.begin_trade，止损的处理不同：
+    开仓的那根k线上不检查止损，而begin_trade在开仓的k线上即检查止损；
+    开盘价已越过止损价时以开盘价止损，而begin_trade总是以持仓价格乘以止损幅度成交
+    """
+    ma = sma_matrix(kline["close"], [fast_length, slow_length])
+    fast_ma, slow_ma = shift(ma[0]), shift(ma[1])     # 不用当根k线上的ma来计算信号，防止信号闪烁
+    return vectorized_backtest(kline["open"], kline["high"], kline["low"], kline["close"],
+                               long_entry=cross_over(fast_ma, slow_ma), short_entry=cross_below(fast_ma, slow_ma),
+                               long_stop=0.95, short_stop=1.05, fraction=1, contract_value=contract_value, start_asset=1000)
+
 if __name__ == "__main__":
 
     config.loads('config.json')
     if config.backtest:  # 回测模式
         instrument_id = "LTC-USDT-201225"
         time_frame = "1d"
-        fast_length_list = range(5, 20, 2)
-        slow_length_list = range(10, 30, 2)
         start_time = get_cur_timestamp()
-        for i in fast_length_list:
-            fast_length = i
-            for j in slow_length_list:
-                slow_length = j
-                print("策略参数为{}和{},正在回测，可能需要一段时间，请稍后...".format(fast_length, slow_length))
-                strategy = Strategy(instrument_id=instrument_id, time_frame=time_frame,
-                                    fast_length=fast_length, slow_length=slow_length,
-                                    long_stop=0.95, short_stop=1.05, start_asset=1000)
-                records = []
-                data = storage.read_purequant_server_datas(instrument_id.split("-")[0].lower() + "_" + time_frame)
-                for k in data:
-                    records.append(k)
-                    strategy.begin_trade(kline=records)
-                cost_time = get_cur_timestamp() - start_time
-                print("回测用时{}秒，结果已保存至mysql数据库！".format(cost_time))
+        print("正在回测，可能需要一段时间，请稍后...")
+        exchange = OKEXFUTURES(config.access_key, config.secret_key, config.passphrase, instrument_id)
+        contract_value = MARKET(exchange, instrument_id, time_frame).contract_value()   # 合约面值，只获取一次传给各子进程
+        # k线数据只下载一次，放入共享内存后由进程池中的各进程并行回测所有参数组合
+        data = storage.read_purequant_server_datas(instrument_id.split("-")[0].lower() + "_" + time_frame)
+        result = parameter_sweep(data, double_ma_backtest,
+                                 {"fast_length": range(5, 20, 2), "slow_length": range(10, 30, 2),
+                                  "contract_value": [contract_value]})
+        print(result.sort_values("total_profit", ascending=False))
+        # 每组参数的回测结果保存至mysql数据库，每行一组参数
+        databank.insert_many("回测", instrument_id.split("-")[0].lower() + "_" + time_frame + "_参数优化",
+                             [(column, "DOUBLE") for column in result.columns], result.values.tolist())
+        cost_time = get_cur_timestamp() - start_time
+        print("回测用时{}秒，结果已保存至mysql数据库！".format(cost_time))
     else:   # 实盘模式
         instrument_id = "LTC-USDT-201225"
         time_frame = "1d"
@@ -33,8 +33,8 @@ class Strategy:
             storage.mysql_save_strategy_run_info(self.database, self.datasheet, get_localtime(),
                                                  "none", 0, 0, 0, 0, "none", 0, 0, 0, start_asset)
         # 读取数据库中保存的总资金、总盈亏数据
-        self.total_asset = storage.read_mysql_datas(0, self.database, self.datasheet, "总资金", ">")[-1][-1]
-        self.total_profit = storage.read_mysql_datas(0, self.database, self.datasheet, "总资金", ">")[-1][-2]  # 策略总盈亏
+        self.total_asset = storage.read_mysql_latest(self.database, self.datasheet)[10]
+        self.total_profit = storage.read_mysql_latest(self.database, self.datasheet)[9]  # 策略总盈亏
         # 一些策略参数
         self.contract_value = self.market.contract_value()  # 合约面值
         self.ATRLength = 20    # 平均波动周期
@@ -60,21 +60,23 @@ class Strategy:
             AvgTR = self.indicators.ATR(self.ATRLength, kline=kline)     # 计算真实波幅
             N = float(AvgTR[-2])   # N值为前一根bar上的ATR值，需将numpy.float64数据类型转换为float类型，下面的转换同理
             Units = int(self.total_asset / self.contract_value / 5)    # 每一份头寸大小为总资金的20%
+            # 一次计算短周期、长周期与离市周期的唐奇安通道
+            donchian = self.indicators.DONCHIAN([self.boLength, self.fsLength, self.teLength], kline=kline)
             """计算短周期唐奇安通道"""
             # 唐奇安通道上轨，延后1个Bar
-            DonchianHi = float(self.indicators.HIGHEST(self.boLength, kline=kline)[-2])
+            DonchianHi = float(donchian[self.boLength]["upper"][-2])
             # 唐奇安通道下轨，延后1个Bar
-            DonchianLo = float(self.indicators.LOWEST(self.boLength, kline=kline)[-2])
+            DonchianLo = float(donchian[self.boLength]["lower"][-2])
             """计算长周期唐奇安通道"""
             # 唐奇安通道上轨，延后1个Bar，长周期
-            fsDonchianHi = float(self.indicators.HIGHEST(self.fsLength, kline=kline)[-2])
+            fsDonchianHi = float(donchian[self.fsLength]["upper"][-2])
             # 唐奇安通道下轨，延后1个Bar，长周期
-            fsDonchianLo = float(self.indicators.LOWEST(self.fsLength, kline=kline)[-2])
+            fsDonchianLo = float(donchian[self.fsLength]["lower"][-2])
             """计算止盈唐奇安通道"""
             # 离市时判断需要的N周期最低价
-            ExitLowestPrice = float(self.indicators.LOWEST(self.teLength, kline=kline)[-2])
+            ExitLowestPrice = float(donchian[self.teLength]["lower"][-2])
             # 离市时判断需要的N周期最高价
-            ExitHighestPrice = float(self.indicators.HIGHEST(self.teLength, kline=kline)[-2])
+            ExitHighestPrice = float(donchian[self.teLength]["upper"][-2])
             # 当不使用过滤条件，或者使用过滤条件且条件PreBreakoutFailure为True时，短周期开仓
             if self.indicators.CurrentBar(kline=kline) >= self.boLength and self.position.amount() == 0 and (self.LastProfitableTradeFilter != 1 or self.PreBreakoutFailure == False) and self.counter < 1:
                 if self.market.high(-1, kline=kline) >= DonchianHi:  # 突破了短周期唐奇安通道上轨
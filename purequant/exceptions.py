@@ -35,6 +35,17 @@ class MatchError(CunstomException):
 class SendOrderError(CunstomException):
     defaul_msg = "下单失败！"
 
+class UnknownOrderError(SendOrderError):
+    """下单请求超时或断线且无法确认交易所是否已经下单，client_oid为该订单的客户订单号，可用于查询或撤销该订单"""
+    defaul_msg = "下单请求失败，订单状态未知！"
+
+    def __init__(self, msg=None, client_oid=None):
+        super().__init__(msg)
+        self.client_oid = client_oid
+
+class RevokeOrderError(CunstomException):
+    defaul_msg = "撤单失败！"
+
 class GetOrderError(CunstomException):
     defaul_msg = "查询订单失败！"
 
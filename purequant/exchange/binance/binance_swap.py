@@ -1,7 +1,8 @@
 import hmac
 import hashlib
 import logging
-import requests
+from purequant.exchange.session import session
+from purequant.exchange.clock import clock
 import time
 from purequant.time import get_cur_timestamp_ms
 try:
@@ -188,7 +189,7 @@ def myTrades(symbol, **kwargs):
 
 
 def request(method, path, params=None):
-    resp = requests.request(method, ENDPOINT + path, params=params)
+    resp = session.request(method, ENDPOINT + path, params=params)
     data = resp.json()
     if "msg" in data:
         logging.error(data['msg'])
@@ -198,16 +199,16 @@ def request(method, path, params=None):
 def signedRequest(method, path, params):
     if "apiKey" not in options or "secret" not in options:
         raise ValueError("Api key and secret must be set")
-    timestamp = requests.get("https://api.binance.com/api/v3/time").json()['serverTime']
+    timestamp = int(clock.now("binance"))
     query = urlencode(sorted(params.items()))
     query += "&timestamp={}".format(timestamp)
     secret = bytes(options["secret"].encode("utf-8"))
     signature = hmac.new(secret, query.encode("utf-8"),
                          hashlib.sha256).hexdigest()
     query += "&signature={}".format(signature)
-    resp = requests.request(method,
-                            ENDPOINT + path + "?" + query,
-                            headers={"X-MBX-APIKEY": options["apiKey"]})
+    resp = session.request(method,
+                           ENDPOINT + path + "?" + query,
+                           headers={"X-MBX-APIKEY": options["apiKey"]})
     data = resp.json()
     if "msg" in data:
         logging.error(data['msg'])
@@ -226,6 +227,10 @@ def get_ticker(symbol):
     return data
 
 
+def get_exchange_info():
+    """获取交易规则与全部交易对信息"""
+    return request("GET", "/fapi/v1/exchangeInfo", {})
+
 def get_contract_value(symbol):
     result = None
     params = {}
@@ -4,7 +4,8 @@ Official documentation can be found at 'https://www.bitmex.com/api/explorer/'
 """
 import hmac
 import hashlib
-import requests
+from purequant.exchange.session import session
+from purequant.exchange.clock import clock
 import time
 import sys
 from urllib.parse import urlencode
@@ -897,7 +898,7 @@ class Bitmex(object):
 
         fullURL = "{0}{1}{2}".format(self.BASE_URL, path, query)
 
-        apiResponse = requests.request(method, fullURL)
+        apiResponse = session.request(method, fullURL)
 
         data = apiResponse.json()
 
@@ -916,7 +917,7 @@ class Bitmex(object):
             query = "?{0}".format(encodedParams)
             query = query.replace("%27", "%22")
 
-        nonce = int(round(time.time()) + 5)
+        nonce = int(round(clock.timestamp("bitmex")) + 5)
         fullURL = bytes("{0}{1}{2}".format(self.BASE_URL, path, query), 'utf-8')
         signURL = bytes('{0}/api/v1{1}{2}{3}'.format(method, path, query, nonce), 'utf-8')
 
@@ -928,7 +929,7 @@ class Bitmex(object):
             "api-signature": signature
         }
 
-        apiResponse = requests.request(method, fullURL, headers=headers)
+        apiResponse = session.request(method, fullURL, headers=headers)
         data = apiResponse.json()
 
         return (data)
\ No newline at end of file
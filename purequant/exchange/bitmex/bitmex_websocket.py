@@ -9,10 +9,11 @@ import time
 import urllib
 import hmac
 import hashlib
+from purequant.exchange.clock import clock
 
 
 def generate_nonce():
-    return int(round(time.time() + 3600))
+    return int(round(clock.timestamp("bitmex") + 3600))
 
 
 # Generates an API signature.
@@ -54,8 +55,9 @@ class BitMEXWebsocket:
     # Don't grow a table larger than this amount. Helps cap memory usage.
     MAX_TABLE_LEN = 200
 
-    def __init__(self, endpoint, symbol, api_key=None, api_secret=None):
-        '''Connect to the websocket and initialize data stores.'''
+    def __init__(self, endpoint, symbol, api_key=None, api_secret=None, callback=None):
+        '''Connect to the websocket and initialize data stores.
+        callback(table) is called after each table update, and callback(None) when the websocket closes.'''
         self.logger = logging.getLogger(__name__)
         self.logger.debug("Initializing WebSocket.")
 
@@ -73,6 +75,7 @@ class BitMEXWebsocket:
         self.data = {}
         self.keys = {}
         self.exited = False
+        self.callback = callback
 
         # We can subscribe right in the connection querystring, so let's build that.
         # Subscribe to all pertinent endpoints
@@ -268,6 +271,8 @@ class BitMEXWebsocket:
                         self.data[table].remove(item)
                 else:
                     raise Exception("Unknown action: %s" % action)
+                if self.callback is not None:
+                    self.callback(table)
         except:
             self.logger.error(traceback.format_exc())
 
@@ -284,6 +289,8 @@ class BitMEXWebsocket:
     def __on_close(self):
         '''Called on websocket close.'''
         self.logger.info('Websocket Closed')
+        if self.callback is not None:
+            self.callback(None)
 
 
 # Utility method for finding an item in the store.
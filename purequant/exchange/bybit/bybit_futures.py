@@ -1,4 +1,5 @@
-import requests
+from purequant.exchange.session import session
+from purequant.exchange.clock import clock
 import urllib.parse
 import hmac
 import urllib
@@ -23,32 +24,32 @@ class BybitFutures:
         }
         postdata = urllib.parse.urlencode(params)   # 将字典里面所有的键值转化为query-string格式（key=value&key=value），并且将中文转码
         try:
-            response = requests.get(url+"?"+postdata, headers=headers, timeout=TIMEOUT)
+            response = session.get(url+"?"+postdata, headers=headers, timeout=TIMEOUT)
             return response.json()
         except Exception as e:
             return {"status": "fail", "error_message": "%s" % e}
 
     def apikey_post(self, url, params):
-        timestamp = self.get_server_time() * 1000
+        timestamp = int(clock.now("bybit"))
         params.update({"timestamp": timestamp, "api_key": self.__access_key})
         val = '&'.join([str(k) + "=" + str(v) for k, v in sorted(params.items()) if (k != 'sign') and (v is not None)])
         signature = str(hmac.new(bytes(self.__secret_key, "utf-8"), bytes(val, "utf-8"), digestmod="sha256").hexdigest())
         post_data = val + "&sign=" + signature
         try:
-            response = requests.post(url + "?" + post_data, timeout=TIMEOUT)
+            response = session.post(url + "?" + post_data, timeout=TIMEOUT)
             return response.json()
         except Exception as e:
             return {"status": "fail", "error_message": "%s" % e}
 
     def apikey_get(self, url, params):
-        timestamp = self.get_server_time() * 1000
+        timestamp = int(clock.now("bybit"))
         params.update({"timestamp": timestamp, "api_key": self.__access_key})
         val = '&'.join([str(k) + "=" + str(v) for k, v in sorted(params.items()) if (k != 'sign') and (v is not None)])
         signature = str(
             hmac.new(bytes(self.__secret_key, "utf-8"), bytes(val, "utf-8"), digestmod="sha256").hexdigest())
         post_data = val + "&sign=" + signature
         try:
-            response = requests.get(url + "?" + post_data, timeout=TIMEOUT)
+            response = session.get(url + "?" + post_data, timeout=TIMEOUT)
             return response.json()
         except Exception as e:
             return {"status": "fail", "error_message": "%s" % e}
@@ -76,11 +77,13 @@ class BybitFutures:
                 asks.append(float(item['price']))
         return {"asks": asks, "bids": bids}
 
-    def get_kline(self, symbol, interval):
+    def get_kline(self, symbol, interval, start=None, limit=None):
         """
         查询K线数据
         :param symbol:"BTCUSD"
         :param interval:"1m" "3m" "1h" "12" "1d"
+        :param start: 起始时间戳（秒），默认为最近200根k线的起始时间
+        :param limit: 返回的k线数量，最多200根
         :return:
         """
         m, t = "", 0
@@ -120,8 +123,10 @@ class BybitFutures:
         params = {
             "symbol": symbol,
             "interval": m,
-            "from": get_cur_timestamp() - 60 * 200 * t
+            "from": start if start is not None else get_cur_timestamp() - 60 * 200 * t
         }
+        if limit:
+            params["limit"] = limit
         url = self.__url + "/v2/public/kline/list"
         data = self.http_get_request(url, params)
         kline = []
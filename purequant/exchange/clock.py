@@ -0,0 +1,141 @@
+# -*- coding:utf-8 -*-
+
+"""
+交易所服务器时间
+
+签名请求需要携带与交易所服务器时间相差不超过若干秒的时间戳，原先部分交易所的签名函数在每次下单、查询之前都先请求一次
+服务器时间，使每个签名请求的耗时翻倍。这里为每个交易所维护一个本地时钟与服务器时钟的偏差：首次使用时同步采样一次，
+之后由后台线程定期采样，签名时直接用本地时间加上偏差，不再发起网络请求。
+
+每次采样记录请求发出与收到响应的本地时间，以两者的中点对应服务器时间计算偏差，往返耗时越短的样本误差越小，
+因此取最近若干个样本中往返耗时最短的那个样本的偏差作为当前偏差。
+
+Author: Gary-Hertel
+Date:   2020/12/04
+email: interstella.ranger2020@gmail.com
+"""
+
+import time
+import datetime
+import threading
+from collections import deque
+from purequant.config import config
+from purequant.logger import logger
+from purequant.exchange.session import session
+
+# 各交易所服务器时间接口，每条为(接口地址, 由响应json解析出毫秒时间戳的函数)
+SOURCES = {
+    "okex": ("https://www.okex.com/api/general/v3/time", lambda data: float(data["epoch"]) * 1000),
+    "huobi": ("https://api.huobi.pro/v1/common/timestamp", lambda data: float(data["data"])),
+    "binance": ("https://api.binance.com/api/v3/time", lambda data: float(data["serverTime"])),
+    "bitmex": ("https://www.bitmex.com/api/v1", lambda data: float(data["timestamp"])),
+    "bybit": ("https://api.bybit.com/v2/public/time", lambda data: float(data["time_now"]) * 1000),
+}
+
+SAMPLES = 8     # 参与估计偏差的最近样本数量
+
+
+class CLOCK:
+    """单个交易所的时钟偏差"""
+
+    def __init__(self, url, parser):
+        """
+        :param url: 服务器时间接口地址
+        :param parser: 由响应json解析出毫秒时间戳的函数
+        """
+        self.__url = url
+        self.__parser = parser
+        self.__samples = deque(maxlen=SAMPLES)  # (偏差毫秒数, 往返毫秒数)
+        self.__offset = 0.0
+        self.__rtt = None   # 往返耗时的指数移动平均
+        self.__lock = threading.Lock()
+
+    def sample(self):
+        """
+        采样一次服务器时间并更新偏差
+        :return: 返回本次样本 (偏差毫秒数, 往返毫秒数)
+        """
+        start = time.time() * 1000
+        response = session.get(self.__url)
+        end = time.time() * 1000
+        server = self.__parser(response.json())
+        sample = (server - (start + end) / 2, end - start)
+        with self.__lock:
+            self.__samples.append(sample)
+            self.__offset = min(self.__samples, key=lambda item: item[1])[0]
+            self.__rtt = sample[1] if self.__rtt is None else self.__rtt * 0.8 + sample[1] * 0.2
+        return sample
+
+    def now(self):
+        """返回按偏差修正后的服务器毫秒时间戳"""
+        return time.time() * 1000 + self.__offset
+
+    def info(self):
+        with self.__lock:
+            return {"offset": self.__offset, "rtt": self.__rtt, "samples": len(self.__samples)}
+
+
+class __Clock:
+    """按交易所维护时钟偏差，首次使用某个交易所时启动该交易所的后台采样线程"""
+
+    def __init__(self):
+        self.__clocks = {}  # 交易所 -> CLOCK
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+
+    def __run(self, exchange, clock):
+        while not self.__stopped.wait(getattr(config, "clock_interval", 60)):
+            try:
+                clock.sample()
+            except Exception as e:
+                logger.warning("{}服务器时间采样失败，继续使用上次的时钟偏差：{}".format(exchange, e))
+
+    def __clock(self, exchange):
+        clock = self.__clocks.get(exchange)
+        if clock is None:
+            with self.__lock:
+                clock = self.__clocks.get(exchange)
+                if clock is None:
+                    clock = CLOCK(*SOURCES[exchange])
+                    try:
+                        clock.sample()  # 首次使用时同步采样，保证第一个签名请求的时间戳已经修正
+                    except Exception as e:
+                        logger.warning("{}服务器时间采样失败，暂时使用本地时间：{}".format(exchange, e))
+                    thread = threading.Thread(target=self.__run, args=(exchange, clock), daemon=True)
+                    thread.start()
+                    self.__clocks[exchange] = clock
+        return clock
+
+    def now(self, exchange):
+        """
+        获取交易所服务器的当前毫秒时间戳，配置文件中HTTP的clock_sync为false时返回本地时间
+        :param exchange: 交易所，"okex"、"huobi"、"binance"、"bitmex"或"bybit"
+        :return: 返回浮点数
+        """
+        if not getattr(config, "clock_sync", True):    # 未调用config.loads时按默认值处理
+            return time.time() * 1000
+        return self.__clock(exchange).now()
+
+    def timestamp(self, exchange):
+        """获取交易所服务器的当前秒时间戳，返回浮点数"""
+        return self.now(exchange) / 1000
+
+    def utcnow(self, exchange):
+        """获取交易所服务器的当前utc时间，返回datetime.datetime"""
+        return datetime.datetime.utcfromtimestamp(self.timestamp(exchange))
+
+    def stats(self):
+        """
+        获取各交易所的时钟偏差
+        :return: 返回一个字典 {交易所: {"offset": 服务器时间减本地时间的毫秒数, "rtt": 往返耗时毫秒数, "samples": 样本数量}}
+        """
+        with self.__lock:
+            clocks = dict(self.__clocks)
+        return {exchange: clock.info() for exchange, clock in clocks.items()}
+
+    def stop(self):
+        """停止所有后台采样线程"""
+        self.__stopped.set()
+
+
+clock = __Clock()
@@ -1,12 +1,12 @@
 import base64
-import datetime
 import hashlib
 import hmac
 import json
 import urllib
 import urllib.parse
 import urllib.request
-import requests
+from purequant.exchange.session import session
+from purequant.exchange.clock import clock
 import pandas as pd
 
 # In general, the domain api-aws.huobi.pro is optimized for AWS client, the latency will be lower.
@@ -510,7 +510,7 @@ class HuobiSVC:
         if add_to_headers:
             headers.update(add_to_headers)
         postdata = urllib.parse.urlencode(params)
-        response = requests.get(url, postdata, headers=headers, timeout=5)
+        response = session.get(url, postdata, headers=headers, timeout=5)
         try:
 
             if response.status_code == 200:
@@ -529,7 +529,7 @@ class HuobiSVC:
         if add_to_headers:
             headers.update(add_to_headers)
         postdata = json.dumps(params)
-        response = requests.post(url, postdata, headers=headers, timeout=10)
+        response = session.post(url, postdata, headers=headers, timeout=10)
 
         try:
 
@@ -543,7 +543,7 @@ class HuobiSVC:
 
     def api_key_get(self, params, request_path):
         method = 'GET'
-        timestamp = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+        timestamp = clock.utcnow("huobi").strftime('%Y-%m-%dT%H:%M:%S')
         params.update({'AccessKeyId': self.access_key,
                        'SignatureMethod': 'HmacSHA256',
                        'SignatureVersion': '2',
@@ -559,7 +559,7 @@ class HuobiSVC:
 
     def api_key_post(self, params, request_path):
         method = 'POST'
-        timestamp = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+        timestamp = clock.utcnow("huobi").strftime('%Y-%m-%dT%H:%M:%S')
         params_to_sign = {'AccessKeyId': self.access_key,
                           'SignatureMethod': 'HmacSHA256',
                           'SignatureVersion': '2',
@@ -10,8 +10,8 @@ import hashlib
 import json
 
 import urllib
-import datetime
-import requests
+from purequant.exchange.session import session
+from purequant.exchange.clock import clock
 #import urlparse   # urllib.parse in python 3
 
 # timeout in 5 seconds:
@@ -27,7 +27,7 @@ def http_get_request(url, params, add_to_headers=None):
         headers.update(add_to_headers)
     postdata = urllib.parse.urlencode(params)
     try:
-        response = requests.get(url, postdata, headers=headers, timeout=TIMEOUT)
+        response = session.get(url, postdata, headers=headers, timeout=TIMEOUT)
         if response.status_code == 200:
             return response.json()
         else:
@@ -46,7 +46,7 @@ def http_post_request(url, params, add_to_headers=None):
         headers.update(add_to_headers)
     postdata = json.dumps(params)
     try:
-        response = requests.post(url, postdata, headers=headers, timeout=TIMEOUT)
+        response = session.post(url, postdata, headers=headers, timeout=TIMEOUT)
         if response.status_code == 200:
             return response.json()
         else:
@@ -58,7 +58,7 @@ def http_post_request(url, params, add_to_headers=None):
 
 def api_key_get(url, request_path, params, ACCESS_KEY, SECRET_KEY):
     method = 'GET'
-    timestamp = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+    timestamp = clock.utcnow("huobi").strftime('%Y-%m-%dT%H:%M:%S')
     params.update({'AccessKeyId': ACCESS_KEY,
                    'SignatureMethod': 'HmacSHA256',
                    'SignatureVersion': '2',
@@ -76,7 +76,7 @@ def api_key_get(url, request_path, params, ACCESS_KEY, SECRET_KEY):
 
 def api_key_post(url, request_path, params, ACCESS_KEY, SECRET_KEY):
     method = 'POST'
-    timestamp = datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+    timestamp = clock.utcnow("huobi").strftime('%Y-%m-%dT%H:%M:%S')
     params_to_sign = {'AccessKeyId': ACCESS_KEY,
                       'SignatureMethod': 'HmacSHA256',
                       'SignatureVersion': '2',
@@ -1,4 +1,3 @@
-import datetime
 import uuid
 import urllib
 import asyncio
@@ -12,6 +11,8 @@ import traceback
 from purequant.storage import storage
 from purequant.config import config
 from purequant.push import push
+from purequant.exchange.clock import clock
+from purequant.exceptions import ExchangeError
 
 
 def generate_signature(host, method, params, request_path, secret_key):
@@ -51,7 +52,7 @@ async def subscribe(url, access_key, secret_key, subs, callback=None, auth=False
     """
     async with websockets.connect(url) as websocket:
         if auth:
-            timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
+            timestamp = clock.utcnow("huobi").strftime("%Y-%m-%dT%H:%M:%S")
             data = {
                 "AccessKeyId": access_key,
                 "SignatureMethod": "HmacSHA256",
@@ -88,7 +89,7 @@ async def subscribe(url, access_key, secret_key, subs, callback=None, auth=False
 async def huobi_swap_position_subscribe(url, access_key, secret_key, subs, callback=None, auth=False):
     async with websockets.connect(url) as websocket:
         if auth:
-            timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
+            timestamp = clock.utcnow("huobi").strftime("%Y-%m-%dT%H:%M:%S")
             data = {
                 "AccessKeyId": access_key,
                 "SignatureMethod": "HmacSHA256",
@@ -125,7 +126,7 @@ async def huobi_swap_position_subscribe(url, access_key, secret_key, subs, callb
 async def huobi_swap_position_subscribe(url, access_key, secret_key, subs, callback=None, auth=False):
     async with websockets.connect(url) as websocket:
         if auth:
-            timestamp = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S")
+            timestamp = clock.utcnow("huobi").strftime("%Y-%m-%dT%H:%M:%S")
             data = {
                 "AccessKeyId": access_key,
                 "SignatureMethod": "HmacSHA256",
@@ -161,6 +162,46 @@ async def huobi_swap_position_subscribe(url, access_key, secret_key, subs, callb
 
 
 
+async def subscribe_private(url, access_key, secret_key, topics, on_connect, on_message):
+    """ Huobi Future/Swap private notification, used by purequant.orderfeed and purequant.accountfeed.
+    Args:
+        url: 'wss://api.hbdm.com/notification' or 'wss://api.hbdm.com/swap-notification'.
+        topics: e.g. ["orders.btc"], ["positions.BTC-USD", "accounts.BTC-USD"].
+        on_connect: called once for each topic subscribed successfully.
+        on_message: called with each notification.
+    Connects only once, the caller is responsible for reconnecting.
+    """
+    async def callback(data):
+        if data.get("err-code", 0) != 0:
+            raise ExchangeError("Huobi websocket订阅失败：{}".format(data))
+        if data.get("op") == "sub":
+            on_connect()
+        elif data.get("op") == "notify":
+            on_message(data)
+
+    subs = [{"op": "sub", "cid": str(uuid.uuid1()), "topic": topic} for topic in topics]
+    if urllib.parse.urlparse(url).path == "/swap-notification":
+        await huobi_swap_position_subscribe(url, access_key, secret_key, subs, callback, auth=True)
+    else:
+        await subscribe(url, access_key, secret_key, subs, callback, auth=True)
+
+
+async def subscribe_orders(url, access_key, secret_key, topic, on_connect, on_order):
+    """ Huobi Future/Swap order notification, used by purequant.orderfeed.
+    Args:
+        url: 'wss://api.hbdm.com/notification' or 'wss://api.hbdm.com/swap-notification'.
+        topic: "orders.btc" for futures, "orders.BTC-USD" for swap.
+        on_connect: called after the subscription succeeded.
+        on_order: called with each order notification, same fields as the rest order info.
+    Connects only once, the caller is responsible for reconnecting.
+    """
+    def on_message(data):
+        if data.get("topic", "").startswith("orders"):
+            on_order(data)
+
+    await subscribe_private(url, access_key, secret_key, [topic], on_connect, on_message)
+
+
 async def handle_ws_data(*args, **kwargs):
     """ callback function
     Args:
@@ -0,0 +1,195 @@
+# -*- coding:utf-8 -*-
+
+"""
+交易所REST接口限速
+
+每个交易所按其公布的限速规则划分为若干令牌桶，请求发出前按接口权重取走令牌，令牌不足时排队等待，
+而不是发出请求后收到429再重试。排队时下单、撤单与查询订单等订单相关的请求优先于行情请求，
+同一进程中所有策略、所有交易模块共用同一组令牌桶。收到429或418时整个令牌桶暂停到交易所要求的时间之后。
+
+Author: Gary-Hertel
+Date:   2020/12/02
+email: interstella.ranger2020@gmail.com
+"""
+
+import re
+import time
+import threading
+from urllib.parse import urlparse, parse_qsl
+
+# 限速规则，每条规则为(域名后缀, 路径正则, [(令牌桶名称, 容量, 周期秒数), ...])，按顺序取第一条匹配的规则，
+# 一个请求同时从规则中的每个令牌桶取令牌，令牌桶名称中的{host}替换为请求的域名，{endpoint}替换为去掉合约ID、订单号等参数的路径，
+# 名称相同的令牌桶共享额度
+RULES = [
+    # okex v3：每个接口单独计算，2秒内下单与撤单类接口最多40次，其他接口最多20次
+    ("okex.com", r"order", [("{host}{endpoint}", 40, 2)]),
+    ("okex.com", r"", [("{host}{endpoint}", 20, 2)]),
+    # 币安：同一域名每分钟的请求权重共1200，下单另有每10秒100次的限制
+    ("binance.com", r"/order$", [("{host}", 1200, 60), ("{host}/order", 100, 10)]),
+    ("binance.com", r"", [("{host}", 1200, 60)]),
+    # bitmex：每分钟60次
+    ("bitmex.com", r"", [("{host}", 60, 60)]),
+    # 火币：现货每10秒100次，合约每3秒48次
+    ("huobi.pro", r"", [("{host}", 100, 10)]),
+    ("hbdm.com", r"", [("{host}", 48, 3)]),
+    # bybit：每秒20次
+    ("bybit.com", r"", [("{host}", 20, 1)]),
+]
+
+# 接口权重，每条为(域名后缀, 路径正则, 权重函数)，权重函数的参数为请求参数字典，未匹配的接口权重为1
+WEIGHTS = [
+    ("binance.com", r"/klines$", lambda params: 1 if int(params.get("limit", 500)) < 100 else
+        2 if int(params.get("limit", 500)) < 500 else 5 if int(params.get("limit", 500)) <= 1000 else 10),
+    ("binance.com", r"/depth$", lambda params: 1 if int(params.get("limit", 100)) <= 100 else
+        5 if int(params.get("limit", 100)) <= 500 else 10),
+    ("binance.com", r"/ticker/24hr$", lambda params: 1 if "symbol" in params else 40),
+    ("binance.com", r"/openOrders$", lambda params: 1 if "symbol" in params else 40),
+]
+
+PARAMETER = re.compile(r"[0-9A-Z-]")    # 含数字、大写字母或"-"的路径段视为合约ID、订单号等参数
+VERSION = re.compile(r"v\d+")
+
+
+def endpoint(path):
+    """
+    将路径中的参数替换为*，得到接口的路径模板，如"/api/futures/v3/orders/BTC-USD-201225/123"转换为"/api/futures/v3/orders/*/*"，
+    同一接口查询不同订单的请求共用一个令牌桶
+    """
+    return "/".join(segment if VERSION.fullmatch(segment) or not PARAMETER.search(segment) else "*"
+                    for segment in path.split("/"))
+
+
+ORDER = 0   # 下单、撤单与查询订单，优先放行
+MARKET = 1  # 行情与其他查询
+
+
+class TOKENBUCKET:
+    """令牌桶，按固定速率补充令牌，等待中的高优先级请求先于低优先级请求取得令牌"""
+
+    def __init__(self, capacity, period):
+        """
+        :param capacity: 令牌桶容量，即一个周期内允许的请求权重之和
+        :param period: 周期秒数
+        """
+        self.__capacity = capacity
+        self.__rate = capacity / period
+        self.__tokens = capacity
+        self.__updated = time.monotonic()
+        self.__blocked = 0  # 暂停到此时间之前不放行任何请求
+        self.__waiting = [0, 0]     # 每个优先级正在等待的请求数量
+        self.__waited = 0.0     # 累计等待秒数
+        self.__condition = threading.Condition()
+
+    def __refill(self, now):
+        self.__tokens = min(self.__capacity, self.__tokens + (now - self.__updated) * self.__rate)
+        self.__updated = now
+
+    def acquire(self, weight=1, priority=MARKET):
+        """
+        取走weight个令牌，不足时等待
+        :param weight: 请求权重
+        :param priority: ORDER或MARKET
+        :return: 返回等待的秒数
+        """
+        weight = min(weight, self.__capacity)
+        start = time.monotonic()
+        with self.__condition:
+            self.__waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.__refill(now)
+                    if now >= self.__blocked and not any(self.__waiting[:priority]) and self.__tokens >= weight:
+                        self.__tokens -= weight
+                        break
+                    if now < self.__blocked:
+                        timeout = self.__blocked - now
+                    elif self.__tokens < weight:
+                        timeout = (weight - self.__tokens) / self.__rate
+                    else:   # 令牌足够但有更高优先级的请求在等待，等它取走令牌后再检查
+                        timeout = None
+                    self.__condition.wait(timeout)
+            finally:
+                self.__waiting[priority] -= 1
+                self.__condition.notify_all()
+            waited = time.monotonic() - start
+            self.__waited += waited
+        return waited
+
+    def block(self, seconds):
+        """收到429等限速响应后暂停放行请求，并清空令牌"""
+        with self.__condition:
+            self.__blocked = max(self.__blocked, time.monotonic() + seconds)
+            self.__tokens = 0
+            self.__condition.notify_all()
+
+    def info(self):
+        with self.__condition:
+            self.__refill(time.monotonic())
+            return {"tokens": self.__tokens, "capacity": self.__capacity, "waiting": sum(self.__waiting),
+                    "waited": self.__waited}
+
+
+class __RateLimiter:
+    """按限速规则为每个请求找到对应的令牌桶"""
+
+    def __init__(self):
+        self.__buckets = {}     # 令牌桶名称 -> TOKENBUCKET
+        self.__rules = [(host, re.compile(path), buckets) for host, path, buckets in RULES]
+        self.__weights = [(host, re.compile(path), func) for host, path, func in WEIGHTS]
+        self.__lock = threading.Lock()
+
+    def __bucket(self, name, capacity, period):
+        bucket = self.__buckets.get(name)
+        if bucket is None:
+            with self.__lock:
+                bucket = self.__buckets.setdefault(name, TOKENBUCKET(capacity, period))
+        return bucket
+
+    def __match(self, host, path):
+        for suffix, pattern, buckets in self.__rules:
+            if host.endswith(suffix) and pattern.search(path):
+                return [self.__bucket(name.format(host=host, endpoint=endpoint(path)), capacity, period)
+                        for name, capacity, period in buckets]
+        return []
+
+    def acquire(self, method, url, params=None):
+        """
+        请求发出前调用，按接口权重从匹配的令牌桶中取走令牌
+        :param method: 请求方法
+        :param url: 请求地址，可以包含查询参数
+        :param params: 请求参数字典
+        :return: 返回等待的秒数
+        """
+        parsed = urlparse(url)
+        params = dict(params) if isinstance(params, dict) else dict(parse_qsl(parsed.query))
+        weight = 1
+        for suffix, pattern, func in self.__weights:
+            if parsed.hostname.endswith(suffix) and pattern.search(parsed.path):
+                weight = func(params)
+                break
+        priority = ORDER if "order" in parsed.path.lower() else MARKET
+        return sum(bucket.acquire(weight, priority) for bucket in self.__match(parsed.hostname, parsed.path))
+
+    def block(self, url, seconds):
+        """
+        收到限速响应后暂停该请求对应的令牌桶
+        :param url: 请求地址
+        :param seconds: 暂停秒数，通常取自响应头Retry-After
+        :return:
+        """
+        parsed = urlparse(url)
+        for bucket in self.__match(parsed.hostname, parsed.path):
+            bucket.block(seconds)
+
+    def stats(self):
+        """
+        获取各令牌桶的状态
+        :return: 返回一个字典 {令牌桶名称: {"tokens": 剩余令牌, "capacity": 容量, "waiting": 等待中的请求数量, "waited": 累计等待秒数}}
+        """
+        with self.__lock:
+            buckets = dict(self.__buckets)
+        return {name: bucket.info() for name, bucket in buckets.items()}
+
+
+limiter = __RateLimiter()
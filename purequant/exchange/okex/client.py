@@ -1,4 +1,5 @@
-import requests
+from purequant.exchange.session import session
+from purequant.exchange.clock import clock
 import json
 from . import consts as c, utils, exceptions
 
@@ -20,14 +21,10 @@ class Client(object):
         # url
         url = c.API_URL + request_path
 
-        # 获取本地时间
-        timestamp = utils.get_timestamp()
+        # 按服务器时钟偏差修正后的本地时间，不再每次请求服务器时间
+        timestamp = clock.utcnow("okex").isoformat("T", "milliseconds") + "Z"
 
         # sign & header
-        if self.use_server_time:
-            # 获取服务器时间
-            timestamp = self._get_timestamp()
-
         body = json.dumps(params) if method == c.POST else ""
         sign = utils.sign(utils.pre_hash(timestamp, method, request_path, str(body)), self.API_SECRET_KEY)
         header = utils.get_header(self.API_KEY, sign, timestamp, self.PASSPHRASE)
@@ -45,11 +42,11 @@ class Client(object):
         # send request
         response = None
         if method == c.GET:
-            response = requests.get(url, headers=header)
+            response = session.get(url, headers=header)
         elif method == c.POST:
-            response = requests.post(url, data=body, headers=header)
+            response = session.post(url, data=body, headers=header)
         elif method == c.DELETE:
-            response = requests.delete(url, headers=header)
+            response = session.delete(url, headers=header)
 
         # exception handle
         if not str(response.status_code).startswith('2'):
@@ -78,7 +75,7 @@ class Client(object):
 
     def _get_timestamp(self):
         url = c.API_URL + c.SERVER_TIMESTAMP_URL
-        response = requests.get(url)
+        response = session.get(url)
         if response.status_code == 200:
             return response.json()['iso']
         else:
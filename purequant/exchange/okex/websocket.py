@@ -1,8 +1,8 @@
 import asyncio
 import websockets
 import json
-import requests
-import dateutil.parser as dp
+from purequant.exchange.session import session
+from purequant.exchange.clock import clock
 import hmac
 import base64
 import zlib
@@ -11,6 +11,7 @@ from purequant.push import push
 from purequant.storage import storage
 from purequant.config import config
 from purequant.time import get_localtime
+from purequant.exceptions import ExchangeError
 
 def get_timestamp():
     now = datetime.datetime.now()
@@ -20,7 +21,7 @@ def get_timestamp():
 
 def get_server_time():
     url = "https://www.okex.com/api/general/v3/time"
-    response = requests.get(url)
+    response = session.get(url)
     if response.status_code == 200:
         return response.json()['iso']
     else:
@@ -28,10 +29,8 @@ def get_server_time():
 
 
 def server_timestamp():
-    server_time = get_server_time()
-    parsed_t = dp.parse(server_time)
-    timestamp = parsed_t.timestamp()
-    return timestamp
+    """按服务器时钟偏差修正后的本地秒时间戳，登录签名时不再请求服务器时间"""
+    return clock.timestamp("okex")
 
 
 def login_params(timestamp, api_key, passphrase, secret_key):
@@ -429,6 +428,57 @@ async def subscribe(url, api_key, passphrase, secret_key, channels):
             continue
 
 
+# subscribe private channels once, used by purequant.orderfeed and purequant.accountfeed
+async def subscribe_private(url, api_key, passphrase, secret_key, channels, on_connect, on_message):
+    """
+    订阅需要登录的频道，只建立一次连接，断开时抛出异常，由调用方重连
+    :param channels: 频道列表，如["futures/position:BTC-USD-201225", "futures/account:BTC"]
+    :param on_connect: 登录后每个频道订阅成功时调用一次on_connect()
+    :param on_message: 每收到一条数据推送调用一次on_message(推送)，推送为包含"table"与"data"的字典
+    """
+    async with websockets.connect(url) as ws:
+        # login
+        timestamp = str(server_timestamp())
+        await ws.send(login_params(timestamp, api_key, passphrase, secret_key))
+        res = json.loads(inflate(await ws.recv()).decode('utf-8'))
+        if not res.get('success'):
+            raise ExchangeError("OKEX websocket登录失败：{}".format(res))
+
+        # subscribe
+        await ws.send(json.dumps({"op": "subscribe", "args": channels}))
+
+        while True:
+            try:
+                res_b = await asyncio.wait_for(ws.recv(), timeout=25)
+            except asyncio.TimeoutError:
+                await ws.send('ping')   # 25秒内没有推送时发送ping，服务器返回pong
+                continue
+            res = inflate(res_b).decode('utf-8')
+            if res == 'pong':
+                continue
+            res = json.loads(res)
+            if res.get('event') == 'error':
+                raise ExchangeError("OKEX websocket订阅失败：{}".format(res))
+            if res.get('event') == 'subscribe':
+                on_connect()
+            elif 'data' in res:
+                on_message(res)
+
+
+async def subscribe_orders(url, api_key, passphrase, secret_key, channels, on_connect, on_order):
+    """
+    订阅用户交易频道，只建立一次连接，断开时抛出异常，由调用方重连
+    :param channels: 用户交易频道，如["futures/order:BTC-USD-201225"]、["swap/order:BTC-USD-SWAP"]
+    :param on_connect: 登录并订阅成功后调用on_connect()
+    :param on_order: 每收到一个订单推送调用一次on_order(订单数据)，订单数据与rest接口查询订单信息返回的格式一致
+    """
+    def on_message(res):
+        for data in res['data']:
+            on_order(data)
+
+    await subscribe_private(url, api_key, passphrase, secret_key, channels, on_connect, on_message)
+
+
 # unsubscribe channels
 async def unsubscribe(url, api_key, passphrase, secret_key, channels):
     async with websockets.connect(url) as ws:
@@ -0,0 +1,103 @@
+# -*- coding:utf-8 -*-
+
+"""
+交易所REST接口共用的HTTP会话
+
+每个域名对应一个requests.Session，底层连接池保持长连接，同一进程中对同一交易所只在第一次请求时建立TCP与TLS连接，
+之后的下单、查询订单与行情请求都复用已建立的连接。各交易所的REST客户端都通过这里的session发送请求，
+请求发出前先经过limiter按交易所的限速规则排队。
+
+Author: Gary-Hertel
+Date:   2020/11/30
+email: interstella.ranger2020@gmail.com
+"""
+
+import threading
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from purequant.config import config
+from purequant.exchange.limiter import limiter
+
+
+class __Session:
+    """按域名复用的HTTP会话"""
+
+    def __init__(self):
+        self.__sessions = {}    # 域名 -> requests.Session
+        self.__lock = threading.Lock()
+
+    def __session(self, host):
+        session = self.__sessions.get(host)
+        if session is None:
+            with self.__lock:
+                session = self.__sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    # 每个会话只访问一个域名，连接池大小即为同时进行的请求数量上限，超出时等待而不是新建连接后丢弃
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=getattr(config, "http_pool_size", 10), pool_block=True)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self.__sessions[host] = session
+        return session
+
+    def request(self, method, url, **kwargs):
+        """
+        发送HTTP请求，参数与requests.request一致，未传入timeout时使用配置文件中HTTP的timeout，
+        配置文件中HTTP的rate_limit为true（默认）时按交易所的限速规则排队
+        :param method: 请求方法，如"GET"
+        :param url: 请求地址
+        :return: 返回requests.Response
+        """
+        if isinstance(url, bytes):
+            url = url.decode("utf-8")
+        # 未调用config.loads时（如单独使用交易所的rest客户端）按默认值处理
+        kwargs.setdefault("timeout", getattr(config, "http_timeout", 10))
+        if getattr(config, "http_rate_limit", True):
+            limiter.acquire(method, url, kwargs.get("params"))
+        response = self.__session(urlparse(url).netloc).request(method, url, **kwargs)
+        if response.status_code in (418, 429):  # 已超出限速，按交易所要求的时间暂停该接口的请求
+            try:
+                seconds = float(response.headers.get("Retry-After", 1))
+            except ValueError:
+                seconds = 1
+            limiter.block(url, seconds)
+        return response
+
+    def get(self, url, params=None, **kwargs):
+        return self.request("GET", url, params=params, **kwargs)
+
+    def post(self, url, data=None, json=None, **kwargs):
+        return self.request("POST", url, data=data, json=json, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def stats(self):
+        """
+        获取每个域名的连接复用情况
+        :return: 返回一个字典 {域名: {"requests": 请求次数, "connections": 新建连接次数, "reused": 复用连接的请求次数}}
+        """
+        result = {}
+        with self.__lock:
+            sessions = dict(self.__sessions)
+        for host, session in sessions.items():
+            pools = session.get_adapter("https://" + host).poolmanager.pools
+            count, connections = 0, 0
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    count += pool.num_requests
+                    connections += pool.num_connections
+            result[host] = {"requests": count, "connections": connections, "reused": count - connections}
+        return result
+
+    def close(self):
+        """关闭所有会话与连接"""
+        with self.__lock:
+            sessions, self.__sessions = self.__sessions, {}
+        for session in sessions.values():
+            session.close()
+
+
+session = __Session()
@@ -0,0 +1,118 @@
+# -*- coding:utf-8 -*-
+
+"""
+历史k线下载模块
+
+各交易模块的get_kline只返回最近一页k线，回测所需的长期历史数据通过交易模块的get_history_kline分页获取：
+整段时间按每页的k线数量切分为若干时间窗口，每页由窗口的结束时间向前取，多个窗口在线程池中并发请求，
+请求频率由exchange.limiter按各交易所的限速规则控制，每批窗口下载完成后按时间先后顺序追加至本地k线仓库KLINESTORE，
+仓库中已有数据时从最后一根k线之后继续下载，中断后再次运行即可断点续传。
+
+Author: Gary-Hertel
+Date:   2020/11/29
+email: interstella.ranger2020@gmail.com
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from purequant.kline import KLINE, to_timestamp, to_timestamp_ms
+from purequant.storage import storage
+from purequant.time import get_cur_timestamp
+from purequant.logger import logger
+from purequant.exceptions import KlineError
+
+# k线周期对应的秒数
+SECONDS = {"1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "2h": 7200, "4h": 14400,
+           "6h": 21600, "8h": 28800, "12h": 43200, "1d": 86400}
+
+# 各交易模块每页最多返回的k线数量
+PAGES = {
+    "OKEXFUTURES": 200, "OKEXSWAP": 200, "OKEXSPOT": 200,
+    "BINANCESWAP": 500, "BINANCEFUTURES": 500, "BINANCESPOT": 500,
+    "BITMEX": 1000, "BYBITSWAP": 200, "BYBITFUTURES": 200
+}
+
+
+def __fetch(platform, time_frame, start, end, retries):
+    """下载一个时间窗口内的k线，失败时重试，返回窗口内按时间先后顺序排列的k线"""
+    for attempt in range(retries + 1):
+        try:
+            records = platform.get_history_kline(time_frame, start, end)
+            break
+        except Exception as e:
+            if attempt == retries:
+                raise KlineError("下载{}至{}的k线数据失败：{}".format(start, end, e))
+            time.sleep(2 ** attempt)
+    records = [record for record in records if start * 1000 <= to_timestamp_ms(record[0]) <= end * 1000]
+    records.sort(key=lambda record: to_timestamp_ms(record[0]))
+    return records
+
+
+def __save(store, records, database, data_sheet):
+    if not records:
+        return 0
+    count = store.append(records)
+    if database is not None:
+        storage.kline_bulk_save(database, data_sheet, records)
+    return count
+
+
+def find_gaps(kline, time_frame):
+    """
+    查找k线数据中缺失k线的位置
+    :param kline: KLINE或按时间先后顺序排列的时间戳数组，秒时间戳与毫秒时间戳均可
+    :param time_frame: k线周期，如"1m"
+    :return: 返回列表，每个缺口格式为(缺口前一根k线的毫秒时间戳, 缺口后一根k线的毫秒时间戳)
+    """
+    timestamp = to_timestamp_ms(np.asarray(kline.timestamp if isinstance(kline, KLINE) else kline, dtype=np.int64))
+    index = np.flatnonzero(np.diff(timestamp) > SECONDS[time_frame] * 1000)
+    return [(int(timestamp[i]), int(timestamp[i + 1])) for i in index]
+
+
+def download_kline(platform, time_frame, store, start, end=None, workers=4, retries=3, database=None, data_sheet=None):
+    """
+    分页并发下载历史k线数据并追加至本地k线仓库
+    :param platform: 交易模块，如OKEXFUTURES、BINANCESWAP、BITMEX、BYBITSWAP，需实现get_history_kline
+    :param time_frame: k线周期，如"1m"，必须与store的k线周期一致
+    :param store: 本地k线仓库KLINESTORE
+    :param start: 起始时间，可以是utc时间字符串、本地时间字符串或秒时间戳，仓库中已有数据时从最后一根k线之后继续下载
+    :param end: 结束时间，默认为当前时间，尚未走完的k线不下载
+    :param workers: 并发请求的线程数量
+    :param retries: 每页请求失败后的重试次数
+    :param database: 数据库名称，传入时同时通过storage.kline_bulk_save保存至数据库
+    :param data_sheet: 数据表名称
+    :return: 返回一个字典 {"written": 写入的k线数量, "pages": 请求的页数, "gaps": find_gaps找到的缺口列表}
+    """
+    name = type(platform).__name__
+    if name not in PAGES or time_frame not in SECONDS:
+        raise KlineError("不支持下载{}的{}历史k线数据！".format(name, time_frame))
+    page = PAGES[name]
+    seconds = SECONDS[time_frame]
+    start = first = to_timestamp(start)
+    last = store.last_timestamp()
+    if last is not None:    # 仓库中保存的是毫秒时间戳
+        start = max(start, last // 1000 + seconds)
+    end = to_timestamp(end) if end is not None else get_cur_timestamp() - seconds
+    # 相邻窗口首尾相接，每个窗口内最多包含page根k线
+    windows = [(moment, min(moment + page * seconds - 1, end)) for moment in range(start, end + 1, page * seconds)]
+
+    written, pages = 0, 0
+    batch_size = workers * 2
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for index in range(0, len(windows), batch_size):
+            batch = windows[index:index + batch_size]
+            results = executor.map(lambda window: __fetch(platform, time_frame, window[0], window[1], retries), batch)
+            records = []
+            try:
+                for result in results:  # 按窗口先后顺序取结果，某一页失败时只保存它之前的连续数据，下次从这里继续
+                    records.extend(result)
+                    pages += 1
+            finally:
+                written += __save(store, records, database, data_sheet)
+            logger.debug("{} {} 历史k线已下载至{}，共写入{}根".format(name, time_frame, batch[-1][1], written))
+
+    gaps = find_gaps(store.load(first, end), time_frame)    # 检查整个时间范围，包括之前已下载的部分
+    if gaps:
+        logger.warning("{} {} 历史k线数据存在{}处缺口：{}".format(name, time_frame, len(gaps), gaps))
+    return {"written": written, "pages": pages, "gaps": gaps}
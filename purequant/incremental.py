@@ -0,0 +1,526 @@
+# -*- coding:utf-8 -*-
+
+"""
+增量指标计算模块
+
+每追加一根k线，各指标只做常数时间的更新，计算结果与talib在浮点误差范围内一致。
+回测时逐根追加k线并计算指标，总耗时与k线数量成线性关系，而不是平方关系。
+
+Author: Gary-Hertel
+Date:   2020/11/22
+email: interstella.ranger2020@gmail.com
+"""
+
+import math
+from collections import deque
+import numpy as np
+from purequant.config import config
+from purequant.indicators import INDICATORS
+from purequant.kline import kline_cache
+
+
+def _is_zero(value):
+    """与talib中TA_IS_ZERO的判断方式一致"""
+    return -0.00000001 < value < 0.00000001
+
+
+class IncrementalIndicator:
+    """增量指标基类，按k线顺序保存每一根k线上的计算结果，预热期内的结果为nan"""
+
+    outputs = ("value",)
+
+    def __init__(self):
+        self.__size = 0
+        self.__buffers = {name: np.zeros(64) for name in self.outputs}
+
+    def __len__(self):
+        return self.__size
+
+    def _append(self, *values):
+        """保存当前k线上的计算结果，容量不足时按两倍扩容"""
+        capacity = len(self.__buffers[self.outputs[0]])
+        if self.__size == capacity:
+            for name in self.outputs:
+                new = np.zeros(capacity * 2)
+                new[:capacity] = self.__buffers[name]
+                self.__buffers[name] = new
+        for name, value in zip(self.outputs, values):
+            self.__buffers[name][self.__size] = value
+        self.__size += 1
+        return values[0] if len(values) == 1 else values
+
+    def result(self, name=None):
+        """
+        获取计算结果
+        :param name: 输出名称，单输出指标不用填写
+        :return: 返回一个一维数组
+        """
+        return self.__buffers[name or self.outputs[0]][:self.__size]
+
+
+class SMA(IncrementalIndicator):
+    """简单移动平均"""
+
+    def __init__(self, length):
+        super().__init__()
+        self.length = length
+        self.__window = deque()
+        self.__total = 0.0
+
+    def update(self, value):
+        self.__window.append(value)
+        self.__total += value
+        if len(self.__window) < self.length:
+            return self._append(math.nan)
+        result = self.__total / self.length
+        self.__total -= self.__window.popleft()
+        return self._append(result)
+
+
+class EMA(IncrementalIndicator):
+    """指数移动平均，以前length个数据的简单平均作为初始值"""
+
+    def __init__(self, length, k=None):
+        super().__init__()
+        self.length = length
+        self.k = k or 2.0 / (length + 1)
+        self.__count = 0
+        self.__total = 0.0
+        self.__prev = math.nan
+
+    def seed(self, value):
+        """直接指定初始值，用于MACD中与talib对齐的快线"""
+        self.__count = self.length
+        self.__prev = value
+        return self._append(value)
+
+    def update(self, value):
+        self.__count += 1
+        if self.__count < self.length:
+            self.__total += value
+            return self._append(math.nan)
+        if self.__count == self.length:
+            self.__total += value
+            self.__prev = self.__total / self.length
+        else:
+            self.__prev = ((value - self.__prev) * self.k) + self.__prev
+        return self._append(self.__prev)
+
+
+class KAMA(IncrementalIndicator):
+    """考夫曼适应性移动平均"""
+
+    def __init__(self, length):
+        super().__init__()
+        self.length = length
+        self.__window = deque()     # 最近length+1个数据
+        self.__sum_roc = 0.0
+        self.__prev = math.nan
+        self.__const_max = 2.0 / (30.0 + 1.0)
+        self.__const_diff = 2.0 / (2.0 + 1.0) - self.__const_max
+
+    def update(self, value):
+        window = self.__window
+        if window:
+            self.__sum_roc += abs(window[-1] - value)
+        window.append(value)
+        if len(window) <= self.length:
+            return self._append(math.nan)
+        if len(window) > self.length + 1:
+            trailing = window.popleft()
+            self.__sum_roc -= abs(trailing - window[0])
+        else:
+            self.__prev = window[-2]
+        period_roc = value - window[0]
+        if self.__sum_roc <= period_roc or _is_zero(self.__sum_roc):
+            ratio = 1.0
+        else:
+            ratio = abs(period_roc / self.__sum_roc)
+        ratio = (ratio * self.__const_diff) + self.__const_max
+        ratio *= ratio
+        self.__prev = ((value - self.__prev) * ratio) + self.__prev
+        return self._append(self.__prev)
+
+
+class ATR(IncrementalIndicator):
+    """平均真实波幅"""
+
+    def __init__(self, length):
+        super().__init__()
+        self.length = length
+        self.__prev_close = None
+        self.__count = 0
+        self.__total = 0.0
+        self.__prev = math.nan
+
+    def update(self, high, low, close):
+        prev_close = self.__prev_close
+        self.__prev_close = close
+        if prev_close is None:
+            return self._append(math.nan)
+        true_range = max(high, prev_close) - min(low, prev_close)
+        if self.length <= 1:
+            return self._append(true_range)
+        self.__count += 1
+        if self.__count < self.length:
+            self.__total += true_range
+            return self._append(math.nan)
+        if self.__count == self.length:
+            self.__total += true_range
+            self.__prev = self.__total / self.length
+        else:
+            self.__prev = (self.__prev * (self.length - 1) + true_range) / self.length
+        return self._append(self.__prev)
+
+
+class STDDEV(IncrementalIndicator):
+    """
+    总体标准差。
+    窗口内数据减去基准值后再累加，并且每追加length个数据按当前均值重新计算一次基准值与累加和，
+    均摊时间仍为O(1)，同时避免平方和相减带来的精度损失。
+    """
+
+    def __init__(self, length, nbdev=1):
+        super().__init__()
+        self.length = length
+        self.nbdev = nbdev
+        self.__window = deque()
+        self.__shift = None
+        self.__total = 0.0
+        self.__total_square = 0.0
+        self.__counter = 0
+
+    def _variance(self, value):
+        """加入新数据，窗口已满时返回窗口内的总体方差，否则返回None"""
+        window = self.__window
+        if self.__shift is None:
+            self.__shift = value
+        window.append(value)
+        diff = value - self.__shift
+        self.__total += diff
+        self.__total_square += diff * diff
+        if len(window) < self.length:
+            return None
+        mean = self.__total / self.length
+        variance = max(self.__total_square / self.length - mean * mean, 0.0)
+        diff = window.popleft() - self.__shift
+        self.__total -= diff
+        self.__total_square -= diff * diff
+        self.__counter += 1
+        if self.__counter >= self.length and window:  # 重新计算基准值与累加和，消除累积误差
+            self.__counter = 0
+            self.__shift = sum(window) / len(window)
+            self.__total = sum(x - self.__shift for x in window)
+            self.__total_square = sum((x - self.__shift) * (x - self.__shift) for x in window)
+        return variance
+
+    def update(self, value):
+        variance = self._variance(value)
+        if variance is None:
+            return self._append(math.nan)
+        return self._append(math.sqrt(variance) * self.nbdev)
+
+
+class BOLL(IncrementalIndicator):
+    """布林带，中轨为简单移动平均，上下轨为中轨加减nbdev倍标准差"""
+
+    outputs = ("upperband", "middleband", "lowerband")
+
+    def __init__(self, length, nbdev=2):
+        super().__init__()
+        self.length = length
+        self.nbdev = nbdev
+        self.__middle = SMA(length)
+        self.__stddev = STDDEV(length, nbdev)
+
+    def update(self, value):
+        middle = self.__middle.update(value)
+        variance = self.__stddev._variance(value)
+        if variance is None:
+            return self._append(math.nan, math.nan, math.nan)
+        deviation = math.sqrt(variance) * self.nbdev
+        return self._append(middle + deviation, middle, middle - deviation)
+
+
+class RSI(IncrementalIndicator):
+    """相对强弱指标"""
+
+    def __init__(self, length):
+        super().__init__()
+        self.length = length
+        self.__prev_value = None
+        self.__count = 0
+        self.__gain = 0.0
+        self.__loss = 0.0
+
+    def __rsi(self):
+        total = self.__gain + self.__loss
+        return 100.0 * (self.__gain / total) if not _is_zero(total) else 0.0
+
+    def update(self, value):
+        prev_value = self.__prev_value
+        self.__prev_value = value
+        if prev_value is None:
+            return self._append(math.nan)
+        diff = value - prev_value
+        self.__count += 1
+        if self.__count <= self.length:
+            if diff < 0:
+                self.__loss -= diff
+            else:
+                self.__gain += diff
+            if self.__count < self.length:
+                return self._append(math.nan)
+            self.__loss /= self.length
+            self.__gain /= self.length
+            return self._append(self.__rsi())
+        self.__loss *= (self.length - 1)
+        self.__gain *= (self.length - 1)
+        if diff < 0:
+            self.__loss -= diff
+        else:
+            self.__gain += diff
+        self.__loss /= self.length
+        self.__gain /= self.length
+        return self._append(self.__rsi())
+
+
+class MACD(IncrementalIndicator):
+    """MACD，输出DIF、DEA与柱状值（未乘2）"""
+
+    outputs = ("DIF", "DEA", "HIST")
+
+    def __init__(self, fastperiod, slowperiod, signalperiod):
+        super().__init__()
+        if slowperiod < fastperiod:
+            fastperiod, slowperiod = slowperiod, fastperiod
+        self.fastperiod = fastperiod
+        self.slowperiod = slowperiod
+        self.signalperiod = signalperiod
+        self.__count = 0
+        self.__window = deque(maxlen=fastperiod)    # 快线初始值为慢线起始位置前fastperiod个数据的简单平均，与talib一致
+        self.__fast = EMA(fastperiod)
+        self.__slow = EMA(slowperiod)
+        self.__signal = EMA(signalperiod)
+
+    def update(self, value):
+        self.__count += 1
+        self.__window.append(value)
+        slow = self.__slow.update(value)
+        if self.__count < self.slowperiod:
+            return self._append(math.nan, math.nan, math.nan)
+        if self.__count == self.slowperiod:
+            fast = self.__fast.seed(sum(self.__window) / self.fastperiod)
+        else:
+            fast = self.__fast.update(value)
+        dif = fast - slow
+        dea = self.__signal.update(dif)
+        if math.isnan(dea):
+            return self._append(math.nan, math.nan, math.nan)
+        return self._append(dif, dea, dif - dea)
+
+
+class HIGHEST(IncrementalIndicator):
+    """周期最高价，单调队列实现"""
+
+    def __init__(self, length):
+        super().__init__()
+        self.length = length
+        self.__count = 0
+        self.__deque = deque()  # (序号, 数值)，数值单调递减
+
+    def update(self, value):
+        index = self.__count
+        self.__count += 1
+        while self.__deque and self.__deque[-1][1] <= value:
+            self.__deque.pop()
+        self.__deque.append((index, value))
+        if self.__deque[0][0] <= index - self.length:
+            self.__deque.popleft()
+        if self.__count < self.length:
+            return self._append(math.nan)
+        return self._append(self.__deque[0][1])
+
+
+class LOWEST(IncrementalIndicator):
+    """周期最低价，单调队列实现"""
+
+    def __init__(self, length):
+        super().__init__()
+        self.length = length
+        self.__count = 0
+        self.__deque = deque()  # (序号, 数值)，数值单调递增
+
+    def update(self, value):
+        index = self.__count
+        self.__count += 1
+        while self.__deque and self.__deque[-1][1] >= value:
+            self.__deque.pop()
+        self.__deque.append((index, value))
+        if self.__deque[0][0] <= index - self.length:
+            self.__deque.popleft()
+        if self.__count < self.length:
+            return self._append(math.nan)
+        return self._append(self.__deque[0][1])
+
+
+class ROC(IncrementalIndicator):
+    """变动率指标"""
+
+    def __init__(self, length):
+        super().__init__()
+        self.length = length
+        self.__window = deque(maxlen=length + 1)
+
+    def update(self, value):
+        self.__window.append(value)
+        if len(self.__window) <= self.length:
+            return self._append(math.nan)
+        previous = self.__window[0]
+        return self._append(((value / previous) - 1.0) * 100.0 if previous != 0.0 else 0.0)
+
+
+class TRIX(IncrementalIndicator):
+    """三重指数平滑平均线"""
+
+    def __init__(self, length):
+        super().__init__()
+        self.length = length
+        self.__ema1 = EMA(length)
+        self.__ema2 = EMA(length)
+        self.__ema3 = EMA(length)
+        self.__roc = ROC(1)
+
+    def update(self, value):
+        value = self.__ema1.update(value)
+        if not math.isnan(value):
+            value = self.__ema2.update(value)
+        if not math.isnan(value):
+            value = self.__ema3.update(value)
+        if not math.isnan(value):
+            value = self.__roc.update(value)
+        return self._append(value)
+
+
+class OBV(IncrementalIndicator):
+    """能量潮指标"""
+
+    def __init__(self):
+        super().__init__()
+        self.__prev_close = None
+        self.__prev = 0.0
+
+    def update(self, close, volume):
+        if self.__prev_close is None:
+            self.__prev = volume
+        elif close > self.__prev_close:
+            self.__prev += volume
+        elif close < self.__prev_close:
+            self.__prev -= volume
+        self.__prev_close = close
+        return self._append(self.__prev)
+
+
+class INCREMENTALINDICATORS(INDICATORS):
+    """
+    增量版INDICATORS，调用方式与INDICATORS一致。
+    回测时传入逐根追加的k线列表，每次调用只计算新追加的k线；
+    实盘时每次获取到新的k线快照，则在新快照上重新计算。
+    未实现增量计算的指标沿用INDICATORS中的计算方式。
+    """
+
+    def __init__(self, platform, instrument_id, time_frame, cache_size=None):
+        super().__init__(platform, instrument_id, time_frame, cache_size=cache_size)
+        self.__platform = platform
+        self.__time_frame = time_frame
+        self.__indicators = {}  # (指标名称, 参数) -> [k线快照, 增量指标]
+
+    def __update(self, key, factory, feed, kline=None):
+        """将k线快照中尚未计算的k线逐根传入增量指标，返回增量指标"""
+        if config.backtest is True:
+            records = kline_cache.get(self.__platform, self.__time_frame, kline=kline)
+        else:
+            records = kline_cache.get(self.__platform, self.__time_frame)
+        entry = self.__indicators.get(key)
+        if entry is None or entry[0] is not records or len(entry[1]) > len(records):
+            entry = [records, factory()]
+            self.__indicators[key] = entry
+        indicator = entry[1]
+        for index in range(len(indicator), len(records)):
+            feed(indicator, records, index)
+        return indicator
+
+    @staticmethod
+    def __close(indicator, records, index):
+        indicator.update(float(records.close[index]))
+
+    def ATR(self, length, kline=None):
+        """平均真实波幅，返回一个一维数组"""
+        indicator = self.__update(("ATR", length), lambda: ATR(length),
+                                  lambda i, r, x: i.update(float(r.high[x]), float(r.low[x]), float(r.close[x])), kline)
+        return indicator.result()
+
+    def BOLL(self, length, kline=None):
+        """布林指标，返回一个字典 {"upperband": 上轨数组， "middleband": 中轨数组， "lowerband": 下轨数组}"""
+        indicator = self.__update(("BOLL", length), lambda: BOLL(length), self.__close, kline)
+        return {"upperband": indicator.result("upperband"), "middleband": indicator.result("middleband"),
+                "lowerband": indicator.result("lowerband")}
+
+    def HIGHEST(self, length, kline=None):
+        """周期最高价，返回一个一维数组"""
+        indicator = self.__update(("HIGHEST", length), lambda: HIGHEST(length),
+                                  lambda i, r, x: i.update(float(r.high[x])), kline)
+        return indicator.result()
+
+    def LOWEST(self, length, kline=None):
+        """周期最低价，返回一个一维数组"""
+        indicator = self.__update(("LOWEST", length), lambda: LOWEST(length),
+                                  lambda i, r, x: i.update(float(r.low[x])), kline)
+        return indicator.result()
+
+    def MA(self, length, *args, kline=None):
+        """简单移动平均线，传入多个长度参数时返回一个列表"""
+        result = [self.__update(("MA", x), lambda x=x: SMA(x), self.__close, kline).result() for x in (length,) + args]
+        return result[0] if len(args) < 1 else result
+
+    def EMA(self, length, *args, kline=None):
+        """指数移动平均线，传入多个长度参数时返回一个列表"""
+        result = [self.__update(("EMA", x), lambda x=x: EMA(x), self.__close, kline).result() for x in (length,) + args]
+        return result[0] if len(args) < 1 else result
+
+    def KAMA(self, length, *args, kline=None):
+        """适应性移动平均线，传入多个长度参数时返回一个列表"""
+        result = [self.__update(("KAMA", x), lambda x=x: KAMA(x), self.__close, kline).result() for x in (length,) + args]
+        return result[0] if len(args) < 1 else result
+
+    def MACD(self, fastperiod, slowperiod, signalperiod, kline=None):
+        """MACD，返回一个字典 {'DIF': DIF数组, 'DEA': DEA数组, 'MACD': MACD数组}"""
+        indicator = self.__update(("MACD", fastperiod, slowperiod, signalperiod),
+                                  lambda: MACD(fastperiod, slowperiod, signalperiod), self.__close, kline)
+        return {'DIF': indicator.result("DIF"), 'DEA': indicator.result("DEA"), 'MACD': indicator.result("HIST") * 2}
+
+    def OBV(self, kline=None):
+        """能量潮指标，返回一个一维数组"""
+        indicator = self.__update(("OBV",), OBV, lambda i, r, x: i.update(float(r.close[x]), float(r.volume[x])), kline)
+        return indicator.result()
+
+    def RSI(self, length, kline=None):
+        """相对强弱指标，返回一个一维数组"""
+        indicator = self.__update(("RSI", length), lambda: RSI(length), self.__close, kline)
+        return indicator.result()
+
+    def ROC(self, length, kline=None):
+        """变动率指标，返回一个一维数组"""
+        indicator = self.__update(("ROC", length), lambda: ROC(length), self.__close, kline)
+        return indicator.result()
+
+    def STDDEV(self, length, nbdev=None, kline=None):
+        """标准差，返回一个一维数组"""
+        nbdev = nbdev or 1
+        indicator = self.__update(("STDDEV", length, nbdev), lambda: STDDEV(length, nbdev), self.__close, kline)
+        return indicator.result()
+
+    def TRIX(self, length, kline=None):
+        """三重指数平滑平均线，返回一个一维数组"""
+        indicator = self.__update(("TRIX", length), lambda: TRIX(length), self.__close, kline)
+        return indicator.result()
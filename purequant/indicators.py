@@ -1,17 +1,329 @@
+import functools
+import inspect
+from collections import OrderedDict, deque
 import numpy as np
 import talib
 from purequant.time import *
 from purequant.config import config
+from purequant.kline import kline_cache
+
+
+def cached(method):
+    """INDICATORS指标方法的装饰器，启用缓存时同一根k线上相同参数的指标只计算一次"""
+    parameters = list(inspect.signature(method).parameters.values())[1:]
+    kline_index = None  # kline参数按位置传入时的序号
+    for index, parameter in enumerate(parameters):
+        if parameter.name == "kline" and parameter.kind == parameter.POSITIONAL_OR_KEYWORD:
+            kline_index = index
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if kline_index is not None and len(args) > kline_index:
+            kline = args[kline_index]
+            params = args[:kline_index] + args[kline_index + 1:]
+        else:
+            kline = kwargs.get("kline")
+            params = args
+        params += tuple(sorted((k, v) for k, v in kwargs.items() if k != "kline"))
+        return self._cached_call(method, args, kwargs, kline, params)
+    return wrapper
+
+
+def sma_matrix(values, lengths):
+    """
+    一次计算多个长度参数的简单移动平均，所有参数共用同一个累加和数组
+    :param values: 一维数组，如收盘价
+    :param lengths: 长度参数列表
+    :return: 返回一个二维数组，形状为(参数个数, k线数量)，每一行对应一个长度参数，数据不足的位置为nan
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lengths = np.asarray(lengths, dtype=np.int64).reshape(-1, 1)
+    count = len(values)
+    shift = values[0] if count else 0.0     # 先减去基准值再累加，降低累加和的量级以减少精度损失
+    total = np.concatenate(([0.0], np.cumsum(values - shift)))
+    end = np.arange(1, count + 1)
+    start = end - lengths
+    result = (total[end] - total[np.maximum(start, 0)]) / lengths + shift
+    result[start < 0] = np.nan
+    return result
+
+
+def stddev_matrix(values, lengths, nbdev=1):
+    """
+    一次计算多个长度参数的总体标准差。
+    将k线分为若干段，每段连同其前length-1个数据减去段内均值后再分别累加，与增量计算的STDDEV定期重新计算基准值的做法相同，
+    累加和的量级只与段内的价格波动有关，避免整个序列共用一个基准值时平方和相减带来的精度损失
+    :param values: 一维数组，如收盘价
+    :param lengths: 长度参数列表
+    :param nbdev: 标准差倍数
+    :return: 返回一个二维数组，形状为(参数个数, k线数量)，数据不足的位置为nan
+    """
+    values = np.asarray(values, dtype=np.float64)
+    count = len(values)
+    result = np.full((len(lengths), count), np.nan)
+    for row, length in enumerate(int(length) for length in lengths):
+        if length < 1 or length > count:
+            continue
+        if length <= 32:    # 短周期直接在每个窗口内先求均值再求离差平方和，计算量不大且没有相减误差
+            windows = [values[i:count - length + 1 + i] for i in range(length)]
+            mean = sum(windows) / length
+            result[row, length - 1:] = np.sqrt(sum((window - mean) ** 2 for window in windows) / length) * nbdev
+            continue
+        block = max(256, 4 * length)    # 每段的k线数量，段与段之间重叠length-1个数据
+        blocks = -(-count // block)
+        padded = np.concatenate((np.full(length - 1, values[0]), values, np.full(blocks * block - count, values[-1])))
+        segments = padded[np.arange(blocks).reshape(-1, 1) * block + np.arange(block + length - 1)]
+        segments -= segments.mean(axis=1, keepdims=True)
+        zeros = np.zeros((blocks, 1))
+        total = np.concatenate((zeros, np.cumsum(segments, axis=1)), axis=1)
+        total_square = np.concatenate((zeros, np.cumsum(segments * segments, axis=1)), axis=1)
+        mean = (total[:, length:] - total[:, :-length]) / length
+        variance = (total_square[:, length:] - total_square[:, :-length]) / length - mean * mean
+        result[row] = (np.sqrt(np.maximum(variance, 0.0)) * nbdev).ravel()[:count]
+        result[row, :length - 1] = np.nan
+    return result
+
+
+def __rolling_extreme(values, lengths, func):
+    """
+    稀疏表算法计算多个窗口长度的滚动最值。
+    先依次求出长度为1、2、4、8...的窗口最值，任意长度的窗口最值即为两个重叠的2的幂次窗口最值再取一次最值。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    lengths = [int(length) for length in lengths]
+    count = len(values)
+    result = np.full((len(lengths), count), np.nan)
+    levels = [values]
+    width = 1
+    while width * 2 <= min(max(lengths, default=1), count):
+        previous = levels[-1]
+        current = previous.copy()
+        current[width:] = func(previous[width:], previous[:-width])
+        levels.append(current)
+        width *= 2
+    for row, length in enumerate(lengths):
+        if length < 1 or length > count:
+            continue
+        level = length.bit_length() - 1
+        width = 1 << level
+        table = levels[level]
+        result[row, length - 1:] = func(table[length - 1:], table[width - 1:count - length + width])
+    return result
+
+
+def rolling_max_matrix(values, lengths):
+    """
+    一次计算多个长度参数的周期最高值
+    :param values: 一维数组，如最高价
+    :param lengths: 长度参数列表
+    :return: 返回一个二维数组，形状为(参数个数, k线数量)，数据不足的位置为nan
+    """
+    return __rolling_extreme(values, lengths, np.maximum)
+
+
+def rolling_min_matrix(values, lengths):
+    """
+    一次计算多个长度参数的周期最低值
+    :param values: 一维数组，如最低价
+    :param lengths: 长度参数列表
+    :return: 返回一个二维数组，形状为(参数个数, k线数量)，数据不足的位置为nan
+    """
+    return __rolling_extreme(values, lengths, np.minimum)
+
+
+def ema_matrix(values, lengths):
+    """
+    一次计算多个长度参数的指数移动平均。
+    指数移动平均是递推计算的，无法在时间方向上向量化，此处对同一份连续数组逐个长度调用talib。
+    :param values: 一维数组，如收盘价
+    :param lengths: 长度参数列表
+    :return: 返回一个二维数组，形状为(参数个数, k线数量)
+    """
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    return np.array([talib.EMA(values, int(length)) for length in lengths]).reshape(len(lengths), len(values))
+
+
+def atr_matrix(high, low, close, lengths):
+    """
+    一次计算多个长度参数的平均真实波幅，各长度共用同一份连续数组
+    :param high: 最高价数组
+    :param low: 最低价数组
+    :param close: 收盘价数组
+    :param lengths: 长度参数列表
+    :return: 返回一个二维数组，形状为(参数个数, k线数量)
+    """
+    high = np.ascontiguousarray(high, dtype=np.float64)
+    low = np.ascontiguousarray(low, dtype=np.float64)
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    return np.array([talib.ATR(high, low, close, timeperiod=int(length)) for length in lengths]).reshape(len(lengths), len(close))
+
+
+class DONCHIAN:
+    """
+    唐奇安通道，一次计算多个周期的最高价与最低价。
+    批量计算时所有周期共用同一张稀疏表；逐根追加k线时每个周期维护一个单调队列，每根k线的均摊时间为O(周期个数)。
+    """
+
+    def __init__(self, lengths):
+        """
+        :param lengths: 周期参数列表，如[20, 55, 10]
+        """
+        self.lengths = [int(length) for length in lengths]
+        self.__count = 0
+        self.__capacity = 0
+        self.__upper = {length: np.zeros(0) for length in self.lengths}
+        self.__lower = {length: np.zeros(0) for length in self.lengths}
+        self.__high_deques = {length: deque() for length in self.lengths}     # (序号, 最高价)，最高价单调递减
+        self.__low_deques = {length: deque() for length in self.lengths}  # (序号, 最低价)，最低价单调递增
+
+    def __len__(self):
+        return self.__count
+
+    def __reserve(self, size):
+        """容量不足时按两倍扩容"""
+        if size <= self.__capacity:
+            return
+        self.__capacity = max(size, self.__capacity * 2, 64)
+        for buffers in (self.__upper, self.__lower):
+            for length, old in buffers.items():
+                new = np.full(self.__capacity, np.nan)
+                new[:self.__count] = old[:self.__count]
+                buffers[length] = new
+
+    def __push(self, index, high, low):
+        """将一根k线的最高价与最低价放入各周期的单调队列"""
+        for length in self.lengths:
+            highs = self.__high_deques[length]
+            while highs and highs[-1][1] <= high:
+                highs.pop()
+            highs.append((index, high))
+            if highs[0][0] <= index - length:
+                highs.popleft()
+            lows = self.__low_deques[length]
+            while lows and lows[-1][1] >= low:
+                lows.pop()
+            lows.append((index, low))
+            if lows[0][0] <= index - length:
+                lows.popleft()
+
+    def update(self, high, low):
+        """
+        追加一根k线
+        :param high: 最高价
+        :param low: 最低价
+        :return:
+        """
+        index = self.__count
+        self.__reserve(index + 1)
+        self.__push(index, float(high), float(low))
+        for length in self.lengths:
+            if index + 1 >= length:
+                self.__upper[length][index] = self.__high_deques[length][0][1]
+                self.__lower[length][index] = self.__low_deques[length][0][1]
+        self.__count += 1
+
+    def extend(self, high_array, low_array):
+        """
+        追加多根k线，首次传入整段历史数据时使用稀疏表批量计算，之后逐根更新
+        :param high_array: 最高价数组
+        :param low_array: 最低价数组
+        :return:
+        """
+        high_array = np.asarray(high_array, dtype=np.float64)
+        low_array = np.asarray(low_array, dtype=np.float64)
+        if self.__count > 0 or len(high_array) == 0:
+            for high, low in zip(high_array, low_array):
+                self.update(high, low)
+            return
+        count = len(high_array)
+        self.__reserve(count)
+        upper = rolling_max_matrix(high_array, self.lengths)
+        lower = rolling_min_matrix(low_array, self.lengths)
+        for row, length in enumerate(self.lengths):
+            self.__upper[length][:count] = upper[row]
+            self.__lower[length][:count] = lower[row]
+        start = max(0, count - max(self.lengths))   # 单调队列只需要最近一个最长周期内的数据
+        for index in range(start, count):
+            self.__push(index, float(high_array[index]), float(low_array[index]))
+        self.__count = count
+
+    def result(self):
+        """
+        获取计算结果
+        :return: 返回一个字典 {周期: {"upper": 周期最高价数组, "lower": 周期最低价数组}}
+        """
+        return {length: {"upper": self.__upper[length][:self.__count], "lower": self.__lower[length][:self.__count]}
+                for length in self.lengths}
 
 
 class INDICATORS:
 
-    def __init__(self, platform, instrument_id, time_frame):
+    def __init__(self, platform, instrument_id, time_frame, cache_size=None):
+        """
+        :param platform: 交易所
+        :param instrument_id: 合约ID或交易对
+        :param time_frame: k线周期
+        :param cache_size: 指标缓存的最大条数，不填则不启用缓存。
+                            启用后以(指标名称, 参数, 最后一根k线)为键缓存计算结果，超出数量时淘汰最久未使用的结果。
+                            最后一根k线尚未走完时其价格与成交量变化也会使缓存失效。
+                            返回的数组为缓存中的同一对象，请勿原地修改。
+        """
         self.__platform = platform
         self.__instrument_id = instrument_id
         self.__time_frame = time_frame
         self.__last_time_stamp = 0
+        self.__cache_size = cache_size or 0
+        self.__cache = OrderedDict()
+        self.__hits = 0
+        self.__misses = 0
+        self.__donchians = {}   # 周期参数 -> [k线快照, DONCHIAN]
+
+    def _cached_call(self, method, args, kwargs, kline, params):
+        """以(指标名称, 参数, 最后一根k线)为键查询缓存，未命中时计算并保存结果"""
+        if self.__cache_size <= 0:
+            return method(self, *args, **kwargs)
+        records = self.__records(kline)
+        if len(records) > 0:
+            bar = (len(records), int(records.timestamp[0]), int(records.timestamp[-1]), float(records.open[-1]),
+                   float(records.high[-1]), float(records.low[-1]), float(records.close[-1]), float(records.volume[-1]))
+        else:
+            bar = (0,)
+        key = (method.__name__, params, bar)
+        if key in self.__cache:
+            self.__hits += 1
+            self.__cache.move_to_end(key)
+            return self.__cache[key]
+        self.__misses += 1
+        result = method(self, *args, **kwargs)
+        self.__cache[key] = result
+        while len(self.__cache) > self.__cache_size:
+            self.__cache.popitem(last=False)
+        return result
+
+    def cache_info(self):
+        """
+        获取指标缓存的使用情况
+        :return: 返回一个字典 {"hits": 命中次数, "misses": 未命中次数, "size": 当前缓存条数, "maxsize": 最大缓存条数}
+        """
+        return {"hits": self.__hits, "misses": self.__misses, "size": len(self.__cache), "maxsize": self.__cache_size}
 
+    def cache_clear(self):
+        """清空指标缓存与命中统计"""
+        self.__cache.clear()
+        self.__hits = 0
+        self.__misses = 0
+
+    def __records(self, kline=None):
+        """
+        获取列式k线数据，回测模式使用传入的k线数据，实盘模式从交易所获取，同一刷新间隔内与MARKET、POSITION共用
+        :param kline: 回测时传入指定k线数据
+        :return: 返回KLINE
+        """
+        if config.backtest is True:
+            return kline_cache.get(self.__platform, self.__time_frame, kline=kline)
+        return kline_cache.get(self.__platform, self.__time_frame)
+
+    @cached
     def ATR(self, length, kline=None):
         """
         指数移动平均线
@@ -19,25 +331,15 @@ class INDICATORS:
         :param kline:回测时传入指定k线数据
         :return:返回一个一维数组
         """
-        if config.backtest is True:    # 如果是回测模式传入了指定的k线数据
-            records = kline
-        else:   # 实盘模式下从交易所获取k线数据
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()   # 将k线数据倒序排列
-        kline_length = len(records)     # 计算k线数据的长度
-        high_array = np.zeros(kline_length)     # 创建为零的数组
-        low_array = np.zeros(kline_length)
-        close_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            high_array[t] = item[2]
-            low_array[t] = item[3]
-            close_array[t] = item[4]
-            t += 1
+        records = self.__records(kline)
+        high_array = records.high
+        low_array = records.low
+        close_array = records.close
         result = talib.ATR(high_array, low_array, close_array, timeperiod=length)
         return result
 
 
+    @cached
     def BOLL(self, length, kline=None):
         """
         布林指标
@@ -45,17 +347,8 @@ class INDICATORS:
         :param kline:回测时传入指定k线数据
         :return: 返回一个字典 {"upperband": 上轨数组， "middleband": 中轨数组， "lowerband": 下轨数组}
         """
-        if config.backtest is True:    # 如果是回测模式传入了指定的k线数据
-            records = kline
-        else:  # 实盘模式下从交易所获取k线数据
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        close_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            close_array[t] = item[4]
-            t += 1
+        records = self.__records(kline)
+        close_array = records.close
         result = (talib.BBANDS(close_array, timeperiod=length, nbdevup=2, nbdevdn=2, matype=0))
         upperband = result[0]
         middleband = result[1]
@@ -79,12 +372,7 @@ class INDICATORS:
             else:
                 return False
         else:
-            records = self.__platform.get_kline(self.__time_frame)
-            kline_length = len(records)
-            if type(records[0][0]) == str:
-                current_timestamp = utctime_str_to_ts(records[kline_length - 1][0])
-            else:
-                current_timestamp = records[kline_length - 1][0]
+            current_timestamp = int(self.__records().timestamp[-1])
             if current_timestamp != self.__last_time_stamp:  # 如果当前时间戳不等于lastTime，说明k线更新
                 if current_timestamp < self.__last_time_stamp:
                     return
@@ -103,10 +391,11 @@ class INDICATORS:
         if config.backtest is True:
             records = kline
         else:
-            records = self.__platform.get_kline(self.__time_frame)
+            records = self.__records()
         kline_length = len(records)
         return kline_length
 
+    @cached
     def HIGHEST(self, length, kline=None):
         """
         周期最高价
@@ -114,20 +403,12 @@ class INDICATORS:
         :param kline: 回测时传入指定k线数据
         :return:返回一个一维数组
         """
-        if config.backtest is True:
-            records = kline
-        else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        high_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            high_array[t] = item[2]
-            t += 1
+        records = self.__records(kline)
+        high_array = records.high
         result = (talib.MAX(high_array, length))
         return result
 
+    @cached
     def MA(self, length, *args, kline=None):
         """
         移动平均线(简单移动平均)
@@ -136,17 +417,8 @@ class INDICATORS:
         :param kline:回测时传入指定k线数据
         :return:返回一个一维数组
         """
-        if config.backtest is True:    # 如果是回测模式传入了指定的k线数据
-            records = kline
-        else:   # 实盘模式下从交易所获取k线数据
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        close_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            close_array[t] = item[4]
-            t += 1
+        records = self.__records(kline)
+        close_array = records.close
         if len(args) < 1:  # 如果无别的参数
             result = talib.SMA(close_array, length)
         else:   # 如果传入多个参数
@@ -155,6 +427,7 @@ class INDICATORS:
                 result.append(talib.SMA(close_array, x))
         return result
 
+    @cached
     def MACD(self, fastperiod, slowperiod, signalperiod, kline=None):
         """
         计算MACD
@@ -164,17 +437,8 @@ class INDICATORS:
         :param kline: 回测时传入指定k线数据
         :return: 返回一个字典 {'DIF': DIF数组, 'DEA': DEA数组, 'MACD': MACD数组}
         """
-        if config.backtest is True:
-            records = kline
-        else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        close_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            close_array[t] = item[4]
-            t += 1
+        records = self.__records(kline)
+        close_array = records.close
         result = (talib.MACD(close_array, fastperiod=fastperiod, slowperiod=slowperiod, signalperiod=signalperiod))
         DIF = result[0]
         DEA = result[1]
@@ -182,6 +446,7 @@ class INDICATORS:
         dict = {'DIF': DIF, 'DEA': DEA, 'MACD': MACD}
         return dict
 
+    @cached
     def EMA(self, length, *args, kline=None):
         """
         指数移动平均线
@@ -190,17 +455,8 @@ class INDICATORS:
         :param kline: 回测时传入指定k线数据
         :return: 返回一个一维数组
         """
-        if config.backtest is True:
-            records = kline
-        else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        close_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            close_array[t] = item[4]
-            t += 1
+        records = self.__records(kline)
+        close_array = records.close
         if len(args) < 1:  # 如果无别的参数
             result = talib.EMA(close_array, length)
         else:
@@ -209,6 +465,7 @@ class INDICATORS:
                 result.append(talib.EMA(close_array, x))
         return result
 
+    @cached
     def KAMA(self, length, *args, kline=None):
         """
         适应性移动平均线
@@ -217,17 +474,8 @@ class INDICATORS:
         :param kline: 回测时传入指定k线数据
         :return: 返回一个一维数组
         """
-        if config.backtest is True:
-            records = kline
-        else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        close_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            close_array[t] = item[4]
-            t += 1
+        records = self.__records(kline)
+        close_array = records.close
         if len(args) < 1:  # 如果无别的参数
             result = talib.KAMA(close_array, length)
         else:
@@ -236,6 +484,7 @@ class INDICATORS:
                 result.append(talib.KAMA(close_array, x))
         return result
 
+    @cached
     def KDJ(self, fastk_period, slowk_period, slowd_period, kline=None):
         """
         计算k值和d值
@@ -245,21 +494,10 @@ class INDICATORS:
         :param kline: 回测时传入指定k线数据
         :return: 返回一个字典，{'k': k值数组， 'd': d值数组}
         """
-        if config.backtest is True:
-            records = kline
-        else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        high_array = np.zeros(kline_length)
-        low_array = np.zeros(kline_length)
-        close_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            high_array[t1] = item[2]
-            low_array[t2] = item[3]
-            close_array[t3] = item[4]
-            t += 1
+        records = self.__records(kline)
+        high_array = records.high
+        low_array = records.low
+        close_array = records.close
         result = (talib.STOCH(high_array, low_array, close_array, fastk_period=fastk_period,
                                                                 slowk_period=slowk_period,
                                                                 slowk_matype=0,
@@ -270,6 +508,7 @@ class INDICATORS:
         dict = {'k': slowk, 'd': slowd}
         return dict
 
+    @cached
     def LOWEST(self, length, kline=None):
         """
         周期最低价
@@ -277,40 +516,25 @@ class INDICATORS:
         :param kline: 回测时传入指定k线数据
         :return: 返回一个一维数组
         """
-        if config.backtest is True:
-            records = kline
-        else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        low_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            low_array[t] = item[3]
-            t += 1
+        records = self.__records(kline)
+        low_array = records.low
         result = (talib.MIN(low_array, length))
         return result
 
+    @cached
     def OBV(self, kline=None):
         """
         OBV
         :param kline: 回测时传入指定k线数据
         :return: 返回一个一维数组
         """
-        if config.backtest is True:
-            records = kline
-        else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        close_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            close_array[t] = item[4]
-            t += 1
-        result = (talib.OBV(close_array, self.VOLUME()))
+        records = self.__records(kline)
+        close_array = records.close
+        volume_array = records.volume
+        result = (talib.OBV(close_array, volume_array))
         return result
 
+    @cached
     def RSI(self, length, kline=None):
         """
         RSI
@@ -318,20 +542,12 @@ class INDICATORS:
         :param kline: 回测时传入指定k线数据
         :return:返回一个一维数组
         """
-        if config.backtest is True:
-            records = kline
-        else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        close_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            close_array[t] = item[4]
-            t += 1
+        records = self.__records(kline)
+        close_array = records.close
         result = (talib.RSI(close_array, timeperiod=length))
         return result
 
+    @cached
     def ROC(self, length, kline=None):
         """
         变动率指标
@@ -339,20 +555,12 @@ class INDICATORS:
         :param kline:回测时传入指定k线数据
         :return:返回一个一维数组
         """
-        if config.backtest is True:
-            records = kline
-        else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        close_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            close_array[t] = item[4]
-            t += 1
+        records = self.__records(kline)
+        close_array = records.close
         result = (talib.ROC(close_array, timeperiod=length))
         return result
 
+    @cached
     def STOCHRSI(self, timeperiod, fastk_period, fastd_period, kline=None):
         """
         计算STOCHRSI
@@ -362,45 +570,28 @@ class INDICATORS:
         :param kline:回测时传入指定k线数据
         :return: 返回一个字典  {'STOCHRSI': STOCHRSI数组, 'fastk': fastk数组}
         """
-        if config.backtest is True:
-            records = kline
-        else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        close_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            close_array[t] = item[4]
-            t += 1
+        records = self.__records(kline)
+        close_array = records.close
         result = (talib.STOCHRSI(close_array, timeperiod=timeperiod, fastk_period=fastk_period, fastd_period=fastd_period, fastd_matype=0))
         STOCHRSI = result[1]
         fastk = talib.MA(STOCHRSI, 3)
         dict = {'stochrsi': STOCHRSI, 'fastk': fastk}
         return dict
 
+    @cached
     def SAR(self, kline=None):
         """
         抛物线指标
         :param kline:回测时传入指定k线数据
         :return:返回一个一维数组
         """
-        if config.backtest is True:
-            records = kline
-        else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        high_array = np.zeros(kline_length)
-        low_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            high_array[t1] = item[2]
-            low_array[t2] = item[3]
-            t += 1
+        records = self.__records(kline)
+        high_array = records.high
+        low_array = records.low
         result = (talib.SAR(high_array, low_array, acceleration=0.02, maximum=0.2))
         return result
 
+    @cached
     def STDDEV(self, length, nbdev=None, kline=None):
         """
         求标准差
@@ -410,21 +601,13 @@ class INDICATORS:
         :return:返回一个一维数组
         """
         nbdev= 1 or nbdev
-        if config.backtest is True:
-            records = kline
-        else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        close_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            close_array[t] = item[4]
-            t += 1
+        records = self.__records(kline)
+        close_array = records.close
         result = (talib.STDDEV(close_array, timeperiod=length, nbdev=nbdev))
         return result
 
 
+    @cached
     def TRIX(self, length, kline=None):
         """
         三重指数平滑平均线
@@ -432,17 +615,8 @@ class INDICATORS:
         :param kline:回测时传入指定k线数据
         :return:返回一个一维数组
         """
-        if config.backtest is True:
-            records = kline
-        else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-        kline_length = len(records)
-        close_array = np.zeros(kline_length)
-        t = 0
-        for item in records:
-            close_array[t] = item[4]
-            t += 1
+        records = self.__records(kline)
+        close_array = records.close
         result = (talib.TRIX(close_array, timeperiod=length))
         return result
 
@@ -452,15 +626,89 @@ class INDICATORS:
         :param kline: 回测时传入指定k线数据
         :return: 返回一个一维数组
         """
-        if config.backtest is True:
-            records = kline
-        else:
-            records = self.__platform.get_kline(self.__time_frame)
-        length = len(records)
-        records.reverse()
-        t = 0
-        volume_array = np.zeros(length)
-        for item in records:
-            volume_array[t] = item[5]
-            t += 1
+        records = self.__records(kline)
+        volume_array = records.volume.copy()
         return volume_array
+
+    def MA_MATRIX(self, lengths, kline=None):
+        """
+        批量计算多个长度参数的简单移动平均，用于参数优化
+        :param lengths: 长度参数列表，如range(5, 20, 2)
+        :param kline: 回测时传入指定k线数据
+        :return: 返回一个二维数组，形状为(参数个数, k线数量)，第i行对应lengths中第i个参数
+        """
+        records = self.__records(kline)
+        return sma_matrix(records.close, lengths)
+
+    def EMA_MATRIX(self, lengths, kline=None):
+        """
+        批量计算多个长度参数的指数移动平均，用于参数优化
+        :param lengths: 长度参数列表
+        :param kline: 回测时传入指定k线数据
+        :return: 返回一个二维数组，形状为(参数个数, k线数量)
+        """
+        records = self.__records(kline)
+        return ema_matrix(records.close, lengths)
+
+    def BOLL_MATRIX(self, lengths, nbdev=2, kline=None):
+        """
+        批量计算多个长度参数的布林指标，用于参数优化
+        :param lengths: 长度参数列表
+        :param nbdev: 标准差倍数，默认为2
+        :param kline: 回测时传入指定k线数据
+        :return: 返回一个字典 {"upperband": 上轨矩阵， "middleband": 中轨矩阵， "lowerband": 下轨矩阵}，每个矩阵形状为(参数个数, k线数量)
+        """
+        records = self.__records(kline)
+        middleband = sma_matrix(records.close, lengths)
+        deviation = stddev_matrix(records.close, lengths, nbdev)
+        dict = {"upperband": middleband + deviation, "middleband": middleband, "lowerband": middleband - deviation}
+        return dict
+
+    def HIGHEST_MATRIX(self, lengths, kline=None):
+        """
+        批量计算多个长度参数的周期最高价，用于参数优化
+        :param lengths: 长度参数列表
+        :param kline: 回测时传入指定k线数据
+        :return: 返回一个二维数组，形状为(参数个数, k线数量)
+        """
+        records = self.__records(kline)
+        return rolling_max_matrix(records.high, lengths)
+
+    def LOWEST_MATRIX(self, lengths, kline=None):
+        """
+        批量计算多个长度参数的周期最低价，用于参数优化
+        :param lengths: 长度参数列表
+        :param kline: 回测时传入指定k线数据
+        :return: 返回一个二维数组，形状为(参数个数, k线数量)
+        """
+        records = self.__records(kline)
+        return rolling_min_matrix(records.low, lengths)
+
+    def ATR_MATRIX(self, lengths, kline=None):
+        """
+        批量计算多个长度参数的平均真实波幅，用于参数优化
+        :param lengths: 长度参数列表
+        :param kline: 回测时传入指定k线数据
+        :return: 返回一个二维数组，形状为(参数个数, k线数量)
+        """
+        records = self.__records(kline)
+        return atr_matrix(records.high, records.low, records.close, lengths)
+
+    def DONCHIAN(self, lengths, kline=None):
+        """
+        唐奇安通道，一次计算多个周期的最高价与最低价。
+        回测时传入逐根追加的k线列表，每次调用只对新追加的k线更新各周期的单调队列。
+        :param lengths: 周期参数列表，如[20, 55, 10]
+        :param kline: 回测时传入指定k线数据
+        :return: 返回一个字典 {周期: {"upper": 周期最高价数组, "lower": 周期最低价数组}}
+        """
+        records = self.__records(kline)
+        key = tuple(int(length) for length in lengths)
+        entry = self.__donchians.get(key)
+        if entry is None or entry[0] is not records or len(entry[1]) > len(records):
+            entry = [records, DONCHIAN(key)]
+            self.__donchians[key] = entry
+        donchian = entry[1]
+        start = len(donchian)
+        donchian.extend(records.high[start:], records.low[start:])
+        return donchian.result()
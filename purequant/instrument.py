@@ -0,0 +1,115 @@
+# -*- coding:utf-8 -*-
+
+"""
+交易对信息缓存
+
+合约面值、价格精度、数量精度与最小下单数量等交易对信息很少变化，但交易模块原先在每次计算盈亏、每次初始化时都会重新下载
+交易所的全部交易对列表。这里按交易所缓存整个交易对列表：首次使用时从文件加载上次保存的缓存，过期（默认一天）或查询的
+交易对不在缓存中时才调用交易模块提供的下载函数刷新一次，刷新后写回文件，程序重启后无需重新下载。
+
+每个交易对的信息为一个字典：
+    {"contract_value": 合约面值, "tick_size": 价格最小变动单位, "size_increment": 数量最小变动单位, "min_size": 最小下单数量}
+交易所未提供的字段为None。
+
+Author: Gary-Hertel
+Date:   2020/12/03
+email: interstella.ranger2020@gmail.com
+"""
+
+import os
+import json
+import time
+import threading
+from purequant.config import config
+from purequant.logger import logger
+from purequant.exceptions import ExchangeError
+
+
+class __Instruments:
+    """按交易所缓存交易对信息"""
+
+    def __init__(self):
+        self.__exchanges = None     # 交易所名称 -> {"updated": 刷新时间戳, "instruments": {交易对: 交易对信息}}
+        self.__lock = threading.RLock()
+
+    def __load(self):
+        if self.__exchanges is not None:
+            return
+        self.__exchanges = {}
+        if os.path.exists(config.instrument_path):
+            try:
+                with open(config.instrument_path, encoding="utf-8") as file:
+                    self.__exchanges = json.load(file)
+            except (OSError, ValueError) as e:
+                logger.warning("交易对信息缓存文件{}读取失败，将重新下载：{}".format(config.instrument_path, e))
+
+    def __dump(self):
+        directory = os.path.dirname(os.path.abspath(config.instrument_path))
+        os.makedirs(directory, exist_ok=True)
+        temp = config.instrument_path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as file:
+            json.dump(self.__exchanges, file, ensure_ascii=False)
+        os.replace(temp, config.instrument_path)   # 先写入临时文件再替换，写入中途退出不会损坏原缓存文件
+
+    def __refresh(self, exchange, loader):
+        try:
+            instruments = loader()
+        except Exception as e:
+            cached = self.__exchanges.get(exchange)
+            if cached is None:
+                raise ExchangeError("{}交易对信息下载失败：{}".format(exchange, e))
+            logger.warning("{}交易对信息下载失败，继续使用已过期的缓存：{}".format(exchange, e))
+            cached["updated"] = time.time() - config.instrument_ttl + 60     # 一分钟后再重试，避免每次查询都请求交易所
+            return cached["instruments"]
+        self.__exchanges[exchange] = {"updated": time.time(), "instruments": instruments}
+        try:
+            self.__dump()
+        except OSError as e:
+            logger.warning("交易对信息缓存文件{}写入失败：{}".format(config.instrument_path, e))
+        return instruments
+
+    def all(self, exchange, loader):
+        """
+        获取交易所的全部交易对信息，缓存过期时调用loader刷新
+        :param exchange: 交易所名称，同一交易所的不同市场需使用不同名称，如"OKEXFUTURES"、"OKEXSWAP"
+        :param loader: 下载函数，无参数，返回字典 {交易对: 交易对信息}
+        :return: 返回字典 {交易对: 交易对信息}
+        """
+        with self.__lock:
+            self.__load()
+            cached = self.__exchanges.get(exchange)
+            if cached is None or time.time() - cached["updated"] >= config.instrument_ttl:
+                return self.__refresh(exchange, loader)
+            return cached["instruments"]
+
+    def get(self, exchange, instrument_id, loader):
+        """
+        获取单个交易对的信息，交易对不在缓存中时（如新上线的合约）刷新一次，一分钟内不重复刷新
+        :param exchange: 交易所名称
+        :param instrument_id: 交易对
+        :param loader: 下载函数，无参数，返回字典 {交易对: 交易对信息}
+        :return: 返回交易对信息字典
+        """
+        with self.__lock:
+            instruments = self.all(exchange, loader)
+            if instrument_id not in instruments and time.time() - self.__exchanges[exchange]["updated"] >= 60:
+                instruments = self.__refresh(exchange, loader)
+            if instrument_id not in instruments:
+                raise ExchangeError("{}不存在交易对{}！".format(exchange, instrument_id))
+            return instruments[instrument_id]
+
+    def invalidate(self, exchange=None):
+        """
+        使缓存失效，下次查询时重新下载
+        :param exchange: 交易所名称，默认清除所有交易所的缓存
+        :return:
+        """
+        with self.__lock:
+            self.__load()
+            if exchange is None:
+                self.__exchanges.clear()
+            else:
+                self.__exchanges.pop(exchange, None)
+
+
+instruments = __Instruments()
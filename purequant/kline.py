@@ -0,0 +1,318 @@
+# -*- coding:utf-8 -*-
+
+"""
+列式k线数据快照
+
+同一交易所、同一k线周期下的INDICATORS、MARKET、POSITION共享同一份k线快照，
+每个轮询周期只向交易所请求一次k线数据，并且只做一次数据格式转换。
+
+Author: Gary-Hertel
+Date:   2020/11/20
+email: interstella.ranger2020@gmail.com
+"""
+
+import os
+import time
+from collections import OrderedDict
+import numpy as np
+from purequant.config import config
+from purequant.time import utctime_str_to_ts, datetime_str_to_ts
+
+
+def to_timestamp(value):
+    """
+    将k线数据中的时间转换为整数时间戳
+    :param value: utc时间字符串如"2020-07-25T03:05:00.000Z"，或本地时间字符串如"2020-07-25 11:05:00"，或数字时间戳
+    :return: 返回整数时间戳，字符串统一转换为秒时间戳，数字时间戳保持原单位
+    """
+    if isinstance(value, str):
+        try:
+            return utctime_str_to_ts(value)
+        except ValueError:
+            return datetime_str_to_ts(value)
+    return int(value)
+
+
+def to_timestamp_ms(value):
+    """
+    将k线数据中的时间转换为整数毫秒时间戳，数据库中的k线数据表与本地k线仓库KLINESTORE均以毫秒时间戳保存
+    :param value: 同to_timestamp，数字时间戳小于10的11次方时视为秒时间戳，也可以是整数时间戳数组
+    :return: 返回整数毫秒时间戳，传入数组时返回数组
+    """
+    if isinstance(value, np.ndarray):
+        value = value.astype(np.int64)
+        return np.where(value < 10 ** 11, value * 1000, value)
+    if isinstance(value, str):
+        return to_timestamp(value) * 1000
+    value = int(value)
+    return value * 1000 if value < 10 ** 11 else value
+
+
+class KLINE:
+    """列式k线数据，各列按时间先后顺序连续存放，可在末尾追加新的k线"""
+
+    def __init__(self, records=None):
+        """
+        :param records: 按时间先后顺序排列的k线数据，每根k线格式为[时间, 开, 高, 低, 收, 成交量, ...]
+        """
+        self.__size = 0
+        self.__columns = {
+            "timestamp": np.zeros(0, dtype=np.int64),
+            "open": np.zeros(0),
+            "high": np.zeros(0),
+            "low": np.zeros(0),
+            "close": np.zeros(0),
+            "volume": np.zeros(0)
+        }
+        if records:
+            self.extend(records)
+
+    @classmethod
+    def from_columns(cls, timestamp, open, high, low, close, volume):
+        """
+        直接以各列数组构造k线数据，不复制数据，可用于包装KLINESTORE中内存映射的数组
+        :return: 返回KLINE
+        """
+        kline = cls()
+        kline.__columns = {
+            "timestamp": timestamp,
+            "open": open,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume
+        }
+        kline.__size = len(timestamp)
+        return kline
+
+    def __len__(self):
+        return self.__size
+
+    def __getitem__(self, index):
+        """按序号获取一根k线，格式与k线列表中的元素一致：[时间戳, 开, 高, 低, 收, 成交量]"""
+        if index < 0:
+            index += self.__size
+        if not 0 <= index < self.__size:
+            raise IndexError("k线序号超出范围")
+        return [int(self.__columns["timestamp"][index])] + \
+               [float(self.__columns[name][index]) for name in ("open", "high", "low", "close", "volume")]
+
+    def __reserve(self, size):
+        """容量不足时按两倍扩容，保证追加k线的均摊时间为O(1)"""
+        capacity = len(self.__columns["timestamp"])
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 64)
+        for name, old in self.__columns.items():
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.__size] = old[:self.__size]
+            self.__columns[name] = new
+
+    def extend(self, records):
+        """
+        在末尾追加k线数据
+        :param records: 按时间先后顺序排列的k线数据
+        :return:
+        """
+        count = len(records)
+        if count == 0:
+            return
+        self.__reserve(self.__size + count)
+        start, end = self.__size, self.__size + count
+        columns = list(zip(*[item[:6] for item in records]))
+        self.__columns["timestamp"][start:end] = [to_timestamp(value) for value in columns[0]]
+        for index, name in enumerate(("open", "high", "low", "close", "volume")):
+            self.__columns[name][start:end] = np.asarray(columns[index + 1], dtype=np.float64)
+        self.__size = end
+
+    @property
+    def timestamp(self):
+        return self.__columns["timestamp"][:self.__size]
+
+    @property
+    def open(self):
+        return self.__columns["open"][:self.__size]
+
+    @property
+    def high(self):
+        return self.__columns["high"][:self.__size]
+
+    @property
+    def low(self):
+        return self.__columns["low"][:self.__size]
+
+    @property
+    def close(self):
+        return self.__columns["close"][:self.__size]
+
+    @property
+    def volume(self):
+        return self.__columns["volume"][:self.__size]
+
+
+class __KlineCache:
+    """按交易所与k线周期缓存k线快照"""
+
+    def __init__(self):
+        self.__live = {}    # 实盘模式：(交易所, k线周期) -> [获取时间, 交易所, k线快照]
+        self.__backtest = OrderedDict()     # 回测模式：id(k线列表) -> [k线列表, 最后一根k线, k线快照]
+        self.__backtest_size = 8
+
+    def get(self, platform, time_frame, kline=None):
+        """
+        获取k线快照
+        :param platform: 交易所
+        :param time_frame: k线周期
+        :param kline: 回测时传入指定k线数据
+        :return: 返回KLINE
+        """
+        if kline is not None:
+            return self.__get_backtest(kline)
+        key = (id(platform), time_frame)
+        entry = self.__live.get(key)
+        now = time.monotonic()
+        if entry is not None and entry[1] is platform and now - entry[0] < getattr(config, "kline_refresh_seconds", 1):
+            return entry[2]
+        records = platform.get_kline(time_frame)
+        records.reverse()   # 交易所返回的k线数据是倒序排列的
+        snapshot = KLINE(records)
+        self.__live[key] = [now, platform, snapshot]
+        return snapshot
+
+    def __get_backtest(self, kline):
+        """回测时传入的k线列表通常是逐根追加的，只需转换新追加的k线"""
+        if isinstance(kline, KLINE):    # 直接传入的列式k线数据无需转换
+            return kline
+        key = id(kline)
+        entry = self.__backtest.get(key)
+        if entry is not None and entry[0] is kline:
+            snapshot = entry[2]
+            size = len(snapshot)
+            if size <= len(kline) and (size == 0 or kline[size - 1] is entry[1]):
+                if size < len(kline):
+                    snapshot.extend(kline[size:])
+                    entry[1] = kline[-1]
+                self.__backtest.move_to_end(key)
+                return snapshot
+        snapshot = KLINE(kline)
+        self.__backtest[key] = [kline, kline[-1] if kline else None, snapshot]
+        self.__backtest.move_to_end(key)
+        while len(self.__backtest) > self.__backtest_size:
+            self.__backtest.popitem(last=False)
+        return snapshot
+
+    def invalidate(self, platform=None, time_frame=None):
+        """
+        使缓存的k线快照失效，下次获取时将重新请求交易所
+        :param platform: 交易所，不填则对所有交易所生效
+        :param time_frame: k线周期，不填则对所有周期生效
+        :return:
+        """
+        for key in list(self.__live.keys()):
+            if (platform is None or key[0] == id(platform)) and (time_frame is None or key[1] == time_frame):
+                del self.__live[key]
+        if platform is None and time_frame is None:
+            self.__backtest.clear()
+
+kline_cache = __KlineCache()
+
+
+class KLINESTORE:
+    """
+    本地k线数据仓库，每个交易所、交易对、k线周期对应一个目录，
+    目录中每一列k线数据保存为一个定长的二进制文件（时间戳int64，开高低收与成交量float64），
+    读取时以内存映射方式打开，不解析、不复制，按时间范围查询时使用二分查找。
+    各交易所的时间戳单位不同，写入时统一转换为毫秒时间戳，按时间范围查询时起止时间也转换为毫秒时间戳。
+    """
+
+    COLUMNS = (("timestamp", np.int64), ("open", np.float64), ("high", np.float64),
+               ("low", np.float64), ("close", np.float64), ("volume", np.float64))
+
+    def __init__(self, platform, instrument_id, time_frame, path="kline_store"):
+        """
+        :param platform: 交易所名称，如"okex"
+        :param instrument_id: 交易对或合约id，如"BTC-USDT-201225"
+        :param time_frame: k线周期，如"1m"、"1d"
+        :param path: 本地k线仓库的根目录
+        """
+        self.__directory = os.path.join(path, platform, instrument_id, time_frame)
+        os.makedirs(self.__directory, exist_ok=True)
+        self.__kline = None     # 内存映射的列式k线数据，追加数据后重新映射
+
+    def __file(self, name):
+        return os.path.join(self.__directory, name + ".bin")
+
+    def __count(self):
+        """各列文件中完整写入的k线数量，追加过程中断时以最短的一列为准"""
+        return min(os.path.getsize(self.__file(name)) // 8 if os.path.exists(self.__file(name)) else 0
+                   for name, dtype in self.COLUMNS)
+
+    def __map(self):
+        count = self.__count()
+        if self.__kline is not None and len(self.__kline) == count:
+            return self.__kline
+        columns = {}
+        for name, dtype in self.COLUMNS:
+            if count == 0:
+                columns[name] = np.zeros(0, dtype=dtype)
+            else:
+                columns[name] = np.memmap(self.__file(name), dtype=dtype, mode="r", shape=(count,))
+        self.__kline = KLINE.from_columns(**columns)
+        return self.__kline
+
+    def __len__(self):
+        return self.__count()
+
+    def last_timestamp(self):
+        """
+        获取仓库中最后一根k线的时间戳
+        :return: 返回整数毫秒时间戳，仓库为空时返回None
+        """
+        kline = self.__map()
+        return int(kline.timestamp[-1]) if len(kline) else None
+
+    def append(self, records):
+        """
+        追加k线数据，只写入时间晚于仓库中最后一根k线的数据，重复追加同一段数据不会产生重复的k线
+        :param records: 按时间先后顺序排列的k线数据，每根k线格式为[时间, 开, 高, 低, 收, 成交量, ...]，也可以是KLINE
+        :return: 返回实际写入的k线数量
+        """
+        kline = records if isinstance(records, KLINE) else KLINE(records)
+        timestamp = to_timestamp_ms(np.asarray(kline.timestamp))
+        last = self.last_timestamp()
+        start = 0 if last is None else int(np.searchsorted(timestamp, last, side="right"))
+        if start >= len(kline):
+            return 0
+        count = self.__count()
+        self.__kline = None     # 先释放内存映射再写入文件
+        for name, dtype in self.COLUMNS:
+            with open(self.__file(name), "r+b" if os.path.exists(self.__file(name)) else "wb") as file:
+                if os.path.getsize(self.__file(name)) != count * 8:
+                    file.truncate(count * 8)    # 丢弃上次追加中断时多写入的部分
+                file.seek(count * 8)
+                column = timestamp if name == "timestamp" else getattr(kline, name)
+                file.write(np.ascontiguousarray(column[start:], dtype=dtype).tobytes())
+        return len(kline) - start
+
+    def load(self, start=None, end=None):
+        """
+        按时间范围读取k线数据
+        :param start: 起始时间（包含），可以是时间字符串、秒时间戳或毫秒时间戳，不填则从第一根k线开始
+        :param end: 结束时间（包含），可以是时间字符串、秒时间戳或毫秒时间戳，不填则到最后一根k线为止
+        :return: 返回KLINE，时间为毫秒时间戳，各列是内存映射数组的视图，可以直接传给INDICATORS、vectorized_backtest与parameter_sweep
+        """
+        kline = self.__map()
+        timestamp = kline.timestamp
+        first = 0 if start is None else int(np.searchsorted(timestamp, to_timestamp_ms(start), side="left"))
+        last = len(kline) if end is None else int(np.searchsorted(timestamp, to_timestamp_ms(end), side="right"))
+        return KLINE.from_columns(**{name: getattr(kline, name)[first:last] for name, dtype in self.COLUMNS})
+
+    def records(self, start=None, end=None):
+        """
+        按时间范围读取k线数据，返回与read_purequant_server_datas相同的列表格式，用于逐根k线的回测
+        :return: 返回列表，每根k线格式为[毫秒时间戳, 开, 高, 低, 收, 成交量]
+        """
+        kline = self.load(start, end)
+        timestamp = kline.timestamp.tolist()
+        columns = [getattr(kline, name).tolist() for name in ("open", "high", "low", "close", "volume")]
+        return [list(row) for row in zip(timestamp, *columns)]
@@ -9,6 +9,7 @@ email: interstella.ranger2020@gmail.com
 """
 
 from purequant.config import config
+from purequant.kline import kline_cache
 
 class MARKET:
 
@@ -32,9 +33,8 @@ class MARKET:
         if config.backtest is True:    # 回测模式
             return float(kline[param][1])
         else:   # 实盘模式
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-            result = float((records)[param][1])
+            records = kline_cache.get(self.__platform, self.__time_frame)    # 与INDICATORS共用同一份k线快照
+            result = float(records.open[param])
             return result
 
     def high(self, param, kline=None):
@@ -47,9 +47,8 @@ class MARKET:
         if config.backtest is True:
             return float(kline[param][2])
         else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-            result = float((records)[param][2])
+            records = kline_cache.get(self.__platform, self.__time_frame)    # 与INDICATORS共用同一份k线快照
+            result = float(records.high[param])
             return result
 
     def low(self, param, kline=None):
@@ -62,9 +61,8 @@ class MARKET:
         if config.backtest is True:
             return float(kline[param][3])
         else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-            result = float((records)[param][3])
+            records = kline_cache.get(self.__platform, self.__time_frame)    # 与INDICATORS共用同一份k线快照
+            result = float(records.low[param])
             return result
 
     def close(self, param, kline=None):
@@ -77,9 +75,8 @@ class MARKET:
         if config.backtest is True:
             return float(kline[param][4])
         else:
-            records = self.__platform.get_kline(self.__time_frame)
-            records.reverse()
-            result = float((records)[param][4])
+            records = kline_cache.get(self.__platform, self.__time_frame)    # 与INDICATORS共用同一份k线快照
+            result = float(records.close[param])
             return result
 
     def contract_value(self):
@@ -0,0 +1,168 @@
+# -*- coding:utf-8 -*-
+
+"""
+订单推送
+
+交易模块原先在每次下单、撤单以及撤单重发的每一步之后都通过rest接口查询订单状态，一个委托通常需要三到六次查询。
+这里通过交易所的私有订单频道接收自己订单的推送，在内存中维护一个订单簿，交易模块的get_order_info与订单管理直接从订单簿中
+读取订单状态，收到推送时立即通知订单管理推进对应的委托。
+
+每个频道在后台线程的事件循环中保持一条websocket连接，断开后自动重连。重连后先通过rest接口逐一查询订单簿中未完成的订单进行
+对账，对账完成之前以及连接断开期间，get返回None，交易模块改为通过rest接口查询。推送可能乱序到达，已进入终止状态的订单
+不会被回退为未完成，已成交数量也不会减少。
+
+Author: Gary-Hertel
+Date:   2020/12/06
+email: interstella.ranger2020@gmail.com
+"""
+
+import asyncio
+import functools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from purequant.config import config
+from purequant.logger import logger
+from purequant.ordermanager import ordermanager, FINISHED
+
+BOOK_SIZE = 1000    # 每个频道最多保留的订单数量，超出时先移除最早的已完成订单
+
+
+class __OrderFeed:
+    """按频道维护自己订单的订单簿，首次订阅时启动后台事件循环"""
+
+    def __init__(self):
+        self.__books = {}   # 频道名称 -> OrderedDict {订单号: 订单信息}
+        self.__pending = {}     # 频道名称 -> 已下单但尚未收到推送的订单号
+        self.__live = set()     # 已连接并完成对账的频道
+        self.__condition = threading.Condition()
+        self.__loop = None
+        self.__executor = None
+
+    def __start(self):
+        with self.__condition:
+            if self.__loop is None:
+                self.__loop = asyncio.new_event_loop()
+                self.__executor = ThreadPoolExecutor(max_workers=config.order_workers)
+                threading.Thread(target=self.__loop.run_forever, daemon=True).start()
+        return self.__loop
+
+    def __update(self, name, order_id, info):
+        """写入订单簿，返回是否更新，乱序到达的旧状态不覆盖新状态"""
+        with self.__condition:
+            book = self.__books[name]
+            old = book.get(order_id)
+            if old is not None:
+                if old["订单状态"] in FINISHED and info["订单状态"] not in FINISHED:
+                    return False
+                if old.get("已成交数量", 0) > info.get("已成交数量", 0):
+                    return False
+            book[order_id] = info
+            book.move_to_end(order_id)
+            self.__pending[name].discard(order_id)
+            if len(book) > BOOK_SIZE:
+                for key in [key for key, value in book.items() if value["订单状态"] in FINISHED][:len(book) - BOOK_SIZE]:
+                    del book[key]
+            self.__condition.notify_all()
+        return True
+
+    def __on_order(self, name, convert, data):
+        """收到订单推送"""
+        try:
+            order_id, info = convert(data)
+        except Exception as e:
+            logger.warning("{}订单推送解析失败：{} {}".format(name, e, data))
+            return
+        if self.__update(name, str(order_id), info):
+            ordermanager.on_status(order_id, info)
+
+    async def __reconcile(self, name, query):
+        """重连后通过rest接口逐一查询未完成的订单，对账完成后才从订单簿中读取订单状态"""
+        with self.__condition:
+            book = self.__books[name]
+            order_ids = [key for key, value in book.items() if value["订单状态"] not in FINISHED]
+            order_ids += list(self.__pending[name])
+        for order_id in order_ids:
+            try:
+                info = await self.__loop.run_in_executor(self.__executor, functools.partial(query, order_id))
+            except Exception as e:
+                logger.warning("{}订单{}对账失败：{}".format(name, order_id, e))
+                continue
+            if info is not None and self.__update(name, order_id, info):
+                ordermanager.on_status(order_id, info)
+        with self.__condition:
+            self.__live.add(name)
+            self.__condition.notify_all()
+        logger.debug("{}订单推送已连接，对账{}个订单".format(name, len(order_ids)))
+
+    async def __keep(self, name, connect, convert, query):
+        """保持连接，断开后等待一段时间重连，等待时间逐次加倍，最长30秒"""
+        delay = 1
+        while True:
+            connected = []
+
+            def on_connect():
+                connected.append(True)
+                asyncio.ensure_future(self.__reconcile(name, query))
+
+            try:
+                await connect(on_connect, functools.partial(self.__on_order, name, convert))
+            except Exception as e:
+                logger.warning("{}订单推送连接断开，{}秒后重连：{}".format(name, delay, e))
+            with self.__condition:
+                self.__live.discard(name)
+                self.__condition.notify_all()
+            delay = 1 if connected else min(delay * 2, 30)
+            await asyncio.sleep(delay)
+
+    def subscribe(self, name, connect, convert, query):
+        """
+        订阅订单推送，同一频道只订阅一次
+        :param name: 频道名称，如"OKEXFUTURES:BTC-USD-201225"
+        :param connect: 协程函数connect(on_connect, on_order)，建立一次websocket连接并持续接收，连接断开时返回或抛出异常，
+                        登录并订阅成功后调用on_connect()，每收到一个订单推送调用一次on_order(推送数据)
+        :param convert: 函数convert(推送数据)，返回(订单号, 与交易模块get_order_info格式一致的订单信息)
+        :param query: 函数query(订单号)，通过rest接口查询订单信息，用于重连后对账
+        :return:
+        """
+        loop = self.__start()
+        with self.__condition:
+            if name in self.__books:
+                return
+            self.__books[name] = OrderedDict()
+            self.__pending[name] = set()
+        loop.call_soon_threadsafe(asyncio.ensure_future, self.__keep(name, connect, convert, query))
+
+    def track(self, name, order_id):
+        """记录刚刚下单的订单号，get查询该订单时等待其第一条推送"""
+        with self.__condition:
+            if name in self.__books and str(order_id) not in self.__books[name]:
+                self.__pending[name].add(str(order_id))
+
+    def get(self, name, order_id, timeout=1):
+        """
+        从订单簿中获取订单信息
+        :param name: 频道名称
+        :param order_id: 订单号
+        :param timeout: 订单刚刚下单、尚未收到推送时最多等待的秒数
+        :return: 返回订单信息，未订阅、连接断开、正在对账或订单不在订单簿中时返回None
+        """
+        order_id = str(order_id)
+        with self.__condition:
+            if name not in self.__live:
+                return None
+            book = self.__books[name]
+            if order_id in self.__pending[name]:
+                self.__condition.wait_for(lambda: order_id in book or name not in self.__live, timeout)
+                self.__pending[name].discard(order_id)  # 超时仍未收到推送时只等待这一次，之后直接通过rest接口查询
+            if name not in self.__live:
+                return None
+            return book.get(order_id)
+
+    def live(self, name):
+        """频道是否已连接并完成对账"""
+        with self.__condition:
+            return name in self.__live
+
+
+orderfeed = __OrderFeed()
@@ -0,0 +1,261 @@
+# -*- coding:utf-8 -*-
+
+"""
+订单管理
+
+交易助手的价格撤单、时间撤单与自动撤单原先写在每个交易模块的buy、sell、sellshort、buytocover中：下单后sleep等待、查询订单状态、
+撤单后以新价格递归调用自身，等待期间整个策略线程停止运行，部分成交较多时递归层数没有上限。
+
+这里将每个委托作为一个状态机，在订单管理的事件循环中运行：
+    新订单 -> 部分成交 -> 撤单中 -> 已重发（回到新订单） -> 已完成
+等待由定时器与订单状态事件驱动，查询、撤单、下单等网络请求在线程池中执行，不阻塞事件循环，多个交易对的多个委托同时推进。
+submit返回ORDER，策略可以调用ORDER.result()等待结果，也可以传入回调函数，委托完成后在订单管理的线程中调用，回调函数中不应再等待其他委托。
+交易模块的buy、sell等方法在实盘模式下即通过submit提交委托并等待结果，返回值与原先一致。
+
+交易模块需实现：
+    send_order(action, price, size, **kwargs)   下单，不撤单重发，返回订单号
+    get_order_info(order_id)    查询订单，返回字典，包含"订单状态"与"已成交数量"
+    revoke_order(order_id)  撤单
+    get_ticker()    获取最新成交价，返回字典，包含"last"
+
+Author: Gary-Hertel
+Date:   2020/12/05
+email: interstella.ranger2020@gmail.com
+"""
+
+import time
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from purequant.config import config
+from purequant.logger import logger
+from purequant.exceptions import RevokeOrderError
+
+# 委托状态
+NEW = "新订单"
+PARTIAL = "部分成交"
+CANCELING = "撤单中"
+REISSUED = "已重发"
+DONE = "已完成"
+
+# 买入类委托撤单重发时价格向上追，卖出类委托向下追
+DIRECTIONS = {"buy": 1, "buytocover": 1, "sell": -1, "sellshort": -1}
+
+CANCELED = ("撤单成功", "部分成交撤销", "部分撤单", "订单被交易引擎取消")  # 交易模块get_order_info中表示已撤销的订单状态
+FINISHED = ("完全成交", "失败", "失败 ") + CANCELED    # 订单的终止状态
+
+
+class ORDER:
+    """一个委托及其撤单重发产生的全部订单"""
+
+    def __init__(self, platform, action, price, size, kwargs):
+        self.platform = platform
+        self.action = action
+        self.price = price  # 当前订单的委托价格
+        self.size = size    # 委托总数量
+        self.kwargs = kwargs
+        self.state = NEW
+        self.order_id = None    # 当前订单号
+        self.order_ids = []     # 撤单重发产生的全部订单号
+        self.filled = 0     # 已撤销的订单累计成交数量
+        self.info = None    # 当前订单最近一次的订单信息
+        self.future = Future()
+        self.event = None   # 收到订单状态事件时唤醒状态机，在事件循环中创建
+
+    def result(self, timeout=None):
+        """等待委托完成，返回{"【交易提醒】下单结果": 最后一个订单的订单信息}"""
+        return self.future.result(timeout)
+
+    def done(self):
+        return self.future.done()
+
+    def add_done_callback(self, callback):
+        """委托完成后调用callback(ORDER)"""
+        self.future.add_done_callback(lambda future: callback(self))
+
+    def update(self, info):
+        self.info = info
+        if self.event is not None:
+            self.event.set()
+
+    def __repr__(self):
+        return "ORDER({} {} {} {}, {})".format(type(self.platform).__name__, self.action, self.price, self.size, self.state)
+
+
+class __OrderManager:
+    """订单管理，事件循环在后台线程中运行，首次提交委托时启动"""
+
+    def __init__(self):
+        self.__loop = None
+        self.__executor = None
+        self.__orders = {}  # 订单号 -> ORDER，用于分发订单状态事件
+        self.__working = set()  # 未完成的委托
+        self.__lock = threading.Lock()
+
+    def __start(self):
+        with self.__lock:
+            if self.__loop is None:
+                self.__loop = asyncio.new_event_loop()
+                self.__executor = ThreadPoolExecutor(max_workers=config.order_workers)
+                threading.Thread(target=self.__loop.run_forever, daemon=True).start()
+        return self.__loop
+
+    async def __call(self, func, *args, **kwargs):
+        return await self.__loop.run_in_executor(self.__executor, functools.partial(func, *args, **kwargs))
+
+    async def __query(self, order):
+        order.update(await self.__call(order.platform.get_order_info, order.order_id))
+        return order.info["订单状态"]
+
+    async def __wait(self, order, timeout):
+        """等待订单状态事件或超时，超时后主动查询一次"""
+        order.event.clear()
+        try:
+            await asyncio.wait_for(order.event.wait(), max(timeout, 0))
+            return order.info["订单状态"]
+        except asyncio.TimeoutError:
+            return await self.__query(order)
+
+    async def __price_moved(self, order):
+        last = float((await self.__call(order.platform.get_ticker))["last"])
+        if DIRECTIONS[order.action] > 0:
+            return last >= order.price * (1 + config.price_cancellation_amplitude)
+        return last <= order.price * (1 - config.price_cancellation_amplitude)
+
+    async def __revoke(self, order):
+        """撤单，返回撤单失败时的异常"""
+        try:
+            await self.__call(order.platform.revoke_order, order.order_id)
+        except Exception as e:
+            logger.debug("{}撤单失败：{}".format(order, e))
+            return e
+        return None
+
+    async def __cancel(self, order):
+        """
+        撤单并等待订单进入终止状态，撤单失败时订单可能已经完全成交。
+        每轮查询后订单仍未终止时重新撤单，撤单config.order_cancel_attempts次后仍未终止时抛出RevokeOrderError
+        """
+        order.state = CANCELING
+        error = await self.__revoke(order)
+        attempts = 1
+        status = await self.__query(order)
+        while status not in FINISHED:
+            status = await self.__wait(order, config.order_poll_seconds)
+            if status in FINISHED:
+                break
+            if attempts >= config.order_cancel_attempts:
+                raise RevokeOrderError("{}撤单{}次后订单仍未终止，订单信息：{}，撤单错误：{}".format(
+                    order, attempts, order.info, error))
+            error = await self.__revoke(order)
+            attempts += 1
+        return status
+
+    async def __track(self, order):
+        """
+        推进当前订单直至需要撤单重发或结束。
+        只选择时间撤单时直接等待到撤单时间，期间由订单推送事件唤醒，到期时查询一次订单；
+        同时选择价格撤单时每config.order_poll_seconds秒查询一次订单与最新成交价，
+        未订阅订单推送时每次需要两次rest请求，如撤单时间10秒、间隔1秒时每个订单约20次请求
+        :return: 返回True表示需要撤单重发
+        """
+        deadline = time.time() + config.time_cancellation_seconds if config.time_cancellation else None
+        while True:
+            status = order.info["订单状态"]
+            if status in FINISHED:
+                return False
+            if status == "部分成交":
+                order.state = PARTIAL
+            if config.price_cancellation and await self.__price_moved(order):
+                return True
+            if deadline is None:    # 未选择时间撤单时只检查一次价格
+                return False
+            if time.time() >= deadline:
+                return True
+            remaining = deadline - time.time()
+            await self.__wait(order, min(config.order_poll_seconds, remaining) if config.price_cancellation else remaining)
+
+    async def __drive(self, order):
+        order.event = asyncio.Event()
+        remaining = order.size
+        try:
+            while True:
+                order.order_id = await self.__call(order.platform.send_order, order.action, order.price, remaining, **order.kwargs)
+                order.order_ids.append(order.order_id)
+                self.__orders[str(order.order_id)] = order
+                order.state = NEW
+                await self.__query(order)
+                if await self.__track(order):
+                    status = await self.__cancel(order)
+                    if status in CANCELED:
+                        filled = order.info.get("已成交数量", 0)
+                        order.filled += filled
+                        remaining -= filled
+                        if remaining > 0:   # 以最新价加减重发幅度重新下单，数量为剩余未成交数量
+                            last = float((await self.__call(order.platform.get_ticker))["last"])
+                            order.price = last * (1 + DIRECTIONS[order.action] * config.reissue_order)
+                            order.state = REISSUED
+                            self.__orders.pop(str(order.order_id), None)
+                            continue
+                elif order.info["订单状态"] not in FINISHED and config.automatic_cancellation:
+                    # 订单未完全成交，且未触发价格撤单和时间撤单，设置了自动撤单时撤单并返回撤单后的订单信息
+                    await self.__cancel(order)
+                order.state = DONE
+                return {"【交易提醒】下单结果": order.info}
+        finally:
+            for order_id in order.order_ids:
+                self.__orders.pop(str(order_id), None)
+
+    def __run(self, order):
+        task = asyncio.ensure_future(self.__drive(order))
+
+        def finish(task):
+            with self.__lock:
+                self.__working.discard(order)
+            if task.cancelled():
+                order.future.cancel()
+            elif task.exception() is not None:
+                order.future.set_exception(task.exception())
+            else:
+                order.future.set_result(task.result())
+        task.add_done_callback(finish)
+
+    def submit(self, platform, action, price, size, callback=None, **kwargs):
+        """
+        提交委托，立即返回，撤单重发在订单管理的事件循环中进行
+        :param platform: 交易模块
+        :param action: "buy"、"sell"、"sellshort"或"buytocover"
+        :param price: 委托价格
+        :param size: 委托数量
+        :param callback: 委托完成后调用callback(ORDER)
+        :param kwargs: 传给交易模块send_order的其他参数，如order_type
+        :return: 返回ORDER
+        """
+        order = ORDER(platform, action, price, size, kwargs)
+        if callback is not None:
+            order.add_done_callback(callback)
+        loop = self.__start()
+        with self.__lock:
+            self.__working.add(order)
+        loop.call_soon_threadsafe(self.__run, order)
+        return order
+
+    def on_status(self, order_id, info):
+        """
+        订单状态事件，如websocket推送的订单更新，收到后立即推进对应的委托，不必等到下一次查询
+        :param order_id: 订单号
+        :param info: 与交易模块get_order_info格式一致的订单信息
+        :return:
+        """
+        order = self.__orders.get(str(order_id))
+        if order is not None and self.__loop is not None:
+            self.__loop.call_soon_threadsafe(order.update, info)
+
+    def orders(self):
+        """返回所有未完成的委托"""
+        with self.__lock:
+            return list(self.__working)
+
+
+ordermanager = __OrderManager()
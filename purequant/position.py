@@ -18,19 +18,22 @@ class POSITION:
         self.__instrument_id = instrument_id
         self.__time_frame = time_frame
         self.__market = MARKET(self.__platform, self.__instrument_id, self.__time_frame)
+        # 回测时若传入的是内存模拟交易所，持仓信息直接从模拟交易所中读取，不再查询数据库；
+        # 按属性判断而不导入SIMULATEDEXCHANGE，导入purequant.trade会同时导入全部交易所的交易模块及其依赖
+        self.__simulated = getattr(self.__platform, "simulated", False)
 
     def direction(self):
         """获取当前持仓方向"""
-        if config.backtest is False:    # 实盘模式下实时获取账户实际持仓方向，仅支持单向持仓模式下的查询
+        if config.backtest is False or self.__simulated:    # 实盘模式下实时获取账户实际持仓方向，仅支持单向持仓模式下的查询
             result = self.__platform.get_position()['direction']
             return result
         else:   # 回测模式下从数据库中读取持仓方向
-            result = storage.read_mysql_datas(0, "回测", self.__instrument_id.split("-")[0].lower() + "_" + self.__time_frame, "总资金", ">")[-1][6]
+            result = storage.read_mysql_latest("回测", self.__instrument_id.split("-")[0].lower() + "_" + self.__time_frame)[6]
             return result
 
     def amount(self, mode=None, side=None):
         """获取当前持仓数量"""
-        if config.backtest is False:    # 实盘模式下实时获取账户实际持仓数量
+        if config.backtest is False or self.__simulated:    # 实盘模式下实时获取账户实际持仓数量
             if mode == "both":  # 如果传入参数"both"，查询双向持仓模式的持仓数量
                 result = self.__platform.get_position(mode=mode)
                 if side == "long":
@@ -43,12 +46,12 @@ class POSITION:
                 result = self.__platform.get_position()['amount']
                 return result
         else:   # 回测模式下从数据库中读取持仓数量
-            result = storage.read_mysql_datas(0, "回测", self.__instrument_id.split("-")[0].lower() + "_" + self.__time_frame, "总资金", ">")[-1][7]
+            result = storage.read_mysql_latest("回测", self.__instrument_id.split("-")[0].lower() + "_" + self.__time_frame)[7]
             return result
 
     def price(self, mode=None, side=None):
         """获取当前的持仓价格"""
-        if config.backtest is False:    # 实盘模式下实时获取账户实际持仓价格
+        if config.backtest is False or self.__simulated:    # 实盘模式下实时获取账户实际持仓价格
             if mode == "both":  # 如果传入参数"both"，查询双向持仓模式的持仓价格
                 result = self.__platform.get_position(mode=mode)
                 if side == "long":
@@ -61,10 +64,20 @@ class POSITION:
                 result = self.__platform.get_position()['price']
                 return result
         else:   # 回测模式下从数据库中读取持仓价格
-            result = storage.read_mysql_datas(0, "回测", self.__instrument_id.split("-")[0].lower() + "_" + self.__time_frame, "总资金", ">")[-1][5]
+            result = storage.read_mysql_latest("回测", self.__instrument_id.split("-")[0].lower() + "_" + self.__time_frame)[5]
             return result
 
 
+    def updated(self):
+        """
+        获取持仓信息最近一次更新的时间戳
+        交易模块调用subscribe_account订阅持仓推送后，direction、amount、price从内存中读取，可据此判断缓存是否过期；
+        未订阅、连接断开或回测模式下返回None，此时持仓信息均为实时查询
+        """
+        if config.backtest is False and hasattr(self.__platform, "get_account_updated"):
+            return self.__platform.get_account_updated()
+        return None
+
     def coverlong_profit(self, market_type=None, last=None):
         """
         计算平多的单笔交易利润
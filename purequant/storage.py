@@ -9,180 +9,63 @@ email: interstella.ranger2020@gmail.com
 """
 import logging, mysql.connector, pymongo
 from purequant.indicators import INDICATORS
+from purequant.kline import KLINE, to_timestamp_ms
 import pandas as pd
+import numpy as np
 from purequant.config import config
+from purequant.databank import databank
 from purequant.time import *
 import datetime
 
 class __Storage:
     """K线等各种数据的存储与读取"""
 
+    # k线数据表以毫秒时间戳为主键，重复保存同一根k线时更新而不是新增一行，按时间范围查询时直接在主键上查找
+    __kline_columns = (("timestamp", "BIGINT NOT NULL PRIMARY KEY"), ("open", "DOUBLE"), ("high", "DOUBLE"),
+                       ("low", "DOUBLE"), ("close", "DOUBLE"), ("volume", "DOUBLE"), ("currency_volume", "DOUBLE"))
+    # 策略运行记录，末尾的自增序号为主键，按序号倒序即可直接取得最新的记录；
+    # 读取时不返回序号列，返回的数据与未增加序号的旧版数据表一致，按下标读取数据的代码无需修改
+    __run_info_columns = (("时间", "TEXT"), ("类型", "TEXT"), ("价格", "DOUBLE"), ("数量", "DOUBLE"),
+                          ("成交金额", "DOUBLE"), ("当前持仓价格", "DOUBLE"), ("当前持仓方向", "TEXT"),
+                          ("当前持仓数量", "DOUBLE"), ("此次盈亏", "DOUBLE"), ("总盈亏", "DOUBLE"), ("总资金", "DOUBLE"),
+                          ("序号", "BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY"))
+
     def __init__(self):
         self.__old_kline = 0
+        self.__fields = {}  # (数据库, 数据表) -> 读取时返回的列，即除自增序号以外的列
+
+    def __select(self, database, datasheet, key="序号"):
+        """
+        读取数据表时SELECT的列，数据表中有自增序号时列出除序号以外的全部列，否则为*
+        :return: 返回(SELECT的列, 数据表中是否有自增序号)
+        """
+        fields = self.__fields.get((database, datasheet))
+        if fields is None:
+            fields = databank.columns(database, datasheet)
+            if fields:  # 数据表尚未创建时列为空，不缓存，创建后重新获取
+                self.__fields[(database, datasheet)] = fields
+        if key not in fields:
+            return "*", False
+        return ", ".join(field for field in fields if field != key), True
 
     def save_asset_and_profit(self, database, data_sheet, profit, asset):
         """存储单笔交易盈亏与总资金信息至mysql数据库"""
-        # 检查数据库是否存在，如不存在则创建
-        user = config.mysql_user_name if config.mysql_authorization else 'root'
-        password = config.mysql_password if config.mysql_authorization else 'root'
-        conn1 = mysql.connector.connect(user=user, password=password)
-        cursor1 = conn1.cursor()
-        cursor1.execute("SHOW DATABASES")
-        list1 = []
-        for item in cursor1:
-            for x in item:
-                list1.append(x)
-        if database in list1:
-            pass
-        else:
-            cursor1.execute("CREATE DATABASE {}".format(database))
-        conn1.commit()
-        cursor1.close()
-        conn1.close()
-        # 检查数据表是否存在，如不存在则创建
-        conn2 = mysql.connector.connect(user=user, password=password, database=database)
-        cursor2 = conn2.cursor()
-        cursor2.execute("SHOW TABLES")
-        list2 = []
-        for item in cursor2:
-            for x in item:
-                list2.append(x)
-        if data_sheet in list2:
-            pass
-        else:
-            cursor2.execute("CREATE TABLE {} (timestamp TEXT, profit FLOAT, asset FLOAT)".format(data_sheet))
-        # 插入数据
-        cursor2.execute(
-            'insert into {} (timestamp, profit, asset) values (%s, %s, %s)'.format(
-                data_sheet),
-            [get_localtime(), profit, asset])
-        conn2.commit()
-        cursor2.close()
-        conn2.close()
+        insert = databank.insert_later if config.mysql_write_behind else databank.insert     # 延迟写入时不阻塞交易流程
+        insert(database, data_sheet, (("timestamp", "TEXT"), ("profit", "DOUBLE"), ("asset", "DOUBLE"),
+                                      ("序号", "BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY")),
+               [get_localtime(), profit, asset])
 
     def mysql_save_strategy_position(self, database, data_sheet, direction, amount):
         """存储持仓方向与持仓数量信息至mysql数据库"""
-        # 检查数据库是否存在，如不存在则创建
-        user = config.mysql_user_name if config.mysql_authorization else 'root'
-        password = config.mysql_password if config.mysql_authorization else 'root'
-        conn1 = mysql.connector.connect(user=user, password=password)
-        cursor1 = conn1.cursor()
-        cursor1.execute("SHOW DATABASES")
-        list1 = []
-        for item in cursor1:
-            for x in item:
-                list1.append(x)
-        if database in list1:
-            pass
-        else:
-            cursor1.execute("CREATE DATABASE {}".format(database))
-        conn1.commit()
-        cursor1.close()
-        conn1.close()
-        # 检查数据表是否存在，如不存在则创建
-        conn2 = mysql.connector.connect(user=user, password=password, database=database)
-        cursor2 = conn2.cursor()
-        cursor2.execute("SHOW TABLES")
-        list2 = []
-        for item in cursor2:
-            for x in item:
-                list2.append(x)
-        if data_sheet in list2:
-            pass
-        else:
-            cursor2.execute("CREATE TABLE {} (timestamp TEXT, direction TEXT, amount FLOAT)".format(data_sheet))
-        # 插入数据
-        cursor2.execute(
-            'insert into {} (timestamp, direction, amount) values (%s, %s, %s)'.format(
-                data_sheet),
-            [get_localtime(), direction, amount])
-        conn2.commit()
-        cursor2.close()
-        conn2.close()
-
-    def __save_kline_func(self, database, data_sheet, timestamp, open, high, low, close, volume, currency_volume):
-        """此函数专为存储7列k线数据的函数使用"""
-        # 检查数据库是否存在，如不存在则创建
-        user = config.mysql_user_name if config.mysql_authorization else 'root'
-        password = config.mysql_password if config.mysql_authorization else 'root'
-        conn1 = mysql.connector.connect(user=user, password=password)
-        cursor1 = conn1.cursor()
-        cursor1.execute("SHOW DATABASES")
-        list1 = []
-        for item in cursor1:
-            for x in item:
-                list1.append(x)
-        if database in list1:
-            pass
-        else:
-            cursor1.execute("CREATE DATABASE {}".format(database))
-        conn1.commit()
-        cursor1.close()
-        conn1.close()
-        # 检查数据表是否存在，如不存在则创建
-        conn2 = mysql.connector.connect(user=user, password=password, database=database)
-        cursor2 = conn2.cursor()
-        cursor2.execute("SHOW TABLES")
-        list2 = []
-        for item in cursor2:
-            for x in item:
-                list2.append(x)
-        if data_sheet in list2:
-            pass
-        else:
-            cursor2.execute("CREATE TABLE {} (timestamp TEXT, open FLOAT, high FLOAT, low FLOAT, close FLOAT, volume FLOAT, currency_volume FLOAT)".format(data_sheet))
-        # 插入数据
-        cursor2.execute(
-            'insert into {} (timestamp, open, high, low, close, volume, currency_volume) values (%s, %s, %s, %s, %s, %s, %s)'.format(
-                data_sheet),
-            [timestamp, open, high, low, close, volume, currency_volume])
-        # 提交事务
-        conn2.commit()
-        # 关闭游标和连接
-        cursor2.close()
-        conn2.close()
+        insert = databank.insert_later if config.mysql_write_behind else databank.insert     # 延迟写入时不阻塞交易流程
+        insert(database, data_sheet, (("timestamp", "TEXT"), ("direction", "TEXT"), ("amount", "DOUBLE"),
+                                      ("序号", "BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY")),
+               [get_localtime(), direction, amount])
 
     def __six_save_kline_func(self, database, data_sheet, timestamp, open, high, low, close, volume):
         """此函数专为存储6列k线数据的函数使用"""
-        # 检查数据库是否存在，如不存在则创建
-        user = config.mysql_user_name if config.mysql_authorization else 'root'
-        password = config.mysql_password if config.mysql_authorization else 'root'
-        conn1 = mysql.connector.connect(user=user, password=password)
-        cursor1 = conn1.cursor()
-        cursor1.execute("SHOW DATABASES")
-        list1 = []
-        for item in cursor1:
-            for x in item:
-                list1.append(x)
-        if database in list1:
-            pass
-        else:
-            cursor1.execute("CREATE DATABASE {}".format(database))
-        conn1.commit()
-        cursor1.close()
-        conn1.close()
-        # 检查数据表是否存在，如不存在则创建
-        conn2 = mysql.connector.connect(user=user, password=password, database=database)
-        cursor2 = conn2.cursor()
-        cursor2.execute("SHOW TABLES")
-        list2 = []
-        for item in cursor2:
-            for x in item:
-                list2.append(x)
-        if data_sheet in list2:
-            pass
-        else:
-            cursor2.execute("CREATE TABLE {} (timestamp TEXT, open FLOAT, high FLOAT, low FLOAT, close FLOAT, volume FLOAT)".format(data_sheet))
-        # 插入数据
-        cursor2.execute(
-            'insert into {} (timestamp, open, high, low, close, volume) values (%s, %s, %s, %s, %s, %s)'.format(
-                data_sheet),
-            [timestamp, open, high, low, close, volume])
-        # 提交事务
-        conn2.commit()
-        # 关闭游标和连接
-        cursor2.close()
-        conn2.close()
+        databank.insert_many(database, data_sheet, self.__kline_columns[:6],
+                             [[to_timestamp_ms(timestamp), open, high, low, close, volume]])
 
     def kline_save(self, database, data_sheet, platform, instrument_id, time_frame):
         """
@@ -196,21 +79,30 @@ class __Storage:
         """
         result = platform.get_kline(time_frame)
         result.reverse()
-        try:
-            for data in result:
-                self.__save_kline_func(database, data_sheet, data[0], data[1], data[2], data[3], data[4], data[5], data[6])
-        except:
-            for data in result:
-                self.__six_save_kline_func(database, data_sheet, data[0], data[1], data[2], data[3], data[4], data[5])
+        self.kline_bulk_save(database, data_sheet, result)
         print("获取的历史数据已存储至mysql数据库！")
 
-    def kline_storage(self, database, data_sheet, platform, instrument_id, time_frame):
+    def kline_bulk_save(self, database, data_sheet, records):
         """
-        实时获取上一根k线存储至数据库中。
+        批量保存k线数据至mysql数据库，在同一个事务中以多行INSERT写入，时间戳重复的k线更新为新的数据
         :param database: 数据库名称
         :param data_sheet: 数据表名称
+        :param records: k线数据列表，每根k线格式为[时间, 开, 高, 低, 收, 成交量]或[时间, 开, 高, 低, 收, 成交量, 币成交量]，
+                        时间统一转换为毫秒时间戳保存
+        :return: 返回写入的k线数量
+        """
+        columns = self.__kline_columns if records and len(records[0]) >= 7 else self.__kline_columns[:6]   # 部分交易所的k线数据不包含currency_volume
+        return databank.insert_many(database, data_sheet, columns,
+                                    [[to_timestamp_ms(data[0])] + list(data[1:len(columns)]) for data in records])
+
+    def kline_storage(self, database, data_sheet, platform, instrument_id, time_frame, store=None):
+        """
+        实时获取上一根k线存储至数据库中。
+        :param database: 数据库名称，传入None时不保存至MySQL数据库
+        :param data_sheet: 数据表名称
         :param instrument_id: 交易对或合约id
         :param time_frame: k线周期，如'1m', '1d'，字符串格式
+        :param store: 本地k线仓库KLINESTORE，传入时同时将k线追加至本地k线仓库
         :return:
         """
         indicators = INDICATORS(platform, instrument_id, time_frame)
@@ -223,8 +115,12 @@ class __Storage:
                 low = last_kline[3]
                 close = last_kline[4]
                 volume = last_kline[5]
-                self.__six_save_kline_func(database, data_sheet, timestamp, open, high, low, close, volume)
-                print("时间：{} 实时k线数据已保存至MySQL数据库中！".format(get_localtime()))
+                if database is not None:
+                    self.__six_save_kline_func(database, data_sheet, timestamp, open, high, low, close, volume)
+                    print("时间：{} 实时k线数据已保存至MySQL数据库中！".format(get_localtime()))
+                if store is not None:
+                    store.append([last_kline])
+                    print("时间：{} 实时k线数据已保存至本地k线仓库中！".format(get_localtime()))
                 self.__old_kline = last_kline  # 将刚保存的k线设为旧k线
             else:
                 return
@@ -238,17 +134,8 @@ class __Storage:
         :param field: 字段
         :return: 返回值查询到的数据，如未查询到则返回None
         """
-        # 连接数据库
-        user = config.mysql_user_name if config.mysql_authorization else 'root'
-        password = config.mysql_password if config.mysql_authorization else 'root'
-        conn = mysql.connector.connect(user=user, password=password, database=database, buffered=True)
-        # 打开游标
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM {} WHERE {} {} '{}'".format(datasheet, field, operator, data))
-        LogData = cursor.fetchall()  # 取出了数据库数据
-        # 关闭游标和连接
-        cursor.close()
-        conn.close()
+        LogData = databank.query(database, "SELECT {} FROM {} WHERE {} {} %s".format(
+            self.__select(database, datasheet)[0], datasheet, field, operator), (str(data),))
         return LogData
 
     def read_mysql_specific_data(self, data, database, datasheet, field):  # 获取数据库满足条件的数据
@@ -260,19 +147,104 @@ class __Storage:
         :param field: 字段
         :return: 返回值查询到的数据，如未查询到则返回None
         """
-        # 连接数据库
-        user = config.mysql_user_name if config.mysql_authorization else 'root'
-        password = config.mysql_password if config.mysql_authorization else 'root'
-        conn = mysql.connector.connect(user=user, password=password, database=database, buffered=True)
-        # 打开游标
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM {} WHERE {} = '{}'".format(datasheet, field, data))
-        LogData = cursor.fetchone()  # 取出了数据库数据
-        # 关闭游标和连接
-        cursor.close()
-        conn.close()
+        LogData = databank.query(database, "SELECT {} FROM {} WHERE {} = %s".format(
+            self.__select(database, datasheet)[0], datasheet, field), (str(data),), fetch="one")
         return LogData
 
+    def iter_mysql_datas(self, data, database, datasheet, field, operator, chunksize=10000):
+        """
+        分批查询数据库中满足条件的数据，数据量较大时代替read_mysql_datas，不将全部结果一次性读入内存
+        :param data: 要查询的数据，数据类型由要查询的数据决定
+        :param database: 数据库名称
+        :param datasheet: 数据表名称
+        :param field: 字段
+        :param operator: 比较运算符，如">"、"="
+        :param chunksize: 每批读取的行数
+        :return: 返回一个生成器，每次产生一个最多包含chunksize行数据的列表
+        """
+        return databank.iterate(database, "SELECT {} FROM {} WHERE {} {} %s".format(
+            self.__select(database, datasheet)[0], datasheet, field, operator), (str(data),), chunksize)
+
+    def read_mysql_latest(self, database, datasheet, count=None, key="序号"):
+        """
+        读取策略运行记录等数据表中最新写入的数据，按自增序号倒序在主键上查找，不扫描整张数据表，返回的数据不包含序号列。
+        没有自增序号的旧版数据表按写入顺序读取全部数据后取最后几行
+        :param database: 数据库名称
+        :param datasheet: 数据表名称
+        :param count: 读取的行数，不传入时只读取最新的一行
+        :param key: 排序所用的自增主键
+        :return: 不传入count时返回最新的一行数据，如未查询到则返回None；传入count时返回按写入先后顺序排列的最近count行数据
+        """
+        fields, indexed = self.__select(database, datasheet, key)
+        if not indexed:
+            LogData = databank.query(database, "SELECT * FROM {}".format(datasheet))
+            if count is None:
+                return LogData[-1] if LogData else None
+            return LogData[-int(count):] if count else []
+        if count is None:
+            return databank.query(database, "SELECT {} FROM {} ORDER BY {} DESC LIMIT 1".format(fields, datasheet, key), fetch="one")
+        LogData = databank.query(database, "SELECT {} FROM {} ORDER BY {} DESC LIMIT %s".format(fields, datasheet, key), (int(count),))
+        return LogData[::-1]
+
+    def __kline_range(self, start, end):
+        """按起止时间生成k线查询的条件语句与参数"""
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("timestamp >= %s")
+            params.append(to_timestamp_ms(start))
+        if end is not None:
+            conditions.append("timestamp <= %s")
+            params.append(to_timestamp_ms(end))
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), tuple(params)
+
+    def __to_kline(self, rows):
+        """将查询到的k线数据转换为列式的KLINE"""
+        if not rows:
+            return KLINE()
+        columns = np.ascontiguousarray(np.array(rows, dtype=np.float64).T)
+        return KLINE.from_columns(columns[0].astype(np.int64), columns[1], columns[2], columns[3], columns[4], columns[5])
+
+    def read_kline_range(self, database, data_sheet, start=None, end=None):
+        """
+        按时间范围读取kline_bulk_save保存的k线数据，在时间戳主键上做范围查询
+        :param database: 数据库名称
+        :param data_sheet: 数据表名称
+        :param start: 起始时间（包含），可以是utc时间字符串、本地时间字符串或时间戳，不传入则从第一根k线开始
+        :param end: 结束时间（包含），不传入则到最后一根k线为止
+        :return: 返回按时间先后顺序排列的KLINE，时间为毫秒时间戳
+        """
+        where, params = self.__kline_range(start, end)
+        rows = databank.query(database, "SELECT timestamp, open, high, low, close, volume FROM {}{} ORDER BY timestamp".format(
+            data_sheet, where), params)
+        return self.__to_kline(rows)
+
+    def read_kline_last(self, database, data_sheet, count):
+        """
+        读取最近的count根k线，在时间戳主键上倒序查找，不扫描整张数据表
+        :param database: 数据库名称
+        :param data_sheet: 数据表名称
+        :param count: k线数量
+        :return: 返回按时间先后顺序排列的KLINE，时间为毫秒时间戳
+        """
+        rows = databank.query(database, "SELECT timestamp, open, high, low, close, volume FROM {} ORDER BY timestamp DESC LIMIT %s".format(
+            data_sheet), (int(count),))
+        return self.__to_kline(rows[::-1])
+
+    def iter_kline(self, database, data_sheet, start=None, end=None, chunksize=100000):
+        """
+        按时间范围分批读取k线数据，用于数据量超出内存时逐段回测或导出
+        :param database: 数据库名称
+        :param data_sheet: 数据表名称
+        :param start: 起始时间（包含），不传入则从第一根k线开始
+        :param end: 结束时间（包含），不传入则到最后一根k线为止
+        :param chunksize: 每批读取的k线数量
+        :return: 返回一个生成器，每次产生一个按时间先后顺序排列的KLINE
+        """
+        where, params = self.__kline_range(start, end)
+        for rows in databank.iterate(database, "SELECT timestamp, open, high, low, close, volume FROM {}{} ORDER BY timestamp".format(
+                data_sheet, where), params, chunksize):
+            yield self.__to_kline(rows)
+
     def text_save(self, content, filename, mode='a'):
         """
         保存数据至txt文件。
@@ -333,43 +305,8 @@ class __Storage:
     def mysql_save_okex_spot_accounts(self, database, data_sheet, currency, balance, frozen, available, timestamp=None):
         """存储okex现货账户信息至mysql数据库"""
         timestamp = timestamp if timestamp is not None else get_localtime()   # 默认是自动填充本地时间，也可以传入*****来做数据分割
-        # 检查数据库是否存在，如不存在则创建
-        user = config.mysql_user_name if config.mysql_authorization else 'root'
-        password = config.mysql_password if config.mysql_authorization else 'root'
-        conn1 = mysql.connector.connect(user=user, password=password)
-        cursor1 = conn1.cursor()
-        cursor1.execute("SHOW DATABASES")
-        list1 = []
-        for item in cursor1:
-            for x in item:
-                list1.append(x)
-        if database in list1:
-            pass
-        else:
-            cursor1.execute("CREATE DATABASE {}".format(database))
-        conn1.commit()
-        cursor1.close()
-        conn1.close()
-        # 检查数据表是否存在，如不存在则创建
-        conn2 = mysql.connector.connect(user=user, password=password, database=database)
-        cursor2 = conn2.cursor()
-        cursor2.execute("SHOW TABLES")
-        list2 = []
-        for item in cursor2:
-            for x in item:
-                list2.append(x)
-        if data_sheet in list2:
-            pass
-        else:  # 如果数据表不存在就创建
-            cursor2.execute("CREATE TABLE {} (时间 TEXT, 币种 TEXT, 余额 TEXT, 冻结 TEXT, 可用 TEXT)".format(data_sheet))
-        # 插入新数据
-        cursor2.execute(
-            'insert into {} (时间, 币种, 余额, 冻结, 可用) values (%s, %s, %s, %s, %s)'.format(
-                data_sheet),
-            [timestamp, currency, balance, frozen, available])
-        conn2.commit()
-        cursor2.close()
-        conn2.close()
+        databank.insert(database, data_sheet, (("时间", "TEXT"), ("币种", "TEXT"), ("余额", "TEXT"), ("冻结", "TEXT"), ("可用", "TEXT")),
+                        [timestamp, currency, balance, frozen, available])
 
     def mysql_save_okex_fixedfutures_accounts(self, database, data_sheet, symbol, currency, margin_mode,
                                                                 equity, fixed_balance, available_qty, margin_frozen,
@@ -378,144 +315,31 @@ class __Storage:
                                                                 can_withdraw, timestamp=None):
         """存储okex逐仓模式交割合约账户信息至mysql数据库"""
         timestamp = timestamp if timestamp is not None else get_localtime()   # 默认是自动填充本地时间，也可以传入*****来做数据分割
-        # 检查数据库是否存在，如不存在则创建
-        user = config.mysql_user_name if config.mysql_authorization else 'root'
-        password = config.mysql_password if config.mysql_authorization else 'root'
-        conn1 = mysql.connector.connect(user=user, password=password)
-        cursor1 = conn1.cursor()
-        cursor1.execute("SHOW DATABASES")
-        list1 = []
-        for item in cursor1:
-            for x in item:
-                list1.append(x)
-        if database in list1:
-            pass
-        else:
-            cursor1.execute("CREATE DATABASE {}".format(database))
-        conn1.commit()
-        cursor1.close()
-        conn1.close()
-        # 检查数据表是否存在，如不存在则创建
-        conn2 = mysql.connector.connect(user=user, password=password, database=database)
-        cursor2 = conn2.cursor()
-        cursor2.execute("SHOW TABLES")
-        list2 = []
-        for item in cursor2:
-            for x in item:
-                list2.append(x)
-        if data_sheet in list2:
-            pass
-        else:  # 如果数据表不存在就创建
-            cursor2.execute("CREATE TABLE {} (时间 TEXT, 币对 TEXT, 余额币种 TEXT, 账户类型 TEXT, 账户权益 TEXT, 逐仓账户余额 TEXT, 逐仓可用余额 TEXT, 持仓已用保证金 TEXT, 挂单冻结保证金 TEXT, 已实现盈亏 TEXT, 未实现盈亏 TEXT, 账户静态权益 TEXT, 是否自动追加保证金 TEXT, 强平模式 TEXT, 可划转数量 TEXT)".format(data_sheet))
-        # 插入新数据
-        cursor2.execute(
-            'insert into {} (时间, 币对, 余额币种, 账户类型, 账户权益, 逐仓账户余额, 逐仓可用余额, 持仓已用保证金, 挂单冻结保证金, 已实现盈亏, 未实现盈亏, 账户静态权益, 是否自动追加保证金, 强平模式, 可划转数量) values (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'.format(
-                data_sheet),
-            [timestamp, symbol, currency, margin_mode, equity, fixed_balance, available_qty, margin_frozen,
-             margin_for_unfilled, realized_pnl, unrealized_pnl, total_avail_balance, auto_margin, liqui_mode, can_withdraw])
-        conn2.commit()
-        cursor2.close()
-        conn2.close()
+        databank.insert(database, data_sheet, (("时间", "TEXT"), ("币对", "TEXT"), ("余额币种", "TEXT"), ("账户类型", "TEXT"), ("账户权益", "TEXT"), ("逐仓账户余额", "TEXT"), ("逐仓可用余额", "TEXT"), ("持仓已用保证金", "TEXT"), ("挂单冻结保证金", "TEXT"), ("已实现盈亏", "TEXT"), ("未实现盈亏", "TEXT"), ("账户静态权益", "TEXT"), ("是否自动追加保证金", "TEXT"), ("强平模式", "TEXT"), ("可划转数量", "TEXT")),
+                        [timestamp, symbol, currency, margin_mode, equity, fixed_balance, available_qty, margin_frozen,
+                         margin_for_unfilled, realized_pnl, unrealized_pnl, total_avail_balance, auto_margin, liqui_mode,
+                         can_withdraw])
 
     def mysql_save_okex_crossedfutures_accounts(self, database, data_sheet, symbol, currency, margin_mode, equity, total_avail_balance, margin,
                                                 margin_frozen, margin_for_unfilled, realized_pnl, unrealized_pnl, margin_ratio, maint_margin_ratio,
                                                 liqui_mode, can_withdraw, liqui_fee_rate, timestamp=None):
         """存储okex全仓模式交割合约账户信息至mysql数据库"""
         timestamp = timestamp if timestamp is not None else get_localtime()   # 默认是自动填充本地时间，也可以传入*****来做数据分割
-        # 检查数据库是否存在，如不存在则创建
-        user = config.mysql_user_name if config.mysql_authorization else 'root'
-        password = config.mysql_password if config.mysql_authorization else 'root'
-        conn1 = mysql.connector.connect(user=user, password=password)
-        cursor1 = conn1.cursor()
-        cursor1.execute("SHOW DATABASES")
-        list1 = []
-        for item in cursor1:
-            for x in item:
-                list1.append(x)
-        if database in list1:
-            pass
-        else:
-            cursor1.execute("CREATE DATABASE {}".format(database))
-        conn1.commit()
-        cursor1.close()
-        conn1.close()
-        # 检查数据表是否存在，如不存在则创建
-        conn2 = mysql.connector.connect(user=user, password=password, database=database)
-        cursor2 = conn2.cursor()
-        cursor2.execute("SHOW TABLES")
-        list2 = []
-        for item in cursor2:
-            for x in item:
-                list2.append(x)
-        if data_sheet in list2:
-            pass
-        else:  # 如果数据表不存在就创建
-            cursor2.execute("CREATE TABLE {} (时间 TEXT, 币对 TEXT, 余额币种 TEXT, 账户类型 TEXT, 账户权益 TEXT, 账户余额 TEXT, 保证金 TEXT, 持仓已用保证金 TEXT, 挂单冻结保证金 TEXT, 已实现盈亏 TEXT, 未实现盈亏 TEXT, 保证金率 TEXT, 维持保证金率 TEXT, 强平模式 TEXT, 可划转数量 TEXT, 强平手续费 TEXT)".format(data_sheet))
-        # 插入新数据
-        cursor2.execute(
-            'insert into {} (时间, 币对, 余额币种, 账户类型, 账户权益, 账户余额, 保证金, 持仓已用保证金, 挂单冻结保证金, 已实现盈亏, 未实现盈亏, 保证金率, 维持保证金率, 强平模式, 可划转数量, 强平手续费) values (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'.format(
-                data_sheet),
-            [timestamp, symbol, currency, margin_mode, equity, total_avail_balance, margin,
-                                                margin_frozen, margin_for_unfilled, realized_pnl, unrealized_pnl, margin_ratio, maint_margin_ratio,
-                                                liqui_mode, can_withdraw, liqui_fee_rate])
-        conn2.commit()
-        cursor2.close()
-        conn2.close()
+        databank.insert(database, data_sheet, (("时间", "TEXT"), ("币对", "TEXT"), ("余额币种", "TEXT"), ("账户类型", "TEXT"), ("账户权益", "TEXT"), ("账户余额", "TEXT"), ("保证金", "TEXT"), ("持仓已用保证金", "TEXT"), ("挂单冻结保证金", "TEXT"), ("已实现盈亏", "TEXT"), ("未实现盈亏", "TEXT"), ("保证金率", "TEXT"), ("维持保证金率", "TEXT"), ("强平模式", "TEXT"), ("可划转数量", "TEXT"), ("强平手续费", "TEXT")),
+                        [timestamp, symbol, currency, margin_mode, equity, total_avail_balance, margin, margin_frozen,
+                         margin_for_unfilled, realized_pnl, unrealized_pnl, margin_ratio, maint_margin_ratio, liqui_mode,
+                         can_withdraw, liqui_fee_rate])
 
     def mysql_save_okex_swap_accounts(self, database, data_sheet, timestamp, symbol, currency, margin_mode, equity, total_avail_balance, fixed_balance, margin, margin_frozen, realized_pnl, unrealized_pnl, margin_ratio, maint_margin_ratio, max_withdraw):
         """存储okex全仓模式交割合约账户信息至mysql数据库"""
-        # 检查数据库是否存在，如不存在则创建
-        user = config.mysql_user_name if config.mysql_authorization else 'root'
-        password = config.mysql_password if config.mysql_authorization else 'root'
-        conn1 = mysql.connector.connect(user=user, password=password)
-        cursor1 = conn1.cursor()
-        cursor1.execute("SHOW DATABASES")
-        list1 = []
-        for item in cursor1:
-            for x in item:
-                list1.append(x)
-        if database in list1:
-            pass
-        else:
-            cursor1.execute("CREATE DATABASE {}".format(database))
-        conn1.commit()
-        cursor1.close()
-        conn1.close()
-        # 检查数据表是否存在，如不存在则创建
-        conn2 = mysql.connector.connect(user=user, password=password, database=database)
-        cursor2 = conn2.cursor()
-        cursor2.execute("SHOW TABLES")
-        list2 = []
-        for item in cursor2:
-            for x in item:
-                list2.append(x)
-        if data_sheet in list2:
-            pass
-        else:  # 如果数据表不存在就创建
-            cursor2.execute("CREATE TABLE {} (时间 TEXT, 币对 TEXT, 余额币种 TEXT, 账户类型 TEXT, 账户权益 TEXT, 账户余额 TEXT, 逐仓账户余额 TEXT, 持仓已用保证金 TEXT, 挂单冻结保证金 TEXT, 已实现盈亏 TEXT, 未实现盈亏 TEXT, 保证金率 TEXT, 维持保证金率 TEXT, 可划转数量 TEXT)".format(data_sheet))
-        # 插入新数据
-        cursor2.execute(
-            'insert into {} (时间, 币对, 余额币种, 账户类型, 账户权益, 账户余额, 逐仓账户余额, 持仓已用保证金, 挂单冻结保证金, 已实现盈亏, 未实现盈亏, 保证金率, 维持保证金率, 可划转数量) values (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'.format(
-                data_sheet),
-            [timestamp, symbol, currency, margin_mode, equity, total_avail_balance, fixed_balance, margin, margin_frozen, realized_pnl, unrealized_pnl, margin_ratio, maint_margin_ratio, max_withdraw])
-        conn2.commit()
-        cursor2.close()
-        conn2.close()
+        databank.insert(database, data_sheet, (("时间", "TEXT"), ("币对", "TEXT"), ("余额币种", "TEXT"), ("账户类型", "TEXT"), ("账户权益", "TEXT"), ("账户余额", "TEXT"), ("逐仓账户余额", "TEXT"), ("持仓已用保证金", "TEXT"), ("挂单冻结保证金", "TEXT"), ("已实现盈亏", "TEXT"), ("未实现盈亏", "TEXT"), ("保证金率", "TEXT"), ("维持保证金率", "TEXT"), ("可划转数量", "TEXT")),
+                        [timestamp, symbol, currency, margin_mode, equity, total_avail_balance, fixed_balance, margin,
+                         margin_frozen, realized_pnl, unrealized_pnl, margin_ratio, maint_margin_ratio, max_withdraw])
 
     def delete_mysql_database(self, database):
         """删除mysql中的数据库"""
-        # 连接数据库
-        user = config.mysql_user_name if config.mysql_authorization else 'root'
-        password = config.mysql_password if config.mysql_authorization else 'root'
-        conn = mysql.connector.connect(user=user, password=password)
-        cursor = conn.cursor()
-        # 删除数据库
-        sql = "DROP DATABASE IF EXISTS {}".format(database)
-        cursor.execute(sql)
-        # 保存更改并关闭连接
-        conn.commit()
-        cursor.close()
-        conn.close()
+        databank.drop_database(database)
+        self.__fields = {key: value for key, value in self.__fields.items() if key[0] != database}
 
     def delete_mongodb_database(self, database):
         """删除mongodb的数据库"""
@@ -543,44 +367,10 @@ class __Storage:
         :param total_asset: 当前总资金
         :return:
         """
-        # 检查数据库是否存在，如不存在则创建
-        user = config.mysql_user_name if config.mysql_authorization else 'root'
-        password = config.mysql_password if config.mysql_authorization else 'root'
-        conn1 = mysql.connector.connect(user=user, password=password)
-        cursor1 = conn1.cursor()
-        cursor1.execute("SHOW DATABASES")
-        list1 = []
-        for item in cursor1:
-            for x in item:
-                list1.append(x)
-        if database in list1:
-            pass
-        else:
-            cursor1.execute("CREATE DATABASE {}".format(database))
-        conn1.commit()
-        cursor1.close()
-        conn1.close()
-        # 检查数据表是否存在，如不存在则创建
-        conn2 = mysql.connector.connect(user=user, password=password, database=database)
-        cursor2 = conn2.cursor()
-        cursor2.execute("SHOW TABLES")
-        list2 = []
-        for item in cursor2:
-            for x in item:
-                list2.append(x)
-        if data_sheet in list2:
-            pass
-        else:  # 如果数据表不存在就创建
-            cursor2.execute(
-                "CREATE TABLE {} (时间 TEXT, 类型 TEXT, 价格 FLOAT, 数量 FLOAT, 成交金额 FLOAT, 当前持仓价格 FLOAT, 当前持仓方向 TEXT, 当前持仓数量 FLOAT, 此次盈亏 FLOAT, 总盈亏 FLOAT, 总资金 FLOAT)".format(data_sheet))
-        # 插入新数据
-        cursor2.execute(
-            'insert into {} (时间, 类型, 价格, 数量, 成交金额, 当前持仓价格, 当前持仓方向, 当前持仓数量, 此次盈亏, 总盈亏, 总资金) values (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)'.format(data_sheet),
-            [timestamp, action, price, amount, turnover, hold_price, hold_direction, hold_amount, profit, total_profit, total_asset])
-        conn2.commit()
-        cursor2.close()
-        conn2.close()
-
+        insert = databank.insert_later if config.mysql_write_behind else databank.insert     # 延迟写入时不阻塞交易流程
+        insert(database, data_sheet, self.__run_info_columns,
+               [timestamp, action, price, amount, turnover, hold_price, hold_direction, hold_amount, profit,
+                total_profit, total_asset])
 
     def read_purequant_server_datas(self, datasheet):  # 获取数据库满足条件的数据
         # 连接数据库
@@ -599,6 +389,85 @@ class __Storage:
 storage = __Storage()
 
 
+def __csv_timestamp(column):
+    """将csv中的时间一列一次性转换为秒时间戳，支持utc时间字符串与秒或毫秒时间戳"""
+    if pd.api.types.is_numeric_dtype(column):
+        values = column.to_numpy(dtype=np.int64)
+        return values // 1000 if len(values) and values[0] > 10 ** 11 else values
+    values = column.to_numpy(dtype=str)
+    if len(values) and values[0].endswith("Z"):    # 如"2020-07-25T03:05:00.000Z"，截取到秒后由numpy直接解析，比逐个字符串解析快得多
+        return values.astype("U19").astype("datetime64[s]").astype(np.int64)
+    return pd.to_datetime(column, utc=True).to_numpy(dtype="datetime64[s]").astype(np.int64)
+
+
+def __aggregate(timestamp, columns, origin, seconds):
+    """将一段按时间先后排列的k线按周期分组合成，返回每组的周期序号与合成后的各列"""
+    bins = (timestamp - origin) // seconds
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bins)) + 1))
+    ends = np.append(starts[1:], len(bins))
+    result = {
+        "open": columns["open"][starts],
+        "high": np.maximum.reduceat(columns["high"], starts),
+        "low": np.minimum.reduceat(columns["low"], starts),
+        "close": columns["close"][ends - 1]
+    }
+    for name in columns:
+        if name.endswith("volume"):
+            result[name] = np.add.reduceat(columns[name], starts)
+    return bins[starts], result
+
+
+def resample_kline(csv_file_path, intervals, chunksize=1000000):
+    """
+    将自定义csv数据源的1分钟k线数据一次性合成为多个周期的k线数据，分块读取csv文件，内存占用与文件大小无关
+    :param csv_file_path: 文件路径，csv文件须包含timestamp、open、high、low、close、volume列，可以包含currency_volume列
+    :param intervals: 要合成的k线周期列表，例如[5, 15, 60, 240, 1440]，单位为分钟，也可以只传入一个整数
+    :param chunksize: 每次读取的行数
+    :return: 返回一个字典，键为k线周期，值为各列numpy数组组成的字典，其中timestamp为周期开始时的秒时间戳，
+             周期的划分与原combine_kline一致，以第一根k线所在日的本地零点为起点，没有数据的周期不输出
+    """
+    if isinstance(intervals, int):
+        intervals = [intervals]
+    origin = None
+    pending = {}    # 每个周期尚未结束的最后一根k线，下一块数据可能还属于这个周期
+    output = {interval: [] for interval in intervals}
+    for chunk in pd.read_csv(csv_file_path, chunksize=chunksize):
+        if len(chunk) == 0:
+            continue
+        timestamp = __csv_timestamp(chunk["timestamp"])
+        names = [name for name in ("open", "high", "low", "close", "volume", "currency_volume") if name in chunk]
+        columns = {name: chunk[name].to_numpy(dtype=np.float64) for name in names}
+        if origin is None:  # 以第一根k线所在日的本地零点为起点
+            offset = int(datetime.datetime.fromtimestamp(int(timestamp[0])).astimezone().utcoffset().total_seconds())
+            origin = (int(timestamp[0]) + offset) // 86400 * 86400 - offset
+        for interval in intervals:
+            bins, result = __aggregate(timestamp, columns, origin, interval * 60)
+            carry = pending.get(interval)
+            if carry is not None and carry[0] == bins[0]:   # 上一块最后一个周期延续到了这一块，合并为一根k线
+                result["open"][0] = carry[1]["open"]
+                result["high"][0] = max(result["high"][0], carry[1]["high"])
+                result["low"][0] = min(result["low"][0], carry[1]["low"])
+                for name in result:
+                    if name.endswith("volume"):
+                        result[name][0] += carry[1][name]
+            elif carry is not None:
+                output[interval].append((np.array([carry[0]]), {name: np.array([value]) for name, value in carry[1].items()}))
+            output[interval].append((bins[:-1], {name: values[:-1] for name, values in result.items()}))
+            pending[interval] = (bins[-1], {name: values[-1] for name, values in result.items()})
+    klines = {}
+    for interval in intervals:
+        if interval in pending:
+            bins, result = pending[interval]
+            output[interval].append((np.array([bins]), {name: np.array([value]) for name, value in result.items()}))
+        parts = output[interval]
+        kline = {"timestamp": (np.concatenate([part[0] for part in parts]) * interval * 60 + origin).astype(np.int64)
+                 if parts else np.zeros(0, dtype=np.int64)}
+        for name in (parts[0][1].keys() if parts else ()):
+            kline[name] = np.concatenate([part[1][name] for part in parts])
+        klines[interval] = kline
+    return klines
+
+
 def combine_kline(csv_file_path, interval):
     """
     将自定义csv数据源的1分钟k线数据合成为任意周期的 k线数据，返回列表类型的k线数据，并自动保存新合成的k线数据至csv文件
@@ -606,27 +475,12 @@ def combine_kline(csv_file_path, interval):
     :param interval: 要合成的k线周期，例如3分钟就传入3，1小时就传入60，一天就传入1440
     :return: 返回列表类型的新合成的k线数据，其中时间戳为秒时间戳
     """
-    df = pd.read_csv(csv_file_path)  # 读取传入的原1分钟k线数据
-    for i in df['timestamp']:   # 将时间戳一列先转为秒时间戳，再转为datetime str
-        t = ts_to_datetime_str(utctime_str_to_ts(i))
-        df['timestamp'].replace(i, t, inplace=True)
-    df = df.set_index(pd.DatetimeIndex(pd.to_datetime(df['timestamp'])))   # 设置索引
-    open = df['open'].resample("%dmin"%interval, label="left", closed="left").first()    # 将open一列合成，取第一个价格
-    high = df['high'].resample("%dmin"%interval, label="left", closed="left").max()  # 合并high一列，取最大值，即最高价
-    low = df["low"].resample("%dmin"%interval, label="left", closed="left").min()    # 合并low一列，取最小值，即最低价
-    close = df["close"].resample("%dmin"%interval, label="left", closed="left").last()   # 合并close一列，取最后一个价格
-    volume = df["volume"].resample("%dmin"%interval, label="left", closed="left").sum()  # 合并volume一列，取和
-    try:
-        currency_volume = df["currency_volume"].resample("%dmin" % interval, label="left", closed="left").sum()  # 尝试合并currency_volume一列，如果失败则说明数据并不包含此列
-        kline = pd.DataFrame(
-            {"open": open, "high": high, "low": low, "close": close, "volume": volume, "currency_volume": currency_volume})
-    except:
-        kline = pd.DataFrame({"open": open, "high": high, "low": low, "close": close, "volume": volume})
-    kline.to_csv("{}min_{}".format(interval, csv_file_path))    # 保存新数据至csv文件
-    records = pd.read_csv("{}min_{}".format(interval, csv_file_path)) # 读取新文件，因为旧数据经处理后并不包含时间戳
-    for i in records['timestamp']:  # 将时间戳转为秒时间戳，计算指标的模块对此有要求
-        j = (datetime_str_to_ts(i))
-        records['timestamp'].replace(i, j, inplace=True)
-    data = records.values.tolist()  # 将新读取的数据转换为列表数据类型
+    kline = resample_kline(csv_file_path, interval)[interval]
+    df = pd.DataFrame(kline)
+    timestamp = pd.to_datetime(df["timestamp"], unit="s", utc=True).dt.tz_convert(
+        datetime.datetime.now().astimezone().tzinfo).dt.strftime("%Y-%m-%d %H:%M:%S")
+    df.assign(timestamp=timestamp).to_csv("{}min_{}".format(interval, csv_file_path), index=False)    # 保存新数据至csv文件
+    data = df.values.tolist()   # 转换为列表数据类型
+    for item in data:
+        item[0] = int(item[0])
     return data
-
@@ -0,0 +1,90 @@
+# -*- coding:utf-8 -*-
+
+"""
+多进程参数优化模块
+
+k线数据只加载一次，放入共享内存中，各子进程直接映射这块内存读取k线数据，不再复制或重新下载，
+所有参数组合分发到进程池中并行回测，每组参数的统计结果汇总成一张表。
+
+Author: Gary-Hertel
+Date:   2020/11/27
+email: interstella.ranger2020@gmail.com
+"""
+
+import os
+import itertools
+import functools
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from purequant.kline import KLINE
+
+__COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+__shared = {}   # 子进程中映射的共享内存与k线数据
+
+
+def __attach(name, count):
+    """进程池初始化函数，子进程启动时映射共享内存中的k线数据"""
+    memory = shared_memory.SharedMemory(name=name)
+    data = np.ndarray((len(__COLUMNS), count), dtype=np.float64, buffer=memory.buf)
+    data.flags.writeable = False    # 各进程共用同一块内存，策略函数不得修改k线数据
+    kline = {column: data[index] for index, column in enumerate(__COLUMNS)}
+    kline["timestamp"] = kline["timestamp"].astype(np.int64)
+    __shared["memory"] = memory
+    __shared["kline"] = kline
+
+
+def __run(strategy, param):
+    """在子进程中回测一组参数，只保留返回结果中的数值统计项"""
+    result = strategy(__shared["kline"], **param)
+    row = dict(param)
+    for key, value in result.items():
+        if isinstance(value, (int, float, np.integer, np.floating)):
+            row[key] = value
+    if "equity" in result and len(result["equity"]):
+        row["final_equity"] = float(result["equity"][-1])
+    return row
+
+
+def parameter_grid(**params):
+    """
+    生成参数组合
+    :param params: 每个参数的取值范围，如fast_length=range(5, 20, 2), slow_length=range(10, 30, 2)
+    :return: 返回参数字典的列表
+    """
+    names = list(params.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*params.values())]
+
+
+def parameter_sweep(kline, strategy, params, processes=None, chunksize=None):
+    """
+    多进程参数优化
+    :param kline: 按时间先后顺序排列的k线数据列表或者KLINE
+    :param strategy: 策略函数，必须定义在模块顶层以便传给子进程，调用方式为strategy(kline, **param)，
+                     kline是以"timestamp"、"open"、"high"、"low"、"close"、"volume"为键的numpy数组字典，
+                     返回一个字典，例如vectorized_backtest的回测结果
+    :param params: 参数组合，可以是parameter_grid生成的参数字典列表，也可以是传给parameter_grid的取值范围字典
+    :param processes: 进程数量，默认为cpu核心数
+    :param chunksize: 每次分发给子进程的参数组合数量，默认按参数组合总数与进程数量自动计算
+    :return: 返回pandas的DataFrame，每一行是一组参数及其回测结果中的数值统计项
+    """
+    if isinstance(params, dict):
+        params = parameter_grid(**params)
+    if not isinstance(kline, KLINE):
+        kline = KLINE(kline)
+    count = len(kline)
+    processes = processes or os.cpu_count() or 1
+    chunksize = chunksize or max(1, len(params) // (processes * 4))
+    memory = shared_memory.SharedMemory(create=True, size=max(1, len(__COLUMNS) * count * 8))
+    try:
+        data = np.ndarray((len(__COLUMNS), count), dtype=np.float64, buffer=memory.buf)
+        for index, column in enumerate(__COLUMNS):
+            data[index] = getattr(kline, column)
+        with ProcessPoolExecutor(max_workers=processes, initializer=__attach, initargs=(memory.name, count)) as executor:
+            rows = list(executor.map(functools.partial(__run, strategy), params, chunksize=chunksize))
+        del data
+    finally:
+        memory.close()
+        memory.unlink()
+    return pd.DataFrame(rows)
@@ -13,4 +13,6 @@ from purequant.trade.ccxt_exchanges import CCXTEXCHANGE
 from purequant.trade.bitcoke import BITCOKE
 from purequant.trade.mxc import MXC
 from purequant.trade.bybitfutures import BYBITFUTURES
-from purequant.trade.bybitswap import BYBITSWAP
\ No newline at end of file
+from purequant.trade.bybitswap import BYBITSWAP
+from purequant.trade.simulated import SIMULATEDEXCHANGE
+from purequant.trade.asynchronous import ASYNCEXCHANGE
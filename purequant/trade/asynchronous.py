@@ -0,0 +1,74 @@
+"""
+交易模块的异步版本
+将任意交易模块包装为可以await的接口，每次调用在线程池中执行原交易模块的方法，不阻塞事件循环，
+同一个事件循环中可以同时查询多个交易对的行情、持仓与订单，配合exchange.session的长连接，
+N个交易对的查询耗时接近一次网络往返而不是N次。
+Author: Gary-Hertel
+Date:   2020/12/01
+email: interstella.ranger2020@gmail.com
+"""
+
+import asyncio
+import functools
+
+
+class ASYNCEXCHANGE:
+
+    def __init__(self, platform, executor=None):
+        """
+        交易模块的异步版本，方法名与参数与原交易模块一致，例如：
+            okex = ASYNCEXCHANGE(OKEXSWAP(access_key, secret_key, passphrase, "BTC-USDT-SWAP"))
+            ticker = await okex.get_ticker()
+        原交易模块中的其他方法同样可以await调用。
+        :param platform: 交易模块，如OKEXFUTURES、HUOBISWAP、BINANCESWAP、BITMEX
+        :param executor: 执行请求的线程池，默认使用事件循环的默认线程池
+        """
+        self.__platform = platform
+        self.__executor = executor
+
+    @property
+    def platform(self):
+        """被包装的同步交易模块"""
+        return self.__platform
+
+    async def __call(self, name, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.__executor, functools.partial(getattr(self.__platform, name), *args, **kwargs))
+
+    def __getattr__(self, name):
+        if name.startswith("_"):    # 私有属性不转发，避免复制或序列化时在初始化之前递归查找
+            raise AttributeError(name)
+        attribute = getattr(self.__platform, name)
+        if not callable(attribute):
+            return attribute
+        return functools.partial(self.__call, name)
+
+    async def get_kline(self, time_frame):
+        return await self.__call("get_kline", time_frame)
+
+    async def get_ticker(self):
+        return await self.__call("get_ticker")
+
+    async def get_depth(self, *args, **kwargs):
+        return await self.__call("get_depth", *args, **kwargs)
+
+    async def get_position(self, *args, **kwargs):
+        return await self.__call("get_position", *args, **kwargs)
+
+    async def get_order_info(self, *args, **kwargs):
+        return await self.__call("get_order_info", *args, **kwargs)
+
+    async def buy(self, *args, **kwargs):
+        return await self.__call("buy", *args, **kwargs)
+
+    async def sell(self, *args, **kwargs):
+        return await self.__call("sell", *args, **kwargs)
+
+    async def sellshort(self, *args, **kwargs):
+        return await self.__call("sellshort", *args, **kwargs)
+
+    async def buytocover(self, *args, **kwargs):
+        return await self.__call("buytocover", *args, **kwargs)
+
+    async def revoke_order(self, *args, **kwargs):
+        return await self.__call("revoke_order", *args, **kwargs)
@@ -5,11 +5,13 @@ Date:   2020/10/27
 email: purequant@foxmail.com
 """
 
-import time
 from purequant.exchange.binance import binance_futures
 from purequant.time import ts_to_utc_str
 from purequant.config import config
 from purequant.exceptions import *
+from purequant.ordermanager import ordermanager
+from purequant.batch import batch
+from purequant.instrument import instruments
 
 
 class BINANCEFUTURES:
@@ -58,327 +60,71 @@ class BINANCEFUTURES:
                 balance = float(i["balance"])
                 return balance
 
+    def send_order(self, action, price, size, order_type=None, timeInForce=None):
+        """
+        下单，不撤单重发，由订单管理调用，价格撤单与时间撤单见ordermanager
+        :param action: "buy"、"sell"、"sellshort"或"buytocover"
+        :return: 返回订单号
+        """
+        side = "BUY" if action in ("buy", "buytocover") else "SELL"
+        if self.position_side == "both":
+            positionSide = "LONG" if action in ("buy", "sell") else "SHORT"
+        else:
+            positionSide = "BOTH"
+        order_type = "LIMIT" if order_type is None else order_type  # 默认限价单
+        timeInForce = "GTC" if timeInForce is None else timeInForce  # 默认成交为止，订单会一直有效，直到被成交或者取消。
+        result = self.__binance_futures.order(symbol=self.__instrument_id,
+                                              side=side,
+                                              positionSide=positionSide,
+                                              quantity=size,
+                                              price=price,
+                                              orderType=order_type,
+                                              timeInForce=timeInForce)
+        if "msg" in str(result):   # 如果下单失败就抛出异常，提示错误信息。
+            raise SendOrderError(result["msg"])
+        return result['orderId']
+
+    def batch_order(self, orders, **kwargs):
+        """
+        批量下单，币安的rest接口没有批量下单，各订单分别下单，在线程池中并发发送，不撤单重发
+        :param orders: 列表，每个元素为(action, price, size)，action为"buy"、"sell"、"sellshort"或"buytocover"
+        :param kwargs: 传给send_order的其他参数，如order_type，所有订单相同
+        :return: 返回与orders顺序一致的列表，下单成功的位置为订单号，交易所拒绝的位置为SendOrderError，
+                 请求超时或断线的位置为UnknownOrderError，该订单可能已经下单，应查询挂单后再决定是否重发
+        """
+        if config.backtest is not False:  # 回测模式
+            return ["回测模拟下单成功！"] * len(orders)
+        return batch(orders, 1, lambda group: [self.send_order(*group[0], **kwargs)])
+
+    def batch_revoke(self, order_ids):
+        """
+        批量撤单，各订单分别撤单，在线程池中并发发送
+        :param order_ids: 订单号列表
+        :return: 返回与order_ids顺序一致的列表，每个元素与revoke_order的返回值一致
+        """
+        return batch(order_ids, 1, lambda group: [self.revoke_order(group[0])], lambda e: '【交易提醒】撤单失败' + str(e))
+
     def buy(self, price, size, order_type=None, timeInForce=None):
-        if config.backtest is False:  # 实盘模式
-            positionSide = "LONG" if self.position_side == "both" else "BOTH"
-            order_type = "LIMIT" if order_type is None else order_type  # 默认限价单
-            timeInForce = "GTC" if timeInForce is None else timeInForce  # 默认成交为止，订单会一直有效，直到被成交或者取消。
-            result = self.__binance_futures.order(symbol=self.__instrument_id,
-                                               side="BUY",
-                                               positionSide=positionSide,
-                                               quantity=size,
-                                               price=price,
-                                               orderType=order_type,
-                                               timeInForce=timeInForce)
-            if "msg" in str(result):   # 如果下单失败就抛出异常，提示错误信息。
-                raise SendOrderError(result["msg"])
-            order_info = self.get_order_info(order_id=result['orderId'])  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['orderId'])
-                            state = self.get_order_info(order_id=result['orderId'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['orderId'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['orderId'])
-                            state = self.get_order_info(order_id=result['orderId'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['orderId'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['orderId'])
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id=result['orderId'])
-                        state = self.get_order_info(order_id=result['orderId'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['orderId'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['orderId'])
-                        state = self.get_order_info(order_id=result['orderId'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['orderId'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['orderId'])
-                    state = self.get_order_info(order_id=result['orderId'])
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info(order_id=result['orderId'])
-                    if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "buy", price, size, order_type=order_type, timeInForce=timeInForce).result()
         else:  # 回测模式
             return "回测模拟下单成功！"
 
     def sell(self, price, size, order_type=None, timeInForce=None):
-        if config.backtest is False:  # 实盘模式
-            positionSide = "LONG" if self.position_side == "both" else "BOTH"
-            order_type = "LIMIT" if order_type is None else order_type  # 默认限价单
-            timeInForce = "GTC" if timeInForce is None else timeInForce  # 默认成交为止，订单会一直有效，直到被成交或者取消。
-            result = self.__binance_futures.order(symbol=self.__instrument_id,
-                                               side="SELL",
-                                               positionSide=positionSide,
-                                               quantity=size,
-                                               price=price,
-                                               orderType=order_type,
-                                               timeInForce=timeInForce)
-            if "msg" in str(result):   # 如果下单失败就抛出异常，提示错误信息。
-                raise SendOrderError(result["msg"])
-            order_info = self.get_order_info(order_id=result['orderId'])  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['orderId'])
-                            state = self.get_order_info(order_id=result['orderId'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['orderId'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['orderId'])
-                            state = self.get_order_info(order_id=result['orderId'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['orderId'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['orderId'])
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id=result['orderId'])
-                        state = self.get_order_info(order_id=result['orderId'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['orderId'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['orderId'])
-                        state = self.get_order_info(order_id=result['orderId'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['orderId'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['orderId'])
-                    state = self.get_order_info(order_id=result['orderId'])
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info(order_id=result['orderId'])
-                    if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "sell", price, size, order_type=order_type, timeInForce=timeInForce).result()
         else:  # 回测模式
             return "回测模拟下单成功！"
 
     def buytocover(self, price, size, order_type=None, timeInForce=None):
-        if config.backtest is False:  # 实盘模式
-            positionSide = "SHORT" if self.position_side == "both" else "BOTH"
-            order_type = "LIMIT" if order_type is None else order_type  # 默认限价单
-            timeInForce = "GTC" if timeInForce is None else timeInForce  # 默认成交为止，订单会一直有效，直到被成交或者取消。
-            result = self.__binance_futures.order(symbol=self.__instrument_id,
-                                               side="BUY",
-                                               positionSide=positionSide,
-                                               quantity=size,
-                                               price=price,
-                                               orderType=order_type,
-                                               timeInForce=timeInForce)
-            if "msg" in str(result):   # 如果下单失败就抛出异常，提示错误信息。
-                raise SendOrderError(result["msg"])
-            order_info = self.get_order_info(order_id=result['orderId'])  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['orderId'])
-                            state = self.get_order_info(order_id=result['orderId'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['orderId'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['orderId'])
-                            state = self.get_order_info(order_id=result['orderId'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['orderId'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['orderId'])
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id=result['orderId'])
-                        state = self.get_order_info(order_id=result['orderId'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['orderId'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['orderId'])
-                        state = self.get_order_info(order_id=result['orderId'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['orderId'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['orderId'])
-                    state = self.get_order_info(order_id=result['orderId'])
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info(order_id=result['orderId'])
-                    if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "buytocover", price, size, order_type=order_type, timeInForce=timeInForce).result()
         else:  # 回测模式
             return "回测模拟下单成功！"
 
     def sellshort(self, price, size, order_type=None, timeInForce=None):
-        if config.backtest is False:  # 实盘模式
-            positionSide = "SHORT" if self.position_side == "both" else "BOTH"
-            order_type = "LIMIT" if order_type is None else order_type  # 默认限价单
-            timeInForce = "GTC" if timeInForce is None else timeInForce  # 默认成交为止，订单会一直有效，直到被成交或者取消。
-            result = self.__binance_futures.order(symbol=self.__instrument_id,
-                                               side="SELL",
-                                               positionSide=positionSide,
-                                               quantity=size,
-                                               price=price,
-                                               orderType=order_type,
-                                               timeInForce=timeInForce)
-            if "msg" in str(result):   # 如果下单失败就抛出异常，提示错误信息。
-                raise SendOrderError(result["msg"])
-            order_info = self.get_order_info(order_id=result['orderId'])  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['orderId'])
-                            state = self.get_order_info(order_id=result['orderId'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['orderId'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['orderId'])
-                            state = self.get_order_info(order_id=result['orderId'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['orderId'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['orderId'])
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id=result['orderId'])
-                        state = self.get_order_info(order_id=result['orderId'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['orderId'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['orderId'])
-                        state = self.get_order_info(order_id=result['orderId'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['orderId'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['orderId'])
-                    state = self.get_order_info(order_id=result['orderId'])
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info(order_id=result['orderId'])
-                    if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "sellshort", price, size, order_type=order_type, timeInForce=timeInForce).result()
         else:  # 回测模式
             return "回测模拟下单成功！"
 
@@ -478,6 +224,10 @@ class BINANCEFUTURES:
         :return:返回一个列表，包含开盘时间戳、开盘价、最高价、最低价、收盘价、成交量。
         """
         receipt = self.__binance_futures.klines(self.__instrument_id, time_frame)  # 获取历史k线数据
+        return self.__format_kline(receipt)
+
+    def __format_kline(self, receipt):
+        """将币安返回的k线数据转换为[时间, 开, 高, 低, 收, 成交量]格式，按时间倒序排列"""
         for item in receipt:
             item[0] = ts_to_utc_str(int(item[0])/1000)
             item.pop(6)
@@ -489,6 +239,18 @@ class BINANCEFUTURES:
         receipt.reverse()
         return receipt
 
+    def get_history_kline(self, time_frame, start, end):
+        """
+        获取指定时间范围内的一页历史k线数据，供history模块分页下载
+        :param time_frame: k线周期
+        :param start: 起始时间戳（秒）
+        :param end: 结束时间戳（秒）
+        :return: 格式与get_kline一致，按时间倒序排列，最多500根
+        """
+        receipt = self.__binance_futures.klines(self.__instrument_id, time_frame, startTime=int(start * 1000),
+                                            endTime=int(end * 1000), limit=500)
+        return self.__format_kline(receipt)
+
     def get_position(self, mode=None):
         """
         币安币本位合约获取持仓信息
@@ -532,9 +294,24 @@ class BINANCEFUTURES:
                     result = {'direction': direction, 'amount': amount, 'price': price}
             return result
 
+    def __load_instruments(self):
+        result = {}
+        for item in self.__binance_futures.get_exchange_info()["symbols"]:
+            filters = {f["filterType"]: f for f in item["filters"]}
+            result[item["symbol"]] = {"contract_value": int(item["contractSize"]), "tick_size": float(filters["PRICE_FILTER"]["tickSize"]),
+                                      "size_increment": float(filters["LOT_SIZE"]["stepSize"]),
+                                      "min_size": float(filters["LOT_SIZE"]["minQty"])}
+        return result
+
+    def get_instrument_info(self):
+        """
+        获取交易对信息，缓存于instrument模块，默认每天只下载一次
+        :return: 返回字典 {"contract_value": 合约面值, "tick_size": 价格最小变动单位, "size_increment": 数量最小变动单位, "min_size": 最小下单数量}
+        """
+        return instruments.get("BINANCEFUTURES", self.__instrument_id, self.__load_instruments)
+
     def get_contract_value(self):
-        receipt = self.__binance_futures.get_contract_value(self.__instrument_id)
-        return receipt
+        return self.get_instrument_info()["contract_value"]
 
     def get_depth(self, type=None):
         """
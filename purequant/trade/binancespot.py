@@ -284,6 +284,13 @@ class BINANCESPOT:
         """
         receipt = self.__binance_spot.klines(self.__instrument_id, time_frame)  # 获取历史k线数据
         last_kine = self.__binance_spot.get_last_kline(self.__instrument_id)    # 获取24hr 价格变动情况
+        receipt = self.__format_kline(receipt)
+        receipt.append(last_kine)
+        receipt.reverse()
+        return receipt
+
+    def __format_kline(self, receipt):
+        """将币安返回的k线数据转换为[时间, 开, 高, 低, 收, 成交量]格式"""
         for item in receipt:
             item[0] = ts_to_utc_str(int(item[0])/1000)
             item.pop(6)
@@ -292,7 +299,19 @@ class BINANCESPOT:
             item.pop(6)
             item.pop(7)
             item.pop(6)
-        receipt.append(last_kine)
+        return receipt
+
+    def get_history_kline(self, time_frame, start, end):
+        """
+        获取指定时间范围内的一页历史k线数据，供history模块分页下载
+        :param time_frame: k线周期
+        :param start: 起始时间戳（秒）
+        :param end: 结束时间戳（秒）
+        :return: 格式与get_kline一致，按时间倒序排列，最多500根
+        """
+        receipt = self.__binance_spot.klines(self.__instrument_id, time_frame, startTime=int(start * 1000),
+                                             endTime=int(end * 1000), limit=500)
+        receipt = self.__format_kline(receipt)
         receipt.reverse()
         return receipt
 
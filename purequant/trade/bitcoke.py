@@ -7,8 +7,9 @@ email: purequant@foxmail.com
 
 from purequant.exchange.bitcoke.bitcoke import BitCoke
 from purequant.exceptions import *
+from purequant.ordermanager import ordermanager
+from purequant.batch import batch
 from purequant.config import config
-import time
 
 class BITCOKE:
 
@@ -175,367 +176,87 @@ class BITCOKE:
             dict = {"交易所": "BITCOKE", "币对": self.__symbol, "方向": action, "订单状态": "等待（条件单）"}
             return dict
 
+    def send_order(self, action, price, size, order_type=None, stopLossPrice=None, trailingStop=None, stopWinPrice=None,
+                   stopWinType=None, triggerPrice=None, triggerType=None, tif=None):
+        """
+        下单，不撤单重发，由订单管理调用，价格撤单与时间撤单见ordermanager
+        :param action: "buy"、"sell"、"sellshort"或"buytocover"
+        :return: 返回订单号
+        """
+        order_type = order_type or "Limit"
+        result = self.__bitcoke.create_order(
+            currency=self.__currency,
+            open_position=action in ("buy", "sellshort"),
+            order_type=order_type,
+            qty=size,
+            side="Buy" if action in ("buy", "buytocover") else "Sell",
+            symbol=self.__symbol,
+            price=price,
+            stopLossPrice=stopLossPrice,
+            trailingStop=trailingStop,
+            stopWinPrice=stopWinPrice,
+            stopWinType=stopWinType,
+            triggerPrice=triggerPrice,
+            triggerType=triggerType,
+            tif=tif
+        )
+        if result['message'] != "OK":  # 如果下单失败就抛出异常，提示错误信息。
+            raise SendOrderError(result["message"])
+        return result['result']
+
+    def batch_order(self, orders, **kwargs):
+        """
+        批量下单，BitCoke的rest接口没有批量下单，各订单分别下单，在线程池中并发发送，不撤单重发
+        :param orders: 列表，每个元素为(action, price, size)，action为"buy"、"sell"、"sellshort"或"buytocover"
+        :param kwargs: 传给send_order的其他参数，如order_type，所有订单相同
+        :return: 返回与orders顺序一致的列表，下单成功的位置为订单号，交易所拒绝的位置为SendOrderError，
+                 请求超时或断线的位置为UnknownOrderError，该订单可能已经下单，应查询挂单后再决定是否重发
+        """
+        if config.backtest is not False:  # 回测模式
+            return ["回测模拟下单成功！"] * len(orders)
+        return batch(orders, 1, lambda group: [self.send_order(*group[0], **kwargs)])
+
+    def batch_revoke(self, order_ids):
+        """
+        批量撤单，各订单分别撤单，在线程池中并发发送
+        :param order_ids: 订单号列表
+        :return: 返回与order_ids顺序一致的列表，每个元素与revoke_order的返回值一致
+        """
+        return batch(order_ids, 1, lambda group: [self.revoke_order(group[0])], lambda e: '【交易提醒】撤单失败' + str(e))
+
     def buy(self, price, size, order_type=None, stopLossPrice=None, trailingStop=None, stopWinPrice=None,
             stopWinType=None, triggerPrice=None, triggerType=None, tif=None):
-        if config.backtest is False:  # 实盘模式
-            order_type = order_type or "Limit"
-            result = self.__bitcoke.create_order(
-                currency=self.__currency,
-                open_position=True,
-                order_type=order_type,
-                qty=size,
-                side="Buy",
-                symbol=self.__symbol,
-                price=price,
-                stopLossPrice=stopLossPrice,
-                trailingStop=trailingStop,
-                stopWinPrice=stopWinPrice,
-                stopWinType=stopWinType,
-                triggerPrice=triggerPrice,
-                triggerType=triggerType,
-                tif=tif
-            )
-            if result['message'] != "OK":  # 如果下单失败就抛出异常，提示错误信息。
-                raise SendOrderError(result["message"])
-            order_info = self.get_order_info(order_id=result['result'])  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['result'])
-                            state = self.get_order_info(order_id=result['result'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['result'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['result'])
-                            state = self.get_order_info(order_id=result['result'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['result'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['result'])
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id=result['result'])
-                        state = self.get_order_info(order_id=result['result'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['result'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['result'])
-                        state = self.get_order_info(order_id=result['result'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['result'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['result'])
-                    state = self.get_order_info(order_id=result['result'])
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info(order_id=result['result'])
-                    if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "buy", price, size, order_type=order_type, stopLossPrice=stopLossPrice,
+                                       trailingStop=trailingStop, stopWinPrice=stopWinPrice, stopWinType=stopWinType,
+                                       triggerPrice=triggerPrice, triggerType=triggerType, tif=tif).result()
         else:  # 回测模式
             return "回测模拟下单成功！"
 
     def buytocover(self, price, size, order_type=None, stopLossPrice=None, trailingStop=None, stopWinPrice=None,
             stopWinType=None, triggerPrice=None, triggerType=None, tif=None):
-        if config.backtest is False:  # 实盘模式
-            order_type = order_type or "Limit"
-            result = self.__bitcoke.create_order(
-                currency=self.__currency,
-                open_position=False,
-                order_type=order_type,
-                qty=size,
-                side="Buy",
-                symbol=self.__symbol,
-                price=price,
-                stopLossPrice=stopLossPrice,
-                trailingStop=trailingStop,
-                stopWinPrice=stopWinPrice,
-                stopWinType=stopWinType,
-                triggerPrice=triggerPrice,
-                triggerType=triggerType,
-                tif=tif
-            )
-            if result['message'] != "OK":  # 如果下单失败就抛出异常，提示错误信息。
-                raise SendOrderError(result["message"])
-            order_info = self.get_order_info(order_id=result['result'])  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['result'])
-                            state = self.get_order_info(order_id=result['result'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['result'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['result'])
-                            state = self.get_order_info(order_id=result['result'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['result'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['result'])
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id=result['result'])
-                        state = self.get_order_info(order_id=result['result'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['result'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['result'])
-                        state = self.get_order_info(order_id=result['result'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['result'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['result'])
-                    state = self.get_order_info(order_id=result['result'])
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info(order_id=result['result'])
-                    if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "buytocover", price, size, order_type=order_type, stopLossPrice=stopLossPrice,
+                                       trailingStop=trailingStop, stopWinPrice=stopWinPrice, stopWinType=stopWinType,
+                                       triggerPrice=triggerPrice, triggerType=triggerType, tif=tif).result()
         else:  # 回测模式
             return "回测模拟下单成功！"
 
     def sell(self, price, size, order_type=None, stopLossPrice=None, trailingStop=None, stopWinPrice=None,
             stopWinType=None, triggerPrice=None, triggerType=None, tif=None):
-        if config.backtest is False:  # 实盘模式
-            order_type = order_type or "Limit"
-            result = self.__bitcoke.create_order(
-                currency=self.__currency,
-                open_position=False,
-                order_type=order_type,
-                qty=size,
-                side="Sell",
-                symbol=self.__symbol,
-                price=price,
-                stopLossPrice=stopLossPrice,
-                trailingStop=trailingStop,
-                stopWinPrice=stopWinPrice,
-                stopWinType=stopWinType,
-                triggerPrice=triggerPrice,
-                triggerType=triggerType,
-                tif=tif
-            )
-            if result['message'] != "OK":  # 如果下单失败就抛出异常，提示错误信息。
-                raise SendOrderError(result["message"])
-            order_info = self.get_order_info(order_id=result['result'])  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['result'])
-                            state = self.get_order_info(order_id=result['result'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['result'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['result'])
-                            state = self.get_order_info(order_id=result['result'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['result'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['result'])
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id=result['result'])
-                        state = self.get_order_info(order_id=result['result'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.sell(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['result'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['result'])
-                        state = self.get_order_info(order_id=result['result'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.sell(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['result'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['result'])
-                    state = self.get_order_info(order_id=result['result'])
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info(order_id=result['result'])
-                    if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "sell", price, size, order_type=order_type, stopLossPrice=stopLossPrice,
+                                       trailingStop=trailingStop, stopWinPrice=stopWinPrice, stopWinType=stopWinType,
+                                       triggerPrice=triggerPrice, triggerType=triggerType, tif=tif).result()
         else:  # 回测模式
             return "回测模拟下单成功！"
 
     def sellshort(self, price, size, order_type=None, stopLossPrice=None, trailingStop=None, stopWinPrice=None,
             stopWinType=None, triggerPrice=None, triggerType=None, tif=None):
-        if config.backtest is False:  # 实盘模式
-            order_type = order_type or "Limit"
-            result = self.__bitcoke.create_order(
-                currency=self.__currency,
-                open_position=True,
-                order_type=order_type,
-                qty=size,
-                side="Sell",
-                symbol=self.__symbol,
-                price=price,
-                stopLossPrice=stopLossPrice,
-                trailingStop=trailingStop,
-                stopWinPrice=stopWinPrice,
-                stopWinType=stopWinType,
-                triggerPrice=triggerPrice,
-                triggerType=triggerType,
-                tif=tif
-            )
-            if result['message'] != "OK":  # 如果下单失败就抛出异常，提示错误信息。
-                raise SendOrderError(result["message"])
-            order_info = self.get_order_info(order_id=result['result'])  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['result'])
-                            state = self.get_order_info(order_id=result['result'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['result'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['result'])
-                            state = self.get_order_info(order_id=result['result'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['result'])
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['result'])
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id=result['result'])
-                        state = self.get_order_info(order_id=result['result'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.sell(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['result'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['result'])
-                        state = self.get_order_info(order_id=result['result'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.sell(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['result'])
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['result'])
-                    state = self.get_order_info(order_id=result['result'])
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info(order_id=result['result'])
-                    if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "sellshort", price, size, order_type=order_type, stopLossPrice=stopLossPrice,
+                                       trailingStop=trailingStop, stopWinPrice=stopWinPrice, stopWinType=stopWinType,
+                                       triggerPrice=triggerPrice, triggerType=triggerType, tif=tif).result()
         else:  # 回测模式
             return "回测模拟下单成功！"
 
@@ -5,10 +5,13 @@ Date:   2020/10/27
 email: purequant@foxmail.com
 """
 
-import time
 from purequant.exchange.bitmex.bitmex import Bitmex
+from purequant.time import ts_to_utc_str
 from purequant.config import config
 from purequant.exceptions import *
+from purequant.ordermanager import ordermanager
+from purequant.batch import batch
+from purequant.accountfeed import accountfeed, one_way
 
 class BITMEX:
 
@@ -27,6 +30,7 @@ class BITMEX:
         self.__testing = False or testing
         self.__bitmex = Bitmex(self.__access_key, self.__secret_key, testing=self.__testing)
         self.__leverage = leverage or 20
+        self.__feed = "BITMEX:" + instrument_id
         self.__bitmex.set_leverage(self.__instrument_id, leverage=self.__leverage)
 
     def get_single_equity(self, currency=None):
@@ -70,7 +74,42 @@ class BITMEX:
         last = receipt["price"]
         return {"last": last}
 
+    def subscribe_account(self):
+        """
+        订阅持仓推送，之后get_position从BitMEXWebsocket维护的position表中读取，连接断开后改为通过rest接口查询
+        """
+        from purequant.exchange.bitmex.bitmex_websocket import BitMEXWebsocket   # 订阅时才导入，未使用推送时无需安装websocket-client
+        endpoint = "https://testnet.bitmex.com/api/v1" if self.__testing else "https://www.bitmex.com/api/v1"
+        self.__ws = None
+
+        def callback(table):
+            if table is None:
+                accountfeed.close(self.__feed)
+            elif table == "position" and self.__ws is not None:
+                accountfeed.update_position(self.__feed, self.__ws_position())
+
+        accountfeed.begin(self.__feed)
+        self.__ws = BitMEXWebsocket(endpoint=endpoint, symbol=self.__instrument_id, api_key=self.__access_key,
+                                    api_secret=self.__secret_key, callback=callback)    # 返回时已收到position表的全量数据
+        accountfeed.reset(self.__feed, self.__ws_position(), {})
+
+    def __ws_position(self):
+        """返回双向持仓格式的持仓信息，两个方向都返回，无持仓的方向数量为0，反手时不会保留原方向的持仓"""
+        position = {"long": {"price": 0.0, "amount": 0}, "short": {"price": 0.0, "amount": 0}}
+        for item in self.__ws.positions():
+            if item['symbol'] == self.__instrument_id and item.get('currentQty'):
+                side = "long" if item['currentQty'] > 0 else "short"
+                position[side] = {"price": item['avgCostPrice'], "amount": abs(item['currentQty'])}
+        return position
+
+    def get_account_updated(self):
+        """获取持仓与账户缓存最近一次更新的时间戳，未调用subscribe_account或连接断开时返回None"""
+        return accountfeed.updated(self.__feed)
+
     def get_position(self):
+        position = accountfeed.position(self.__feed)
+        if position is not None:    # 调用subscribe_account订阅持仓推送后从内存中读取
+            return one_way(position)
         try:
             result = self.__bitmex.get_positions(symbol=self.__instrument_id)[0]
             if result["currentQty"] > 0:
@@ -103,12 +142,37 @@ class BITMEX:
             records.append([i['timestamp'], i['open'], i['high'], i['low'], i['close'], i['volume']])
         return records
 
+    def get_history_kline(self, time_frame, start, end):
+        """
+        获取指定时间范围内的一页历史k线数据，供history模块分页下载
+        :param time_frame: k线周期，bitmex仅支持"1m"、"5m"、"1h"、"1d"
+        :param start: 起始时间戳（秒）
+        :param end: 结束时间戳（秒）
+        :return: 格式与get_kline一致，按时间倒序排列，最多1000根
+        """
+        records = []
+        response = self.__bitmex.get_bucket_trades(binSize=time_frame, partial=False, symbol=self.__instrument_id,
+                                                   columns="timestamp, open, high, low, close, volume", count=1000,
+                                                   reverse=True, startTime=ts_to_utc_str(start, fmt='%Y-%m-%dT%H:%M:%S.000Z'),
+                                                   endTime=ts_to_utc_str(end, fmt='%Y-%m-%dT%H:%M:%S.000Z'))
+        for i in response:
+            records.append([i['timestamp'], i['open'], i['high'], i['low'], i['close'], i['volume']])
+        return records
+
     def revoke_order(self, order_id):
         receipt = self.__bitmex.cancel_order(order_id)
         return receipt
 
-    def get_order_info(self):
-        result = self.__bitmex.get_orders(symbol=self.__instrument_id, count=1, reverse=True)[0]
+    def get_order_info(self, order_id=None):
+        """
+        查询订单信息
+        :param order_id: 订单号，不传入时查询最近的一个订单
+        :return:
+        """
+        if order_id is not None:
+            result = self.__bitmex.get_orders(symbol=self.__instrument_id, filter={"orderID": order_id}, count=1)[0]
+        else:
+            result = self.__bitmex.get_orders(symbol=self.__instrument_id, count=1, reverse=True)[0]
         action = "买入" if result['side'] == "Buy" else "卖出"
         symbol = result["symbol"]
         price = result["avgPx"]
@@ -134,6 +198,43 @@ class BITMEX:
             return dict
 
 
+    def send_order(self, action, price, size, order_type=None, timeInForce=None):
+        """
+        下单，不撤单重发，由订单管理调用，价格撤单与时间撤单见ordermanager
+        :param action: "buy"、"sell"、"sellshort"或"buytocover"
+        :param order_type: Market, Limit, Stop, StopLimit, MarketIfTouched, LimitIfTouched, Pegged，默认是"Limit"
+        :param timeInForce:Day, GoodTillCancel, ImmediateOrCancel, FillOrKill, 默认是"GoodTillCancel"
+        :return: 返回订单号
+        """
+        order_type = order_type or "Limit"
+        timeInForce = timeInForce or "GoodTillCancel"
+        side = "Buy" if action in ("buy", "buytocover") else "Sell"
+        result = self.__bitmex.create_order(symbol=self.__instrument_id, side=side, price=price, orderQty=size,
+                                            ordType=order_type, timeInForce=timeInForce)
+        if "error" in result:
+            raise SendOrderError(msg=result['error']['message'])
+        return result["orderID"]
+
+    def batch_order(self, orders, **kwargs):
+        """
+        批量下单，BitMEX的rest接口没有批量下单，各订单分别下单，在线程池中并发发送，不撤单重发
+        :param orders: 列表，每个元素为(action, price, size)，action为"buy"、"sell"、"sellshort"或"buytocover"
+        :param kwargs: 传给send_order的其他参数，如order_type，所有订单相同
+        :return: 返回与orders顺序一致的列表，下单成功的位置为订单号，交易所拒绝的位置为SendOrderError，
+                 请求超时或断线的位置为UnknownOrderError，该订单可能已经下单，应查询挂单后再决定是否重发
+        """
+        if config.backtest is not False:  # 回测模式
+            return ["回测模拟下单成功！"] * len(orders)
+        return batch(orders, 1, lambda group: [self.send_order(*group[0], **kwargs)])
+
+    def batch_revoke(self, order_ids):
+        """
+        批量撤单，各订单分别撤单，在线程池中并发发送
+        :param order_ids: 订单号列表
+        :return: 返回与order_ids顺序一致的列表，每个元素与revoke_order的返回值一致
+        """
+        return batch(order_ids, 1, lambda group: [self.revoke_order(group[0])], lambda e: '【交易提醒】撤单失败' + str(e))
+
     def buy(self, price, size, order_type=None, timeInForce=None):
         """
         买入开多
@@ -143,318 +244,26 @@ class BITMEX:
         :param timeInForce:Day, GoodTillCancel, ImmediateOrCancel, FillOrKill, 默认是"GoodTillCancel"
         :return:
         """
-        if config.backtest is False:  # 实盘模式
-            order_type = order_type or "Limit"
-            timeInForce = timeInForce or "GoodTillCancel"
-            result = self.__bitmex.create_order(symbol=self.__instrument_id, side="Buy", price=price, orderQty=size,
-                                                ordType=order_type, timeInForce=timeInForce)
-            try:
-                raise SendOrderError(msg=result['error']['message'])
-            except:
-                order_id = result["orderID"]
-                order_info = self.get_order_info()  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-                # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:  # 如果撤单失败，则订单可能在此期间已完全成交或部分成交
-                            self.revoke_order(order_id)
-                            state = self.get_order_info()
-                            if state['订单状态'] == "撤单成功":  # 已完全成交时，以原下单数量重发；部分成交时，重发委托数量为原下单数量减去已成交数量
-                                return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:  # 撤单失败时，说明订单已完全成交
-                            order_info = self.get_order_info()  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id)
-                            state = self.get_order_info()
-                            if state['订单状态'] == "撤单成功":
-                                return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:  # 撤单失败时，说明订单已完全成交，再查询一次订单状态，如果已完全成交，返回下单结果
-                            order_info = self.get_order_info()  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info()
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id)
-                        state = self.get_order_info()
-                        if state['订单状态'] == "撤单成功":
-                            return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info()  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id)
-                        state = self.get_order_info()
-                        if state['订单状态'] == "撤单成功":
-                            return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info()  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id)
-                    state = self.get_order_info()
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info()  # 再查询一次订单状态
-                    if order_info["订单状态"] == "完全成交":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "buy", price, size, order_type=order_type, timeInForce=timeInForce).result()
         else:  # 回测模式
             return "回测模拟下单成功！"
 
     def sell(self, price, size, order_type=None, timeInForce=None):
-        if config.backtest is False:  # 实盘模式
-            order_type = order_type or "Limit"
-            timeInForce = timeInForce or "GoodTillCancel"
-            result = self.__bitmex.create_order(symbol=self.__instrument_id, side="Sell", price=price, orderQty=size,
-                                                ordType=order_type, timeInForce=timeInForce)
-            try:
-                raise SendOrderError(msg=result['error']['message'])
-            except:
-                order_id = result["orderID"]
-                order_info = self.get_order_info()  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-                # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:  # 如果撤单失败，则订单可能在此期间已完全成交或部分成交
-                            self.revoke_order(order_id)
-                            state = self.get_order_info()
-                            if state['订单状态'] == "撤单成功":  # 已完全成交时，以原下单数量重发；部分成交时，重发委托数量为原下单数量减去已成交数量
-                                return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                                size + state["已成交数量"])
-                        except:  # 撤单失败时，说明订单已完全成交
-                            order_info = self.get_order_info()  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id)
-                            state = self.get_order_info()
-                            if state['订单状态'] == "撤单成功":
-                                return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                                size + state["已成交数量"])
-                        except:  # 撤单失败时，说明订单已完全成交，再查询一次订单状态，如果已完全成交，返回下单结果
-                            order_info = self.get_order_info()  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info()
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id)
-                        state = self.get_order_info()
-                        if state['订单状态'] == "撤单成功":
-                            return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                            size + state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info()  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id)
-                        state = self.get_order_info()
-                        if state['订单状态'] == "撤单成功":
-                            return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                            size + state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info()  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id)
-                    state = self.get_order_info()
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info()  # 再查询一次订单状态
-                    if order_info["订单状态"] == "完全成交":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "sell", price, size, order_type=order_type, timeInForce=timeInForce).result()
         else:  # 回测模式
             return "回测模拟下单成功！"
 
     def sellshort(self, price, size, order_type=None, timeInForce=None):
-        if config.backtest is False:  # 实盘模式
-            order_type = order_type or "Limit"
-            timeInForce = timeInForce or "GoodTillCancel"
-            result = self.__bitmex.create_order(symbol=self.__instrument_id, side="Sell", price=price, orderQty=size,
-                                                ordType=order_type, timeInForce=timeInForce)
-            try:
-                raise SendOrderError(msg=result['error']['message'])
-            except:
-                order_id = result["orderID"]
-                order_info = self.get_order_info()  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-                # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:  # 如果撤单失败，则订单可能在此期间已完全成交或部分成交
-                            self.revoke_order(order_id)
-                            state = self.get_order_info()
-                            if state['订单状态'] == "撤单成功":  # 已完全成交时，以原下单数量重发；部分成交时，重发委托数量为原下单数量减去已成交数量
-                                return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                                size + state["已成交数量"])
-                        except:  # 撤单失败时，说明订单已完全成交
-                            order_info = self.get_order_info()  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id)
-                            state = self.get_order_info()
-                            if state['订单状态'] == "撤单成功":
-                                return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                                size + state["已成交数量"])
-                        except:  # 撤单失败时，说明订单已完全成交，再查询一次订单状态，如果已完全成交，返回下单结果
-                            order_info = self.get_order_info()  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info()
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id)
-                        state = self.get_order_info()
-                        if state['订单状态'] == "撤单成功":
-                            return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                            size + state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info()  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id)
-                        state = self.get_order_info()
-                        if state['订单状态'] == "撤单成功":
-                            return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order),
-                                            size + state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info()  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id)
-                    state = self.get_order_info()
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info()  # 再查询一次订单状态
-                    if order_info["订单状态"] == "完全成交":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "sellshort", price, size, order_type=order_type, timeInForce=timeInForce).result()
         else:  # 回测模式
             return "回测模拟下单成功！"
 
     def buytocover(self, price, size, order_type=None, timeInForce=None):
-        if config.backtest is False:  # 实盘模式
-            order_type = order_type or "Limit"
-            timeInForce = timeInForce or "GoodTillCancel"
-            result = self.__bitmex.create_order(symbol=self.__instrument_id, side="Buy", price=price, orderQty=size,
-                                                ordType=order_type, timeInForce=timeInForce)
-            try:
-                raise SendOrderError(msg=result['error']['message'])
-            except:
-                order_id = result["orderID"]
-                order_info = self.get_order_info()  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-                # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:  # 如果撤单失败，则订单可能在此期间已完全成交或部分成交
-                            self.revoke_order(order_id)
-                            state = self.get_order_info()
-                            if state['订单状态'] == "撤单成功":  # 已完全成交时，以原下单数量重发；部分成交时，重发委托数量为原下单数量减去已成交数量
-                                return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:  # 撤单失败时，说明订单已完全成交
-                            order_info = self.get_order_info()  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id)
-                            state = self.get_order_info()
-                            if state['订单状态'] == "撤单成功":
-                                return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                                size - state["已成交数量"])
-                        except:  # 撤单失败时，说明订单已完全成交，再查询一次订单状态，如果已完全成交，返回下单结果
-                            order_info = self.get_order_info()  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info()
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id)
-                        state = self.get_order_info()
-                        if state['订单状态'] == "撤单成功":
-                            return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info()  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id)
-                        state = self.get_order_info()
-                        if state['订单状态'] == "撤单成功":
-                            return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order),
-                                            size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info()  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id)
-                    state = self.get_order_info()
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info()  # 再查询一次订单状态
-                    if order_info["订单状态"] == "完全成交":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "buytocover", price, size, order_type=order_type, timeInForce=timeInForce).result()
         else:  # 回测模式
             return "回测模拟下单成功！"
 
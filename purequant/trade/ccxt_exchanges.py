@@ -1,5 +1,6 @@
 import ccxt
 from ccxt import *
+from purequant.instrument import instruments
 
 
 class CCXTEXCHANGE:
@@ -26,14 +27,28 @@ class CCXTEXCHANGE:
             'apiKey': apikey,
             'secret': secret
         })
-        symbol_list = []
-        for item in self.exchange.fetch_markets():
-            symbol_list.append(item['symbol'])
+        symbol_list = list(instruments.all("CCXT." + self.exchange.id, self.__load_instruments))   # 交易对列表缓存于instrument模块，默认每天只下载一次
         if symbol not in symbol_list:
             print("{}交易所暂不支持此币对！{}交易所目前支持的币对有以下这些：".format(platform, platform))
             print(symbol_list)
             exit()
 
+    def __load_instruments(self):
+        result = {}
+        for item in self.exchange.fetch_markets():
+            precision = item.get('precision') or {}
+            limits = (item.get('limits') or {}).get('amount') or {}
+            result[item['symbol']] = {"contract_value": item.get('contractSize'), "tick_size": precision.get('price'),
+                                      "size_increment": precision.get('amount'), "min_size": limits.get('min')}
+        return result
+
+    def get_instrument_info(self):
+        """
+        获取交易对信息，缓存于instrument模块，默认每天只下载一次，精度字段的含义（小数位数或最小变动单位）与CCXT中该交易所的precisionMode一致
+        :return: 返回字典 {"contract_value": 合约面值, "tick_size": 价格精度, "size_increment": 数量精度, "min_size": 最小下单数量}
+        """
+        return instruments.get("CCXT." + self.exchange.id, self.symbol, self.__load_instruments)
+
     def fetchOrderBook(self):
         """交易委托账本"""
         return self.exchange.fetchOrderBook(self.symbol)
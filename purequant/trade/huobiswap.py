@@ -6,11 +6,16 @@ Date:   2020/10/27
 email: purequant@foxmail.com
 """
 
-import time
+import functools
 from purequant.exchange.huobi import huobi_swap as huobiswap
 from purequant.time import ts_to_utc_str
 from purequant.config import config
 from purequant.exceptions import *
+from purequant.ordermanager import ordermanager
+from purequant.batch import batch, client_order_id, reconcile
+from purequant.orderfeed import orderfeed
+from purequant.accountfeed import accountfeed, one_way
+from purequant.instrument import instruments
 
 
 class HUOBISWAP:
@@ -27,6 +32,7 @@ class HUOBISWAP:
         self.__instrument_id = "{}-{}".format(instrument_id.split("-")[0], instrument_id.split("-")[1])
         self.__huobi_swap = huobiswap.HuobiSwap(self.__access_key, self.__secret_key)
         self.__leverage = leverage or 20
+        self.__feed = "HUOBISWAP:" + self.__instrument_id   # 订单推送频道名称
 
     def get_single_equity(self, contract_code):
         """
@@ -34,10 +40,105 @@ class HUOBISWAP:
         :param contract_code: 例如 "BTC-USD"
         :return:返回浮点数
         """
+        equity = accountfeed.equity(self.__feed, contract_code.upper())
+        if equity is not None:  # 调用subscribe_account订阅账户推送后从内存中读取
+            return equity
         data = self.__huobi_swap.get_contract_account_info(contract_code=contract_code)
         result =float(data["data"][0]["margin_balance"])
         return result
 
+    def send_order(self, action, price, size, order_type=None):
+        """
+        下单，不撤单重发，由订单管理调用，价格撤单与时间撤单见ordermanager
+        :param action: "buy"、"sell"、"sellshort"或"buytocover"
+        :param order_type:  0：限价单
+                            1：只做Maker（Post only）
+                            2：全部成交或立即取消（FOK）
+                            3：立即成交并取消剩余（IOC）
+                            4：对手价下单
+        :return: 返回订单号
+        """
+        order_type = order_type or 0
+        order_price_type = {0: "limit", 1: "post_only", 2: "fok", 3: "ioc", 4: "opponent"}.get(order_type)
+        if order_price_type is None:
+            raise SendOrderError("【交易提醒】交易所: Huobi 永续合约订单报价类型错误！")
+        direction, offset = {"buy": ("buy", "open"), "sell": ("sell", "close"),
+                             "sellshort": ("sell", "open"), "buytocover": ("buy", "close")}[action]
+        result = self.__huobi_swap.send_contract_order(contract_code=self.__instrument_id,
+                        client_order_id='', price=price, volume=size, direction=direction,
+                        offset=offset, lever_rate=self.__leverage, order_price_type=order_price_type)
+        try:
+            order_id = result['data']['order_id_str']
+        except:
+            raise SendOrderError(result['err_msg'])
+        orderfeed.track(self.__feed, order_id)
+        return order_id
+
+    def batch_order(self, orders, order_type=None):
+        """
+        批量下单，每次请求最多10个订单，多次请求并发发送，不撤单重发
+        :param orders: 列表，每个元素为(action, price, size)，action为"buy"、"sell"、"sellshort"或"buytocover"
+        :param order_type: 同send_order，所有订单相同
+        :return: 返回与orders顺序一致的列表，下单成功的位置为订单号，失败的位置为SendOrderError，
+                 请求超时或断线且按客户订单号查询也失败的位置为UnknownOrderError
+        """
+        if config.backtest is not False:  # 回测模式
+            return ["回测模拟下单成功！"] * len(orders)
+        return batch(orders, 10, functools.partial(self.__take_orders, order_type=order_type or 0))
+
+    def __take_orders(self, orders, order_type):
+        order_price_type = {0: "limit", 1: "post_only", 2: "fok", 3: "ioc", 4: "opponent"}.get(order_type)
+        if order_price_type is None:
+            raise SendOrderError("【交易提醒】交易所: Huobi 永续合约订单报价类型错误！")
+        client_oids = [client_order_id() for _ in orders]
+        orders_data = []
+        for oid, (action, price, size) in zip(client_oids, orders):
+            direction, offset = {"buy": ("buy", "open"), "sell": ("sell", "close"),
+                                 "sellshort": ("sell", "open"), "buytocover": ("buy", "close")}[action]
+            orders_data.append({"contract_code": self.__instrument_id, "price": price, "volume": size, "direction": direction, "offset": offset,
+                                "lever_rate": self.__leverage, "order_price_type": order_price_type, "client_order_id": oid})
+        try:
+            result = self.__huobi_swap.send_contract_batchorder({"orders_data": orders_data})
+        except Exception as e:
+            result = {"status": "fail", "msg": str(e)}
+        if result.get('status') == "fail":  # 超时或断线时交易所可能已经下单，按客户订单号查询实际结果
+            return reconcile(client_oids, self.__placed_orders, result.get('msg'))
+        if result.get('status') != "ok":
+            raise SendOrderError(result.get('err_msg'))
+        order_ids = [None] * len(orders)
+        for item in result['data']['success']:  # index从1开始
+            orderfeed.track(self.__feed, item['order_id_str'])
+            order_ids[item['index'] - 1] = item['order_id_str']
+        for item in result['data']['errors']:
+            order_ids[item['index'] - 1] = SendOrderError(item['err_msg'])
+        return order_ids
+
+    def __placed_orders(self, client_oids):
+        result = self.__huobi_swap.get_contract_order_info(self.__instrument_id, client_order_id=",".join(str(oid) for oid in client_oids))
+        if result.get('status') != "ok":
+            raise GetOrderError(result.get('err_msg') or result.get('msg'))
+        placed = {}
+        for item in result['data']:
+            orderfeed.track(self.__feed, item['order_id_str'])
+            placed[int(item['client_order_id'])] = item['order_id_str']
+        return placed
+
+    def batch_revoke(self, order_ids):
+        """
+        批量撤单，每次请求最多10个订单，多次请求并发发送
+        :param order_ids: 订单号列表
+        :return: 返回与order_ids顺序一致的列表，每个元素与revoke_order的返回值一致
+        """
+        return batch(order_ids, 10, self.__revoke_orders, lambda e: '【交易提醒】交易所: Huobi 撤单失败' + str(e))
+
+    def __revoke_orders(self, order_ids):
+        receipt = self.__huobi_swap.cancel_contract_order(self.__instrument_id, ",".join(str(order_id) for order_id in order_ids))
+        if receipt.get('status') != "ok":
+            return ['【交易提醒】交易所: Huobi 撤单失败' + str(receipt.get('err_msg'))] * len(order_ids)
+        errors = {str(item['order_id']): item['err_msg'] for item in receipt['data']['errors']}
+        return ['【交易提醒】交易所: Huobi 撤单失败' + errors[str(order_id)] if str(order_id) in errors
+                else '【交易提醒】交易所: Huobi 撤单成功' for order_id in order_ids]
+
     def buy(self, price, size, order_type=None):
         """
         火币永续合约下单买入开多
@@ -50,89 +151,9 @@ class HUOBISWAP:
                             4：对手价下单
         :return:
         """
-        if config.backtest is False:
-            order_type = order_type or 0
-            if order_type == 0:
-                order_price_type = 'limit'
-            elif order_type == 1:
-                order_price_type = "post_only"
-            elif order_type == 2:
-                order_price_type = "fok"
-            elif order_type == 3:
-                order_price_type = "ioc"
-            elif order_type == 4:
-                order_price_type = "opponent"
-            else:
-                return "【交易提醒】交易所: Huobi 订单报价类型错误！"
-            result = self.__huobi_swap.send_contract_order(contract_code=self.__instrument_id,
-                            client_order_id='', price=price, volume=size, direction='buy',
-                            offset='open', lever_rate=self.__leverage, order_price_type=order_price_type)
-            try:
-                order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-            except:
-                raise SendOrderError(result['err_msg'])
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "准备提交" or order_info["订单状态"] == "已提交":
-                    try:    # 如果撤单成功，重发委托
-                        if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                            self.revoke_order(order_id=result['data']['order_id_str'])
-                            state = self.get_order_info(order_id=result['data']['order_id_str'])
-                            if state['订单状态'] == "撤单成功" or state['订单状态'] == "部分成交撤销":
-                                return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                    except: # 如果撤单失败，就再查询一次订单状态然后返回结果
-                        order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['data']['order_id_str'])
-                            state = self.get_order_info(order_id=result['data']['order_id_str'])
-                            if state['订单状态'] == "部分成交撤销":
-                                return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                        except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                            order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['data']['order_id_str'])
-                if order_info["订单状态"] == "准备提交" or order_info["订单状态"] == "已提交":
-                    try:
-                        self.revoke_order(order_id=result['data']['order_id_str'])
-                        state = self.get_order_info(order_id=result['data']['order_id_str'])
-                        if state['订单状态'] == "撤单成功" or state['订单状态'] == "部分成交撤销":
-                            return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                    except: # 如果撤单失败，就再查询一次订单状态然后返回结果
-                        order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['data']['order_id_str'])
-                        state = self.get_order_info(order_id=result['data']['order_id_str'])
-                        if state['订单状态'] == "部分成交撤销":
-                            return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                    except: # 如果撤单失败，就再查询一次订单状态然后返回结果
-                        order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['data']['order_id_str'])
-                    state = self.get_order_info(order_id=result['data']['order_id_str'])
-                    return {"【交易提醒】下单结果": state}
-                except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                    order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                    if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
-        else:
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "buy", price, size, order_type=order_type).result()
+        else:  # 回测模式
             return "回测模拟下单成功！"
 
     def sell(self, price, size, order_type=None, lever_rate=None):
@@ -147,89 +168,9 @@ class HUOBISWAP:
                             4：对手价下单
         :return:
         """
-        if config.backtest is False:
-            order_type = order_type or 0
-            if order_type == 0:
-                order_price_type = 'limit'
-            elif order_type == 1:
-                order_price_type = "post_only"
-            elif order_type == 2:
-                order_price_type = "fok"
-            elif order_type == 3:
-                order_price_type = "ioc"
-            elif order_type == 4:
-                order_price_type = "opponent"
-            else:
-                return "【交易提醒】交易所: Huobi 订单报价类型错误！"
-            result = self.__huobi_swap.send_contract_order(contract_code=self.__instrument_id,
-                            client_order_id='', price=price, volume=size, direction='sell',
-                            offset='close', lever_rate=self.__leverage, order_price_type=order_price_type)
-            try:
-                order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-            except:
-                raise SendOrderError(result['err_msg'])
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "准备提交" or order_info["订单状态"] == "已提交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['data']['order_id_str'])
-                            state = self.get_order_info(order_id=result['data']['order_id_str'])
-                            if state['订单状态'] == "撤单成功" or state["订单状态"] == "部分成交撤销":
-                                return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                        except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                            order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['data']['order_id_str'])
-                            state = self.get_order_info(order_id=result['data']['order_id_str'])
-                            if state['订单状态'] == "部分成交撤销":
-                                return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                        except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                            order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['data']['order_id_str'])
-                if order_info["订单状态"] == "准备提交" or order_info["订单状态"] == "已提交":
-                    try:
-                        self.revoke_order(order_id=result['data']['order_id_str'])
-                        state = self.get_order_info(order_id=result['data']['order_id_str'])
-                        if state['订单状态'] == "撤单成功" or state["订单状态"] == "部分成交撤销":
-                            return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                    except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                        order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['data']['order_id_str'])
-                        state = self.get_order_info(order_id=result['data']['order_id_str'])
-                        if state['订单状态'] == "部分成交撤销":
-                            return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                    except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                        order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['data']['order_id_str'])
-                    state = self.get_order_info(order_id=result['data']['order_id_str'])
-                    return {"【交易提醒】下单结果": state}
-                except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                    order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                    if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
-        else:
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "sell", price, size, order_type=order_type).result()
+        else:  # 回测模式
             return "回测模拟下单成功！"
 
     def buytocover(self, price, size, order_type=None, lever_rate=None):
@@ -244,89 +185,9 @@ class HUOBISWAP:
                             4：对手价下单
         :return:
         """
-        if config.backtest is False:
-            order_type = order_type or 0
-            if order_type == 0:
-                order_price_type = 'limit'
-            elif order_type == 1:
-                order_price_type = "post_only"
-            elif order_type == 2:
-                order_price_type = "fok"
-            elif order_type == 3:
-                order_price_type = "ioc"
-            elif order_type == 4:
-                order_price_type = "opponent"
-            else:
-                return "【交易提醒】交易所: Huobi 订单报价类型错误！"
-            result = self.__huobi_swap.send_contract_order(contract_code=self.__instrument_id,
-                            client_order_id='', price=price, volume=size, direction='buy',
-                            offset='close', lever_rate=self.__leverage, order_price_type=order_price_type)
-            try:
-                order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-            except:
-                raise SendOrderError(result['err_msg'])
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "准备提交" or order_info["订单状态"] == "已提交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['data']['order_id_str'])
-                            state = self.get_order_info(order_id=result['data']['order_id_str'])
-                            if state['订单状态'] == "撤单成功" or state["订单状态"] == "部分成交撤销":
-                                return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                        except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                            order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['data']['order_id_str'])
-                            state = self.get_order_info(order_id=result['data']['order_id_str'])
-                            if state['订单状态'] == "部分成交撤销":
-                                return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                        except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                            order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['data']['order_id_str'])
-                if order_info["订单状态"] == "准备提交" or order_info["订单状态"] == "已提交":
-                    try:
-                        self.revoke_order(order_id=result['data']['order_id_str'])
-                        state = self.get_order_info(order_id=result['data']['order_id_str'])
-                        if state['订单状态'] == "撤单成功" or state["订单状态"] == "部分成交撤销":
-                            return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                    except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                        order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['data']['order_id_str'])
-                        state = self.get_order_info(order_id=result['data']['order_id_str'])
-                        if state['订单状态'] == "部分成交撤销":
-                            return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                    except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                        order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['data']['order_id_str'])
-                    state = self.get_order_info(order_id=result['data']['order_id_str'])
-                    return {"【交易提醒】下单结果": state}
-                except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                    order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                    if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
-        else:
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "buytocover", price, size, order_type=order_type).result()
+        else:  # 回测模式
             return "回测模拟下单成功！"
 
     def sellshort(self, price, size, order_type=None, lever_rate=None):
@@ -341,89 +202,9 @@ class HUOBISWAP:
                             4：对手价下单
         :return:
         """
-        if config.backtest is False:
-            order_type = order_type or 0
-            if order_type == 0:
-                order_price_type = 'limit'
-            elif order_type == 1:
-                order_price_type = "post_only"
-            elif order_type == 2:
-                order_price_type = "fok"
-            elif order_type == 3:
-                order_price_type = "ioc"
-            elif order_type == 4:
-                order_price_type = "opponent"
-            else:
-                return "【交易提醒】交易所: Huobi 订单报价类型错误！"
-            result = self.__huobi_swap.send_contract_order(contract_code=self.__instrument_id,
-                            client_order_id='', price=price, volume=size, direction='sell',
-                            offset='open', lever_rate=self.__leverage, order_price_type=order_price_type)
-            try:
-                order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-            except:
-                raise SendOrderError(result['err_msg'])
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "准备提交" or order_info["订单状态"] == "已提交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['data']['order_id_str'])
-                            state = self.get_order_info(order_id=result['data']['order_id_str'])
-                            if state['订单状态'] == "撤单成功" or state["订单状态"] == "部分成交撤销":
-                                return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                        except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                            order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['data']['order_id_str'])
-                            state = self.get_order_info(order_id=result['data']['order_id_str'])
-                            if state['订单状态'] == "部分成交撤销":
-                                return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                        except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                            order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['data']['order_id_str'])
-                if order_info["订单状态"] == "准备提交" or order_info["订单状态"] == "已提交":
-                    try:
-                        self.revoke_order(order_id=result['data']['order_id_str'])
-                        state = self.get_order_info(order_id=result['data']['order_id_str'])
-                        if state['订单状态'] == "撤单成功" or state["订单状态"] == "部分成交撤销":
-                            return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                    except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                        order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['data']['order_id_str'])
-                        state = self.get_order_info(order_id=result['data']['order_id_str'])
-                        if state['订单状态'] == "部分成交撤销":
-                            return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                    except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                        order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                        if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['data']['order_id_str'])
-                    state = self.get_order_info(order_id=result['data']['order_id_str'])
-                    return {"【交易提醒】下单结果": state}
-                except:  # 如果撤单失败，就再查询一次订单状态然后返回结果
-                    order_info = self.get_order_info(order_id=result['data']['order_id_str'])  # 下单后查询一次订单状态
-                    if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
-        else:
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "sellshort", price, size, order_type=order_type).result()
+        else:  # 回测模式
             return "回测模拟下单成功！"
 
     def BUY(self, cover_short_price, cover_short_size, open_long_price, open_long_size, order_type=None):
@@ -460,19 +241,69 @@ class HUOBISWAP:
             return '【交易提醒】交易所: Huobi 撤单失败' + receipt['data']['errors'][0]['err_msg']
 
     def get_order_info(self, order_id):
-        result = self.__huobi_swap.get_contract_order_info(self.__instrument_id, order_id)
+        """
+        查询订单信息，调用subscribe_orders订阅订单推送后从内存中的订单簿读取，未订阅或连接断开时通过rest接口查询
+        :param order_id: 订单号
+        :return: 返回订单信息字典
+        """
+        info = orderfeed.get(self.__feed, order_id)
+        if info is None:
+            info = self.__query_order_info(order_id)
+        return info
+
+    def __query_order_info(self, order_id):
+        return self.__order_info(self.__huobi_swap.get_contract_order_info(self.__instrument_id, order_id)['data'][0])
+
+    def subscribe_orders(self):
+        """
+        订阅订单推送，之后get_order_info与订单管理从内存中的订单簿读取订单状态，只在断线重连后通过rest接口对账
+        """
+        from purequant.exchange.huobi import websocket    # 订阅时才导入，未使用订单推送时无需安装websocket模块的依赖
+        connect = functools.partial(websocket.subscribe_orders, "wss://api.hbdm.com/swap-notification", self.__access_key, self.__secret_key,
+                                    "orders.{}".format(self.__instrument_id))
+        orderfeed.subscribe(self.__feed, connect, lambda data: (data['order_id_str'], self.__order_info(data)),
+                            self.__query_order_info)
+
+    def subscribe_account(self):
+        """
+        订阅持仓与账户推送，之后get_position与get_single_equity从内存中读取，每次连接成功后先通过rest接口获取一次快照
+        """
+        from purequant.exchange.huobi import websocket    # 订阅时才导入，未使用推送时无需安装websocket模块的依赖
+        contract_code = self.__instrument_id.upper()
+        topics = ["positions.{}".format(contract_code), "accounts.{}".format(contract_code)]
+
+        async def connect(on_connect, on_position, on_equity):
+            def on_message(data):
+                for item in data.get('data', []):
+                    if data['topic'].startswith("positions"):
+                        on_position({"long" if item['direction'] == "buy" else "short":
+                                     {"price": item['cost_hold'], "amount": item['volume']}})
+                    elif data['topic'].startswith("accounts"):
+                        on_equity(item['contract_code'].upper(), float(item['margin_balance']))
+
+            await websocket.subscribe_private("wss://api.hbdm.com/swap-notification", self.__access_key, self.__secret_key,
+                                              topics, on_connect, on_message)
+
+        accountfeed.subscribe(self.__feed, connect,
+                              lambda: (self.get_position(mode="both"), {contract_code: self.get_single_equity(contract_code)}))
+
+    def get_account_updated(self):
+        """获取持仓与账户缓存最近一次更新的时间戳，未调用subscribe_account或连接断开时返回None"""
+        return accountfeed.updated(self.__feed)
+
+    def __order_info(self, data):
         instrument_id = self.__instrument_id
-        state = int(result['data'][0]['status'])
-        avg_price = result['data'][0]['trade_avg_price']
-        amount = result['data'][0]['trade_volume']
-        turnover = result['data'][0]['trade_turnover']
-        if result['data'][0]['direction'] == "buy" and result['data'][0]['offset'] == "open":
+        state = int(data['status'])
+        avg_price = data['trade_avg_price']
+        amount = data['trade_volume']
+        turnover = data['trade_turnover']
+        if data['direction'] == "buy" and data['offset'] == "open":
             action = "买入开多"
-        elif result['data'][0]['direction'] == "buy" and result['data'][0]['offset'] == "close":
+        elif data['direction'] == "buy" and data['offset'] == "close":
             action = "买入平空"
-        elif result['data'][0]['direction'] == "sell" and result['data'][0]['offset'] == "open":
+        elif data['direction'] == "sell" and data['offset'] == "open":
             action = "卖出开空"
-        elif result['data'][0]['direction'] == "sell" and result['data'][0]['offset'] == "close":
+        elif data['direction'] == "sell" and data['offset'] == "close":
             action = "卖出平多"
         else:
             action = "交易方向错误！"
@@ -531,6 +362,9 @@ class HUOBISWAP:
         return list
 
     def get_position(self, mode=None):
+        position = accountfeed.position(self.__feed)
+        if position is not None:    # 调用subscribe_account订阅持仓推送后从内存中读取
+            return position if mode == "both" else one_way(position)
         receipt = self.__huobi_swap.get_contract_position_info(self.__instrument_id)
         if mode == "both":
             if receipt['data'] == []:
@@ -569,12 +403,22 @@ class HUOBISWAP:
         last = receipt['tick']['close']
         return {"last": last}
 
+    def __load_instruments(self):
+        result = {}
+        for item in self.__huobi_swap.get_contract_info()['data']:
+            result[item['contract_code']] = {"contract_value": float(item['contract_size']), "tick_size": float(item['price_tick']),
+                                             "size_increment": 1, "min_size": 1}
+        return result
+
+    def get_instrument_info(self):
+        """
+        获取交易对信息，缓存于instrument模块，默认每天只下载一次
+        :return: 返回字典 {"contract_value": 合约面值, "tick_size": 价格最小变动单位, "size_increment": 数量最小变动单位, "min_size": 最小下单数量}
+        """
+        return instruments.get("HUOBISWAP", self.__instrument_id, self.__load_instruments)
+
     def get_contract_value(self):
-        receipt = self.__huobi_swap.get_contract_info()
-        for item in receipt['data']:
-            if item["contract_code"] == self.__instrument_id:
-                contract_value = item["contract_size"]
-                return contract_value
+        return self.get_instrument_info()["contract_value"]
 
     def get_depth(self, type=None):
         """
@@ -6,12 +6,21 @@ Date:   2020/10/27
 email: purequant@foxmail..com
 """
 
-import time
+import functools
 from purequant.exchange.okex import futures_api as okexfutures
+from purequant.exchange.okex.exceptions import OkexAPIException
+from purequant.time import ts_to_utc_str
 from purequant.config import config
 from purequant.exceptions import *
+from purequant.ordermanager import ordermanager
+from purequant.batch import batch, client_oid, reconcile
+from purequant.orderfeed import orderfeed
+from purequant.accountfeed import accountfeed, one_way
+from purequant.instrument import instruments
 from purequant.logger import logger
 
+NOT_EXIST = "32004"     # 按订单号或客户订单号查询的订单不存在
+
 class OKEXFUTURES:
 
     def __init__(self, access_key, secret_key, passphrase, instrument_id, margin_mode=None, leverage=None):
@@ -30,6 +39,7 @@ class OKEXFUTURES:
         self.__instrument_id = instrument_id
         self.__okex_futures = okexfutures.FutureAPI(self.__access_key, self.__secret_key, self.__passphrase)
         self.__leverage = leverage or 20
+        self.__feed = "OKEXFUTURES:" + self.__instrument_id   # 订单推送频道名称
         if margin_mode == "fixed":
             try:
                 self.__okex_futures.set_margin_mode(underlying=self.__instrument_id.split("-")[0] + "-" + self.__instrument_id.split("-")[1],
@@ -63,284 +73,107 @@ class OKEXFUTURES:
         :param symbol: 例如"btc-usdt"
         :return:返回浮点数
         """
+        equity = accountfeed.equity(self.__feed, symbol.upper())
+        if equity is not None:  # 调用subscribe_account订阅账户推送后从内存中读取
+            return equity
         data = self.__okex_futures.get_coin_account(underlying=symbol)
         result =float(data["equity"])
         return result
 
+    def send_order(self, action, price, size, order_type=None):
+        """
+        下单，不撤单重发，由订单管理调用，价格撤单与时间撤单见ordermanager
+        :param action: "buy"、"sell"、"sellshort"或"buytocover"
+        :return: 返回订单号
+        """
+        order_type = order_type or 0    # 如果不填order_type,则默认为普通委托
+        result = self.__okex_futures.take_order(self.__instrument_id, {"buy": 1, "sellshort": 2, "sell": 3, "buytocover": 4}[action],
+                                               price, size, order_type=order_type)
+        orderfeed.track(self.__feed, result['order_id'])
+        return result['order_id']
+
+    def batch_order(self, orders, order_type=None):
+        """
+        批量下单，每次请求最多10个订单，多次请求并发发送，不撤单重发
+        :param orders: 列表，每个元素为(action, price, size)，action为"buy"、"sell"、"sellshort"或"buytocover"
+        :param order_type: 同send_order，所有订单相同
+        :return: 返回与orders顺序一致的列表，下单成功的位置为订单号，失败的位置为SendOrderError，
+                 请求超时或断线且按客户订单号查询也失败的位置为UnknownOrderError
+        """
+        if config.backtest is not False:  # 回测模式
+            return ["回测模拟下单成功！"] * len(orders)
+        return batch(orders, 10, functools.partial(self.__take_orders, order_type=order_type or 0))
+
+    def __take_orders(self, orders, order_type):
+        client_oids = [client_oid() for _ in orders]
+        orders_data = [{"client_oid": oid, "type": {"buy": 1, "sellshort": 2, "sell": 3, "buytocover": 4}[action], "price": price,
+                        "size": size, "order_type": order_type} for oid, (action, price, size) in zip(client_oids, orders)]
+        try:
+            result = self.__okex_futures.take_orders(self.__instrument_id, orders_data)
+        except Exception as e:  # 4xx错误说明请求已被拒绝，超时、断线或5xx错误时交易所可能已经下单，按客户订单号查询实际结果
+            if isinstance(e, OkexAPIException) and e.status_code < 500:
+                raise SendOrderError(e)
+            return reconcile(client_oids, self.__placed_orders, e)
+        if "order_info" not in result:
+            raise SendOrderError(result.get('error_message'))
+        order_ids = []
+        for item in result['order_info']:
+            if item['error_code'] == "0":
+                orderfeed.track(self.__feed, item['order_id'])
+                order_ids.append(item['order_id'])
+            else:
+                order_ids.append(SendOrderError(item['error_message']))
+        return order_ids
+
+    def __placed_orders(self, client_oids):
+        placed = {}
+        for oid in client_oids:
+            try:
+                order_id = self.__okex_futures.get_order_info(self.__instrument_id, client_oid=oid)['order_id']
+            except OkexAPIException as e:
+                if str(e.code) != NOT_EXIST:   # 其他错误说明无法确认订单是否存在
+                    raise
+                continue
+            orderfeed.track(self.__feed, order_id)
+            placed[oid] = order_id
+        return placed
+
+    def batch_revoke(self, order_ids):
+        """
+        批量撤单，每次请求最多10个订单，多次请求并发发送
+        :param order_ids: 订单号列表
+        :return: 返回与order_ids顺序一致的列表，每个元素与revoke_order的返回值一致
+        """
+        return batch(order_ids, 10, self.__revoke_orders, lambda e: '【交易提醒】撤单失败' + str(e))
+
+    def __revoke_orders(self, order_ids):
+        receipt = self.__okex_futures.revoke_orders(self.__instrument_id, order_ids=order_ids)
+        if str(receipt.get('result')).lower() == "true":
+            return ['【交易提醒】撤单成功'] * len(order_ids)
+        return ['【交易提醒】撤单失败' + receipt.get('error_message', '')] * len(order_ids)
+
     def buy(self, price, size, order_type=None):
-        if config.backtest is False:   # 实盘模式
-            order_type = order_type or 0    # 如果不填order_type,则默认为普通委托
-            result = self.__okex_futures.take_order(self.__instrument_id, 1, price, size, order_type=order_type) # 下订单
-            order_info = self.get_order_info(order_id=result['order_id'])   # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ": # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation: # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:    # 如果撤单失败，则订单可能在此期间已完全成交或部分成交
-                            self.revoke_order(order_id=result['order_id'])
-                            state = self.get_order_info(order_id=result['order_id'])
-                            if state['订单状态'] == "撤单成功": # 已完全成交时，以原下单数量重发；部分成交时，重发委托数量为原下单数量减去已成交数量
-                                return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                        except:     # 撤单失败时，说明订单已完全成交
-                            order_info = self.get_order_info(order_id=result['order_id'])   # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['order_id'])
-                            state = self.get_order_info(order_id=result['order_id'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                        except:     # 撤单失败时，说明订单已完全成交，再查询一次订单状态，如果已完全成交，返回下单结果
-                            order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation: # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['order_id'])
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id=result['order_id'])
-                        state = self.get_order_info(order_id=result['order_id'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['order_id'])
-                        state = self.get_order_info(order_id=result['order_id'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.buy(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['order_id'])
-                    state = self.get_order_info(order_id=result['order_id'])
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                    if order_info["订单状态"] == "完全成交":
-                        return {"【交易提醒】下单结果": order_info}
-            else:   # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
-        else:   # 回测模式
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "buy", price, size, order_type=order_type).result()
+        else:  # 回测模式
             return "回测模拟下单成功！"
 
     def sell(self, price, size, order_type=None):
-        if config.backtest is False:    # 实盘模式
-            order_type = order_type or 0
-            result = self.__okex_futures.take_order(self.__instrument_id, 3, price, size, order_type=order_type)
-            order_info = self.get_order_info(order_id=result['order_id'])  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['order_id'])
-                            state = self.get_order_info(order_id=result['order_id'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['order_id'])
-                            state = self.get_order_info(order_id=result['order_id'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['order_id'])
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id=result['order_id'])
-                        state = self.get_order_info(order_id=result['order_id'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['order_id'])
-                        state = self.get_order_info(order_id=result['order_id'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.sell(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['order_id'])
-                    state = self.get_order_info(order_id=result['order_id'])
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                    if order_info["订单状态"] == "完全成交":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
-        else:   # 回测模式
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "sell", price, size, order_type=order_type).result()
+        else:  # 回测模式
             return "回测模拟下单成功！"
 
     def sellshort(self, price, size, order_type=None):
-        if config.backtest is False:   # 实盘模式
-            order_type = order_type or 0
-            result = self.__okex_futures.take_order(self.__instrument_id, 2, price, size, order_type=order_type)
-            order_info = self.get_order_info(order_id=result['order_id'])  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['order_id'])
-                            state = self.get_order_info(order_id=result['order_id'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) <= price * (1 - config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['order_id'])
-                            state = self.get_order_info(order_id=result['order_id'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['order_id'])
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id=result['order_id'])
-                        state = self.get_order_info(order_id=result['order_id'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['order_id'])
-                        state = self.get_order_info(order_id=result['order_id'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.sellshort(float(self.get_ticker()['last']) * (1 - config.reissue_order), size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['order_id'])
-                    state = self.get_order_info(order_id=result['order_id'])
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                    if order_info["订单状态"] == "完全成交":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
-        else:   # 回测模式
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "sellshort", price, size, order_type=order_type).result()
+        else:  # 回测模式
             return "回测模拟下单成功！"
 
     def buytocover(self, price, size, order_type=None):
-        if config.backtest is False:    # 实盘模式
-            order_type = order_type or 0
-            result = self.__okex_futures.take_order(self.__instrument_id, 4, price, size, order_type=order_type)
-            order_info = self.get_order_info(order_id=result['order_id'])  # 下单后查询一次订单状态
-            if order_info["订单状态"] == "完全成交" or order_info["订单状态"] == "失败 ":  # 如果订单状态为"完全成交"或者"失败"，返回结果
-                return {"【交易提醒】下单结果": order_info}
-            # 如果订单状态不是"完全成交"或者"失败"
-            if config.price_cancellation:  # 选择了价格撤单时，如果最新价超过委托价一定幅度，撤单重发，返回下单结果
-                if order_info["订单状态"] == "等待成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['order_id'])
-                            state = self.get_order_info(order_id=result['order_id'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    if float(self.get_ticker()['last']) >= price * (1 + config.price_cancellation_amplitude):
-                        try:
-                            self.revoke_order(order_id=result['order_id'])
-                            state = self.get_order_info(order_id=result['order_id'])
-                            if state['订单状态'] == "撤单成功":
-                                return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                        except:
-                            order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                            if order_info["订单状态"] == "完全成交":
-                                return {"【交易提醒】下单结果": order_info}
-            if config.time_cancellation:  # 选择了时间撤单时，如果委托单发出多少秒后不成交，撤单重发，直至完全成交，返回成交结果
-                time.sleep(config.time_cancellation_seconds)
-                order_info = self.get_order_info(order_id=result['order_id'])
-                if order_info["订单状态"] == "等待成交":
-                    try:
-                        self.revoke_order(order_id=result['order_id'])
-                        state = self.get_order_info(order_id=result['order_id'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-                if order_info["订单状态"] == "部分成交":
-                    try:
-                        self.revoke_order(order_id=result['order_id'])
-                        state = self.get_order_info(order_id=result['order_id'])
-                        if state['订单状态'] == "撤单成功":
-                            return self.buytocover(float(self.get_ticker()['last']) * (1 + config.reissue_order), size - state["已成交数量"])
-                    except:
-                        order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                        if order_info["订单状态"] == "完全成交":
-                            return {"【交易提醒】下单结果": order_info}
-            if config.automatic_cancellation:
-                # 如果订单未完全成交，且未设置价格撤单和时间撤单，且设置了自动撤单，就自动撤单并返回下单结果与撤单结果
-                try:
-                    self.revoke_order(order_id=result['order_id'])
-                    state = self.get_order_info(order_id=result['order_id'])
-                    return {"【交易提醒】下单结果": state}
-                except:
-                    order_info = self.get_order_info(order_id=result['order_id'])  # 再查询一次订单状态
-                    if order_info["订单状态"] == "完全成交":
-                        return {"【交易提醒】下单结果": order_info}
-            else:  # 未启用交易助手时，下单并查询订单状态后直接返回下单结果
-                return {"【交易提醒】下单结果": order_info}
-        else:   # 回测模式
+        if config.backtest is False:  # 实盘模式，撤单重发由订单管理在后台完成，这里等待委托结束
+            return ordermanager.submit(self, "buytocover", price, size, order_type=order_type).result()
+        else:  # 回测模式
             return "回测模拟下单成功！"
 
     def BUY(self, cover_short_price, cover_short_size, open_long_price, open_long_size, order_type=None):
@@ -379,7 +212,59 @@ class OKEXFUTURES:
             return '【交易提醒】撤单失败' + receipt['error_message']
 
     def get_order_info(self, order_id):
-        result = self.__okex_futures.get_order_info(self.__instrument_id, order_id)
+        """
+        查询订单信息，调用subscribe_orders订阅订单推送后从内存中的订单簿读取，未订阅或连接断开时通过rest接口查询
+        :param order_id: 订单号
+        :return: 返回订单信息字典
+        """
+        info = orderfeed.get(self.__feed, order_id)
+        if info is None:
+            info = self.__query_order_info(order_id)
+        return info
+
+    def __query_order_info(self, order_id):
+        return self.__order_info(self.__okex_futures.get_order_info(self.__instrument_id, order_id))
+
+    def subscribe_orders(self):
+        """
+        订阅订单推送，之后get_order_info与订单管理从内存中的订单簿读取订单状态，只在断线重连后通过rest接口对账
+        """
+        from purequant.exchange.okex import websocket     # 订阅时才导入，未使用订单推送时无需安装websocket模块的依赖
+        connect = functools.partial(websocket.subscribe_orders, websocket.url, self.__access_key, self.__passphrase, self.__secret_key,
+                                    ["futures/order:{}".format(self.__instrument_id)])
+        orderfeed.subscribe(self.__feed, connect, lambda data: (data['order_id'], self.__order_info(data)),
+                            self.__query_order_info)
+
+    def subscribe_account(self):
+        """
+        订阅持仓与账户推送，之后get_position与get_single_equity从内存中读取，每次连接成功后先通过rest接口获取一次快照
+        """
+        from purequant.exchange.okex import websocket     # 订阅时才导入，未使用推送时无需安装websocket模块的依赖
+        underlying = "-".join(self.__instrument_id.split("-")[:2]).upper()
+        currency = underlying.split("-")[0] if underlying.endswith("-USD") else underlying   # 币本位合约的账户频道按币种订阅
+        channels = ["futures/position:{}".format(self.__instrument_id), "futures/account:{}".format(currency)]
+
+        async def connect(on_connect, on_position, on_equity):
+            def on_message(res):
+                for data in res['data']:
+                    if res['table'] == "futures/position":
+                        on_position({"long": {"price": float(data['long_avg_cost']), "amount": int(data['long_qty'])},
+                                     "short": {"price": float(data['short_avg_cost']), "amount": int(data['short_qty'])}})
+                    elif res['table'] == "futures/account":
+                        for account in data.values():
+                            on_equity(underlying, float(account['equity']))
+
+            await websocket.subscribe_private(websocket.url, self.__access_key, self.__passphrase, self.__secret_key,
+                                              channels, on_connect, on_message)
+
+        accountfeed.subscribe(self.__feed, connect,
+                              lambda: (self.get_position(mode="both"), {underlying: self.get_single_equity(underlying)}))
+
+    def get_account_updated(self):
+        """获取持仓与账户缓存最近一次更新的时间戳，未调用subscribe_account或连接断开时返回None"""
+        return accountfeed.updated(self.__feed)
+
+    def __order_info(self, result):
         instrument_id = result['instrument_id']
         action = None
         if result['type'] == '1':
@@ -423,7 +308,7 @@ class OKEXFUTURES:
             dict = {"交易所": "Okex交割合约", "合约ID": instrument_id, "方向": action, "订单状态": "撤单中"}
             return dict
 
-    def get_kline(self, time_frame):
+    def __granularity(self, time_frame):
         if time_frame == "1m" or time_frame == "1M":
             granularity = '60'
         elif time_frame == '3m' or time_frame == "3M":
@@ -448,10 +333,30 @@ class OKEXFUTURES:
             granularity = '86400'
         else:
             raise KlineError
-        receipt = self.__okex_futures.get_kline(self.__instrument_id, granularity=granularity)
+        return granularity
+
+    def get_kline(self, time_frame):
+        receipt = self.__okex_futures.get_kline(self.__instrument_id, granularity=self.__granularity(time_frame))
+        return receipt
+
+    def get_history_kline(self, time_frame, start, end):
+        """
+        获取指定时间范围内的一页历史k线数据，供history模块分页下载
+        :param time_frame: k线周期
+        :param start: 起始时间戳（秒）
+        :param end: 结束时间戳（秒）
+        :return: 格式与get_kline一致，按时间倒序排列，最多200根
+        """
+        granularity = self.__granularity(time_frame)
+        # okex返回开始时间之后（不含开始时间）的k线，开始时间提前一个周期以包含start这一根k线
+        receipt = self.__okex_futures.get_kline(self.__instrument_id, start=ts_to_utc_str(start - int(granularity), fmt='%Y-%m-%dT%H:%M:%S.000Z'),
+                                                end=ts_to_utc_str(end, fmt='%Y-%m-%dT%H:%M:%S.000Z'), granularity=granularity)
         return receipt
 
     def get_position(self, mode=None):
+        position = accountfeed.position(self.__feed)
+        if position is not None:    # 调用subscribe_account订阅持仓推送后从内存中读取
+            return position if mode == "both" else one_way(position)
         result = self.__okex_futures.get_specific_position(instrument_id=self.__instrument_id)
         if mode == "both":     # 若传入参数为"both"则查询双向持仓模式的持仓信息
             dict = {"long":
@@ -483,13 +388,22 @@ class OKEXFUTURES:
         receipt = self.__okex_futures.get_specific_ticker(instrument_id=self.__instrument_id)
         return receipt
 
-    def get_contract_value(self):
-        receipt = self.__okex_futures.get_products()
+    def __load_instruments(self):
         result = {}
-        for item in receipt:
-            result[item['instrument_id']] = item['contract_val']
-        contract_value = float(result[self.__instrument_id])
-        return contract_value
+        for item in self.__okex_futures.get_products():
+            result[item['instrument_id']] = {"contract_value": float(item['contract_val']), "tick_size": float(item['tick_size']),
+                                             "size_increment": float(item['trade_increment']), "min_size": float(item['trade_increment'])}
+        return result
+
+    def get_instrument_info(self):
+        """
+        获取交易对信息，缓存于instrument模块，默认每天只下载一次
+        :return: 返回字典 {"contract_value": 合约面值, "tick_size": 价格最小变动单位, "size_increment": 数量最小变动单位, "min_size": 最小下单数量}
+        """
+        return instruments.get("OKEXFUTURES", self.__instrument_id, self.__load_instruments)
+
+    def get_contract_value(self):
+        return self.get_instrument_info()["contract_value"]
 
     def get_depth(self, type=None, size=None):
         """
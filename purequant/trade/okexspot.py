@@ -8,6 +8,7 @@ email: purequant@foxmail.com
 
 import time
 from purequant.exchange.okex import spot_api as okexspot
+from purequant.time import ts_to_utc_str
 from purequant.config import config
 from purequant.exceptions import *
 
@@ -244,7 +245,7 @@ class OKEXSPOT:
             dict = {"交易所": "Okex现货", "合约ID": instrument_id, "方向": action, "订单状态": "撤单中"}
             return dict
 
-    def get_kline(self, time_frame):
+    def __granularity(self, time_frame):
         if time_frame == "1m" or time_frame == "1M":
             granularity = '60'
         elif time_frame == '3m' or time_frame == "3M":
@@ -269,7 +270,24 @@ class OKEXSPOT:
             granularity = '86400'
         else:
             raise KlineError
-        receipt = self.__okex_spot.get_kline(self.__instrument_id, granularity=granularity)
+        return granularity
+
+    def get_kline(self, time_frame):
+        receipt = self.__okex_spot.get_kline(self.__instrument_id, granularity=self.__granularity(time_frame))
+        return receipt
+
+    def get_history_kline(self, time_frame, start, end):
+        """
+        获取指定时间范围内的一页历史k线数据，供history模块分页下载
+        :param time_frame: k线周期
+        :param start: 起始时间戳（秒）
+        :param end: 结束时间戳（秒）
+        :return: 格式与get_kline一致，按时间倒序排列，最多200根
+        """
+        granularity = self.__granularity(time_frame)
+        # okex返回开始时间之后（不含开始时间）的k线，开始时间提前一个周期以包含start这一根k线
+        receipt = self.__okex_spot.get_kline(self.__instrument_id, start=ts_to_utc_str(start - int(granularity), fmt='%Y-%m-%dT%H:%M:%S.000Z'),
+                                             end=ts_to_utc_str(end, fmt='%Y-%m-%dT%H:%M:%S.000Z'), granularity=granularity)
         return receipt
 
     def get_position(self):
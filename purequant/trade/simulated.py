@@ -0,0 +1,161 @@
+"""
+内存模拟交易所
+回测时代替交易所接口，持仓、委托与资金均保存在内存中，委托按下单价格立即全部成交，
+POSITION在回测模式下直接从这里读取持仓信息，回测无需连接数据库。
+Author: Gary-Hertel
+Date:   2020/11/26
+email: interstella.ranger2020@gmail.com
+"""
+
+from purequant.exceptions import *
+
+
+class SIMULATEDEXCHANGE:
+
+    simulated = True    # POSITION据此判断是否为内存模拟交易所
+
+    def __init__(self, instrument_id, start_asset=0, contract_value=1, market_type=None):
+        """
+        内存模拟交易所，接口与各交易所的交易模块一致
+        :param instrument_id: 合约ID，例如："BTC-USDT-201225"
+        :param start_asset: 初始资金
+        :param contract_value: 合约面值，现货填1
+        :param market_type: 默认是USDT合约，可填"usd_contract"（币本位合约）或者"spot"(现货)
+        """
+        self.__instrument_id = instrument_id
+        self.__start_asset = start_asset
+        self.__asset = start_asset  # 已实现盈亏计入后的总资金
+        self.__contract_value = contract_value
+        self.__market_type = market_type
+        self.__kline = []   # 按时间先后顺序排列的k线数据
+        self.__positions = {"long": {"amount": 0, "price": 0.0}, "short": {"amount": 0, "price": 0.0}}
+        self.__orders = []  # 全部委托，序号即订单号
+
+    def update_kline(self, kline):
+        """
+        回测时传入截至当前的k线数据，用于计算最新成交价与浮动盈亏
+        :param kline: 按时间先后顺序排列的k线数据
+        :return:
+        """
+        self.__kline = kline
+
+    def __profit(self, side, hold_price, price, amount):
+        """按照合约类型计算平仓盈亏，计算方式与POSITION.coverlong_profit、covershort_profit一致"""
+        difference = price - hold_price if side == "long" else hold_price - price
+        if self.__market_type == "usd_contract":
+            return difference * ((amount * self.__contract_value) / hold_price)
+        elif self.__market_type == "spot":
+            return difference * amount
+        else:
+            return difference * (amount * self.__contract_value)
+
+    def __turnover(self, price, amount):
+        if self.__market_type == "usd_contract":
+            return amount * self.__contract_value
+        elif self.__market_type == "spot":
+            return price * amount
+        else:
+            return price * amount * self.__contract_value
+
+    def __send_order(self, action, price, size):
+        """委托按下单价格立即全部成交，同时更新持仓与资金"""
+        if size <= 0:
+            raise SendOrderError("下单数量必须大于0！")
+        side = "long" if action in ("买入开多", "卖出平多") else "short"
+        position = self.__positions[side]
+        profit = 0
+        if action in ("买入开多", "卖出开空"):
+            total = position["amount"] + size
+            position["price"] = (position["price"] * position["amount"] + price * size) / total    # 加仓时持仓价格为成交均价
+            position["amount"] = total
+        else:
+            if size > position["amount"]:
+                raise SendOrderError("平仓数量超过持仓数量！")
+            profit = self.__profit(side, position["price"], price, size)
+            self.__asset += profit
+            position["amount"] -= size
+            if position["amount"] == 0:
+                position["price"] = 0.0
+        order_info = {"交易所": "模拟交易所", "合约ID": self.__instrument_id, "方向": action, "订单状态": "完全成交",
+                      "成交均价": price, "已成交数量": size, "成交金额": self.__turnover(price, size),
+                      "订单号": len(self.__orders), "盈亏": profit}
+        self.__orders.append(order_info)
+        return {"【交易提醒】下单结果": order_info}
+
+    def buy(self, price, size, order_type=None):
+        return self.__send_order("买入开多", price, size)
+
+    def sell(self, price, size, order_type=None):
+        return self.__send_order("卖出平多", price, size)
+
+    def sellshort(self, price, size, order_type=None):
+        return self.__send_order("卖出开空", price, size)
+
+    def buytocover(self, price, size, order_type=None):
+        return self.__send_order("买入平空", price, size)
+
+    def BUY(self, cover_short_price, cover_short_size, open_long_price, open_long_size, order_type=None):
+        result1 = self.buytocover(cover_short_price, cover_short_size)
+        result2 = self.buy(open_long_price, open_long_size)
+        return {"平仓结果": result1, "开仓结果": result2}
+
+    def SELL(self, cover_long_price, cover_long_size, open_short_price, open_short_size, order_type=None):
+        result1 = self.sell(cover_long_price, cover_long_size)
+        result2 = self.sellshort(open_short_price, open_short_size)
+        return {"平仓结果": result1, "开仓结果": result2}
+
+    def get_order_list(self, state=None, limit=None):
+        result = self.__orders[-limit:] if limit else self.__orders
+        return list(result)
+
+    def revoke_order(self, order_id):
+        return '【交易提醒】撤单失败，订单已完全成交'
+
+    def get_order_info(self, order_id):
+        try:
+            return self.__orders[int(order_id)]
+        except (IndexError, ValueError):
+            raise GetOrderError
+
+    def get_kline(self, time_frame=None):
+        """与交易所返回的格式一致，k线数据按时间倒序排列"""
+        return self.__kline[::-1]
+
+    def get_ticker(self):
+        if not self.__kline:
+            raise KlineError("尚未传入k线数据！")
+        return {"last": float(self.__kline[-1][4])}
+
+    def get_contract_value(self):
+        return self.__contract_value
+
+    def get_position(self, mode=None):
+        if mode == "both":     # 若传入参数为"both"则查询双向持仓模式的持仓信息
+            result = {
+                "long": {'amount': self.__positions["long"]["amount"], 'price': self.__positions["long"]["price"]},
+                "short": {'amount': self.__positions["short"]["amount"], 'price': self.__positions["short"]["price"]}
+            }
+            return result
+        for direction in ("long", "short"):     # 未传入参数则默认为查询单向持仓模式的持仓信息
+            if self.__positions[direction]["amount"] > 0:
+                return {'direction': direction, 'amount': self.__positions[direction]["amount"],
+                        'price': self.__positions[direction]["price"]}
+        return {'direction': 'none', 'amount': 0, 'price': 0.0}
+
+    def get_single_equity(self, symbol=None):
+        """
+        获取账户权益，等于初始资金加上已实现盈亏与按最新成交价计算的浮动盈亏
+        :param symbol: 与交易所接口保持一致，不使用
+        :return:返回浮点数
+        """
+        result = self.__asset
+        if self.__kline:
+            last = float(self.__kline[-1][4])
+            for side, position in self.__positions.items():
+                if position["amount"] > 0:
+                    result += self.__profit(side, position["price"], last, position["amount"])
+        return result
+
+    def get_total_profit(self):
+        """获取已实现的总盈亏"""
+        return self.__asset - self.__start_asset
@@ -11,6 +11,7 @@ setup(
     version="1.4.5",
     packages=[
         "purequant",
+        "purequant/exchange",
         "purequant/exchange/huobi",
         "purequant/exchange/okex",
         "purequant/exchange/binance",